@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI chat completions API
+Answers with canned analyses, chunk summaries or chat replies after a configurable delay,
+so the backend can be load-tested without paying for real completions.
+
+Run: python bench/mock_openai.py --port 8100 --latency-ms 400
+Then start the backend with OPENAI_BASE_URL=http://127.0.0.1:8100/v1
+"""
+
+import os
+import json
+import time
+import uuid
+import hashlib
+import random
+import asyncio
+import argparse
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# A valid SummaryResponse, so the backend's parsing path is exercised as in production
+ANALYSIS = {
+    "post_type": "Question",
+    "thread_summary": "The OP asks which language to learn first. Most replies recommend Python for its readable syntax and huge ecosystem, while a vocal minority argues JavaScript is more practical for web work.",
+    "key_replies": [
+        {
+            "emoji": "💡",
+            "name": "Helpful",
+            "replies": [
+                {"author": "u/bench_user", "text": "Start with Python, then pick up JavaScript once you want to build for the web.", "explanation": "Gives a concrete learning path"}
+            ]
+        },
+        {
+            "emoji": "⚡",
+            "name": "Controversial",
+            "replies": [
+                {"author": "u/other_user", "text": "Learn C first or you will never understand what the computer is doing.", "explanation": "Pushes back on the consensus"}
+            ]
+        }
+    ]
+}
+
+# What the backend's "brief" output detail asks for: one category, one reply
+BRIEF_ANALYSIS = {
+    "post_type": ANALYSIS["post_type"],
+    "thread_summary": "The OP asks which language to learn first, and most replies recommend Python.",
+    "key_replies": ANALYSIS["key_replies"][:1]
+}
+
+CHUNK_SUMMARY = {
+    "chunk_summary": "Replies in this part mostly agree with the OP and add practical tips.",
+    "candidates": [
+        {"category": "Helpful", "emoji": "💡", "text": "Start with Python.", "explanation": "Most upvoted advice"}
+    ]
+}
+
+CHAT_REPLY = "Most replies recommend Python first because it is easy to read and widely used, but a few people argue for JavaScript if you mainly want to build websites."
+
+# Rough OpenAI tokenizer ratio, matching the backend's budgeting
+CHARS_PER_TOKEN = 4
+
+# Prompt prefix caching as OpenAI does it: prefixes of 1024+ tokens, matched in 128-token blocks
+CACHE_BLOCK_CHARS = 128 * CHARS_PER_TOKEN
+MIN_CACHED_CHARS = 1024 * CHARS_PER_TOKEN
+MAX_CACHED_BLOCKS = 100000
+
+
+class MockSettings:
+    """Latency and failure injection, configured from the command line or MOCK_* environment variables"""
+
+    def __init__(self):
+        self.latency_ms = float(os.getenv("MOCK_LATENCY_MS", "400"))
+        self.jitter_ms = float(os.getenv("MOCK_JITTER_MS", "100"))
+        self.ttft_ms = float(os.getenv("MOCK_TTFT_MS", "150"))
+        self.chunk_chars = int(os.getenv("MOCK_STREAM_CHUNK_CHARS", "12"))
+        self.failure_rate = float(os.getenv("MOCK_FAILURE_RATE", "0"))
+        self.failure_status = int(os.getenv("MOCK_FAILURE_STATUS", "500"))
+        self.slow_rate = float(os.getenv("MOCK_SLOW_RATE", "0"))
+        self.slow_ms = float(os.getenv("MOCK_SLOW_MS", "5000"))
+        # Share of JSON answers that come back malformed unless a json_schema response_format is requested
+        self.malformed_rate = float(os.getenv("MOCK_MALFORMED_RATE", "0"))
+        # Generation time per completion token on top of latency_ms, as longer answers take longer
+        self.ms_per_output_token = float(os.getenv("MOCK_MS_PER_OUTPUT_TOKEN", "0"))
+
+
+settings = MockSettings()
+stats = {"requests": 0, "streamed": 0, "failed": 0, "slow": 0, "malformed": 0, "prompt_tokens": 0, "cached_tokens": 0}
+cached_blocks: set = set()
+
+app = FastAPI(title="Mock OpenAI API")
+
+
+def response_content(body: dict) -> str:
+    """Pick the canned answer that matches what the backend asked for"""
+    prompt = json.dumps(body.get("messages", []))
+    if "chunk_summary" in prompt:
+        return json.dumps(CHUNK_SUMMARY)
+    if "key_replies" in prompt:
+        content = json.dumps(BRIEF_ANALYSIS if "Brief analysis" in prompt else ANALYSIS)
+        constrained = (body.get("response_format") or {}).get("type") == "json_schema"
+        if not constrained and settings.malformed_rate and random.random() < settings.malformed_rate:
+            stats["malformed"] += 1
+            # Cut off mid-document, like a completion that rambled into max_tokens
+            return content[:len(content) // 2]
+        return content
+    return CHAT_REPLY
+
+
+def cached_prompt_chars(body: dict) -> int:
+    """Length of the prompt prefix already seen in earlier requests, in whole cache blocks"""
+    prompt = json.dumps([body.get("response_format"), body.get("messages", [])], ensure_ascii=False)
+    if len(cached_blocks) > MAX_CACHED_BLOCKS:
+        cached_blocks.clear()
+    digest = hashlib.sha1()
+    cached = 0
+    for start in range(0, len(prompt) - CACHE_BLOCK_CHARS + 1, CACHE_BLOCK_CHARS):
+        digest.update(prompt[start:start + CACHE_BLOCK_CHARS].encode("utf-8"))
+        block = digest.hexdigest()
+        if cached == start and block in cached_blocks:
+            cached = start + CACHE_BLOCK_CHARS
+        cached_blocks.add(block)
+    return cached if cached >= MIN_CACHED_CHARS else 0
+
+
+def usage_for(body: dict, content: str) -> dict:
+    prompt_chars = sum(len(str(message.get("content", ""))) for message in body.get("messages", []))
+    prompt_tokens = prompt_chars // CHARS_PER_TOKEN + 1
+    cached_tokens = min(cached_prompt_chars(body) // CHARS_PER_TOKEN, prompt_tokens)
+    completion_tokens = len(content) // CHARS_PER_TOKEN + 1
+    stats["prompt_tokens"] += prompt_tokens
+    stats["cached_tokens"] += cached_tokens
+    return {
+        "prompt_tokens": prompt_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens
+    }
+
+
+def total_delay(completion_tokens: int = 0) -> float:
+    """Seconds the whole completion takes, including generation time and injected slow responses"""
+    delay = settings.latency_ms + random.uniform(-settings.jitter_ms, settings.jitter_ms) + completion_tokens * settings.ms_per_output_token
+    if settings.slow_rate and random.random() < settings.slow_rate:
+        stats["slow"] += 1
+        delay = settings.slow_ms
+    return max(delay, 0) / 1000
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+
+    if settings.failure_rate and random.random() < settings.failure_rate:
+        stats["failed"] += 1
+        await asyncio.sleep(settings.latency_ms / 1000 / 4)
+        return JSONResponse(
+            status_code=settings.failure_status,
+            content={"error": {"message": "Injected failure", "type": "server_error", "code": None}}
+        )
+
+    content = response_content(body)
+    finish_reason = "stop"
+    max_tokens = body.get("max_tokens")
+    if max_tokens and len(content) // CHARS_PER_TOKEN + 1 > max_tokens:
+        # Generation stops at max_tokens, mid-answer
+        content = content[:max_tokens * CHARS_PER_TOKEN]
+        finish_reason = "length"
+    usage = usage_for(body, content)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+    created = int(time.time())
+    model = body.get("model", "gpt-4o-mini")
+    delay = total_delay(usage["completion_tokens"])
+
+    if not body.get("stream"):
+        await asyncio.sleep(delay)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": finish_reason}],
+            "usage": usage
+        }
+
+    stats["streamed"] += 1
+    include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+    pieces = [content[i:i + settings.chunk_chars] for i in range(0, len(content), settings.chunk_chars)]
+    ttft = min(settings.ttft_ms / 1000, delay)
+    # The rest of the delay is spread evenly across the streamed pieces
+    interval = (delay - ttft) / max(len(pieces), 1)
+
+    def frame(choices: list, chunk_usage=None) -> str:
+        chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model, "choices": choices}
+        if include_usage:
+            chunk["usage"] = chunk_usage
+        return f"data: {json.dumps(chunk)}\n\n"
+
+    async def event_stream():
+        await asyncio.sleep(ttft)
+        yield frame([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+        for piece in pieces:
+            yield frame([{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+            await asyncio.sleep(interval)
+        yield frame([{"index": 0, "delta": {}, "finish_reason": finish_reason}])
+        if include_usage:
+            yield frame([], usage)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@app.get("/stats")
+async def mock_stats():
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=settings.latency_ms, help="Mean time per completion")
+    parser.add_argument("--jitter-ms", type=float, default=settings.jitter_ms, help="Uniform +/- jitter on the latency")
+    parser.add_argument("--ttft-ms", type=float, default=settings.ttft_ms, help="Time to first token of streamed completions")
+    parser.add_argument("--failure-rate", type=float, default=settings.failure_rate, help="Fraction of calls that fail")
+    parser.add_argument("--failure-status", type=int, default=settings.failure_status, help="HTTP status of injected failures")
+    parser.add_argument("--slow-rate", type=float, default=settings.slow_rate, help="Fraction of calls that take --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=settings.slow_ms)
+    parser.add_argument("--ms-per-output-token", type=float, default=settings.ms_per_output_token, help="Extra latency per completion token")
+    parser.add_argument("--malformed-rate", type=float, default=settings.malformed_rate, help="Fraction of unconstrained analyses returned as broken JSON")
+    args = parser.parse_args()
+
+    settings.latency_ms = args.latency_ms
+    settings.jitter_ms = args.jitter_ms
+    settings.ttft_ms = args.ttft_ms
+    settings.failure_rate = args.failure_rate
+    settings.failure_status = args.failure_status
+    settings.slow_rate = args.slow_rate
+    settings.slow_ms = args.slow_ms
+    settings.malformed_rate = args.malformed_rate
+    settings.ms_per_output_token = args.ms_per_output_token
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
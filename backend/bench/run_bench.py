@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+SpeedThreads backend benchmark
+Starts the mock OpenAI server and the backend, replays synthetic workloads at a target
+concurrency and reports throughput, latency percentiles and backend memory.
+
+Run from the backend directory:
+    python bench/run_bench.py
+    python bench/run_bench.py --workloads summarize-huge,mixed --concurrency 32 --requests 500
+    python bench/run_bench.py --json bench_results.json --max-p95-ms 2000
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+import httpx
+
+sys.path.insert(0, str(Path(__file__).parent))
+from workloads import Workload, get_workloads
+
+BENCH_DIR = Path(__file__).parent
+BACKEND_DIR = BENCH_DIR.parent
+
+DEFAULT_WORKLOADS = "summarize-small,summarize-medium,summarize-huge,summarize-medium-stream,chat-medium,mixed"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def read_memory_kb(pid: int) -> Dict[str, int]:
+    """Current (VmRSS) and peak (VmHWM) resident memory of a process, from /proc"""
+    memory = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key, value = line.split(":", 1)
+                    memory[key] = int(value.split()[0])
+    except OSError:
+        pass
+    return memory
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process exited with code {process.returncode} before becoming ready: {url}")
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+class Servers:
+    """Mock OpenAI server and backend, each in its own process"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.processes: List[subprocess.Popen] = []
+        self.workdir = tempfile.TemporaryDirectory(prefix="speedthreads-bench-")
+        self.mock_url = ""
+        self.app_url = args.app_url or ""
+        self.app_pid: Optional[int] = None
+
+    def __enter__(self) -> "Servers":
+        args = self.args
+        mock_port = free_port()
+        self.mock_url = f"http://127.0.0.1:{mock_port}"
+        mock = subprocess.Popen([
+            sys.executable, str(BENCH_DIR / "mock_openai.py"),
+            "--port", str(mock_port),
+            "--latency-ms", str(args.latency_ms),
+            "--jitter-ms", str(args.jitter_ms),
+            "--ttft-ms", str(args.ttft_ms),
+            "--failure-rate", str(args.failure_rate),
+            "--slow-rate", str(args.slow_rate),
+            "--slow-ms", str(args.slow_ms),
+            "--malformed-rate", str(args.malformed_rate),
+            "--ms-per-output-token", str(args.ms_per_output_token)
+        ])
+        self.processes.append(mock)
+        wait_until_ready(f"{self.mock_url}/stats", mock)
+
+        if self.app_url:
+            return self
+
+        app_port = free_port()
+        self.app_url = f"http://127.0.0.1:{app_port}"
+        env = {
+            **os.environ,
+            "OPENAI_API_KEY": "sk-bench",
+            "OPENAI_BASE_URL": f"{self.mock_url}/v1",
+            "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+            # Measure the request path, not the persistent cache tier
+            "ANALYSIS_CACHE_DB": "",
+            # All load comes from one address; per-client limits would just reject it
+            "RATE_LIMIT_ENABLED": os.getenv("RATE_LIMIT_ENABLED", "false")
+        }
+        # The backend writes its log file to the working directory; keep it out of the repo
+        backend = subprocess.Popen([
+            sys.executable, "-m", "uvicorn", "src.main:app",
+            "--app-dir", str(BACKEND_DIR),
+            "--host", "127.0.0.1",
+            "--port", str(app_port),
+            "--log-level", "warning",
+            "--no-access-log"
+        ], cwd=self.workdir.name, env=env)
+        self.processes.append(backend)
+        self.app_pid = backend.pid
+        wait_until_ready(f"{self.app_url}/readyz", backend)
+        return self
+
+    def __exit__(self, *exc_info):
+        for process in reversed(self.processes):
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.workdir.cleanup()
+
+
+async def send(client: httpx.AsyncClient, method: str, path: str, body: dict) -> tuple:
+    """Send one request; returns (status, total seconds, seconds to first body byte)"""
+    start = time.perf_counter()
+    first_byte = None
+    async with client.stream(method, path, json=body) as response:
+        async for _ in response.aiter_raw():
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+    total = time.perf_counter() - start
+    return response.status_code, total, first_byte if first_byte is not None else total
+
+
+async def run_workload(servers: Servers, workload: Workload, requests: int, concurrency: int, warmup: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    timeout = httpx.Timeout(120.0)
+    latencies: List[float] = []
+    first_bytes: List[float] = []
+    statuses: Dict[int, int] = {}
+    errors = 0
+    peak_rss_kb = 0
+
+    async with httpx.AsyncClient(base_url=servers.app_url, limits=limits, timeout=timeout) as client:
+        # Warm-up requests use their own seeds so they don't pre-fill the cache for measured ones
+        for n in range(warmup):
+            method, path, body = workload.build(1_000_000 + n)
+            await send(client, method, path, body)
+
+        counter = iter(range(requests))
+
+        async def worker():
+            nonlocal errors
+            for n in counter:
+                method, path, body = workload.build(n)
+                try:
+                    status, total, first_byte = await send(client, method, path, body)
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                statuses[status] = statuses.get(status, 0) + 1
+                if status < 400:
+                    latencies.append(total)
+                    first_bytes.append(first_byte)
+
+        async def sample_memory():
+            nonlocal peak_rss_kb
+            while True:
+                if servers.app_pid:
+                    peak_rss_kb = max(peak_rss_kb, read_memory_kb(servers.app_pid).get("VmRSS", 0))
+                await asyncio.sleep(0.2)
+
+        sampler = asyncio.create_task(sample_memory())
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        sampler.cancel()
+
+    latencies.sort()
+    first_bytes.sort()
+    memory = read_memory_kb(servers.app_pid) if servers.app_pid else {}
+    return {
+        "workload": workload.name,
+        "description": workload.description,
+        "requests": requests,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "ok": len(latencies),
+        "statuses": statuses,
+        "transport_errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        "first_byte_p50_ms": round(percentile(first_bytes, 0.50) * 1000, 1),
+        "first_byte_p95_ms": round(percentile(first_bytes, 0.95) * 1000, 1),
+        "rss_mb": round(memory.get("VmRSS", 0) / 1024, 1),
+        "peak_rss_mb": round(max(peak_rss_kb, memory.get("VmHWM", 0)) / 1024, 1)
+    }
+
+
+def print_results(results: List[dict]) -> None:
+    header = f"{'workload':<26}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ttfb p50':>10}{'ok':>7}{'errors':>8}{'rss MB':>9}{'peak MB':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        failed = r["requests"] - r["ok"]
+        print(
+            f"{r['workload']:<26}{r['rps']:>9.1f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}"
+            f"{r['first_byte_p50_ms']:>10.1f}{r['ok']:>7}{failed:>8}{r['rss_mb']:>9.1f}{r['peak_rss_mb']:>9.1f}"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the SpeedThreads backend against a mock OpenAI server")
+    parser.add_argument("--workloads", default=DEFAULT_WORKLOADS, help=f"Comma-separated workload names, or 'all' (default: {DEFAULT_WORKLOADS})")
+    parser.add_argument("--list", action="store_true", help="List the available workloads and exit")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per workload")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests per workload")
+    parser.add_argument("--repeat-ratio", type=float, default=0.0, help="Fraction of summaries that reuse an earlier thread (cache hits)")
+    parser.add_argument("--latency-ms", type=float, default=400, help="Mock completion latency")
+    parser.add_argument("--jitter-ms", type=float, default=100, help="Mock latency jitter")
+    parser.add_argument("--ttft-ms", type=float, default=150, help="Mock time to first streamed token")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of mock completions that fail")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Fraction of mock completions that take --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=5000)
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Fraction of unconstrained mock analyses returned as broken JSON")
+    parser.add_argument("--ms-per-output-token", type=float, default=0.0, help="Extra mock latency per completion token")
+    parser.add_argument("--app-url", help="Benchmark an already running backend instead of starting one (it must use the mock)")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file")
+    parser.add_argument("--max-p95-ms", type=float, help="Exit with an error if any workload's p95 exceeds this")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="Exit with an error if more requests than this fail (default 1%%)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workloads = get_workloads(args.repeat_ratio)
+
+    if args.list:
+        for workload in workloads.values():
+            print(f"{workload.name:<26}{workload.description}")
+        return
+
+    names = list(workloads) if args.workloads == "all" else [name.strip() for name in args.workloads.split(",") if name.strip()]
+    unknown = [name for name in names if name not in workloads]
+    if unknown:
+        print(f"❌ Unknown workloads: {', '.join(unknown)} (see --list)")
+        sys.exit(2)
+
+    print(f"🚀 Benchmarking {len(names)} workloads - {args.requests} requests at concurrency {args.concurrency}, mock latency {args.latency_ms:.0f}ms")
+    results = []
+    with Servers(args) as servers:
+        for name in names:
+            print(f"⏱️  {name}...", flush=True)
+            results.append(asyncio.run(run_workload(servers, workloads[name], args.requests, args.concurrency, args.warmup)))
+        mock_stats = httpx.get(f"{servers.mock_url}/stats").json()
+        routing = httpx.get(f"{servers.app_url}/routing/stats").json()
+
+    print()
+    print_results(results)
+    print(f"\n📊 Mock OpenAI served {mock_stats['requests']} completions ({mock_stats['streamed']} streamed, {mock_stats['failed']} failed)")
+    if mock_stats["prompt_tokens"]:
+        print(f"🧠 Prompt tokens: {mock_stats['prompt_tokens']}, served from prefix cache: {mock_stats['cached_tokens']} ({mock_stats['cached_tokens'] / mock_stats['prompt_tokens']:.0%})")
+    routes = {name: route for name, route in routing.get("routes", {}).items() if route["calls"]}
+    if routes:
+        print(f"\n{'route':<18}{'model':<16}{'calls':>7}{'mean s':>9}{'out tok':>10}{'cost $':>11}")
+        for name, route in routes.items():
+            print(f"{name:<18}{route['model']:<16}{route['calls']:>7}{route['mean_seconds']:>9.3f}{route['completion_tokens']:>10}{route['cost_usd']:>11.4f}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"settings": vars(args), "results": results, "mock": mock_stats, "routing": routing}, f, indent=2)
+        print(f"📝 Results written to {args.json_path}")
+
+    failures = []
+    for r in results:
+        error_rate = (r["requests"] - r["ok"]) / r["requests"] if r["requests"] else 0.0
+        if error_rate > args.max_error_rate:
+            failures.append(f"{r['workload']}: {error_rate:.1%} of requests failed")
+        if args.max_p95_ms is not None and r["p95_ms"] > args.max_p95_ms:
+            failures.append(f"{r['workload']}: p95 {r['p95_ms']}ms exceeds {args.max_p95_ms}ms")
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+SpeedThreads startup and per-core throughput benchmark
+Measures how long the production launcher takes to become live and ready, and how
+many requests per second each worker serves, for the autoscaler's sizing.
+
+Run from the backend directory:
+    python bench/startup_bench.py
+    python bench/startup_bench.py --workers 1,2,4 --duration 10 --json startup.json
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import List
+import httpx
+
+sys.path.insert(0, str(Path(__file__).parent))
+from run_bench import BACKEND_DIR, BENCH_DIR, free_port, percentile, read_memory_kb, wait_until_ready
+from workloads import make_thread
+
+
+def measure_import(runs: int, workdir: str) -> float:
+    """Median seconds for a fresh interpreter to import the app module"""
+    timings = []
+    env = {**os.environ, "OPENAI_API_KEY": "sk-bench", "PYTHONPATH": str(BACKEND_DIR)}
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import src.main"], cwd=workdir, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2]
+
+
+def wait_for(url: str, process: subprocess.Popen, timeout: float = 60) -> float:
+    """Seconds until url answers 200"""
+    start = time.perf_counter()
+    deadline = start + timeout
+    with httpx.Client(timeout=1) as client:
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {process.returncode}")
+            try:
+                if client.get(url).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.01)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+async def load(url: str, path: str, body: dict, duration: float, concurrency: int) -> dict:
+    """Send requests for `duration` seconds from `concurrency` clients"""
+    latencies: List[float] = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        # Every worker caches the analysis on its first request; warm them all up
+        await asyncio.gather(*(client.post(path, json=body) for _ in range(concurrency * 2)))
+        stop_at = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < stop_at:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(path, json=body)
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2)
+    }
+
+
+def worker_memory_kb(manager_pid: int) -> int:
+    """Total resident memory of the process manager and its workers"""
+    total = read_memory_kb(manager_pid).get("VmRSS", 0)
+    try:
+        children = Path(f"/proc/{manager_pid}/task/{manager_pid}/children").read_text().split()
+    except OSError:
+        children = []
+    for child in children:
+        total += read_memory_kb(int(child)).get("VmRSS", 0)
+    return total
+
+
+def run_launcher(workers: int, mock_url: str, args: argparse.Namespace, workdir: str) -> dict:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "sk-bench",
+        "OPENAI_BASE_URL": f"{mock_url}/v1",
+        "LOG_LEVEL": "WARNING",
+        "ANALYSIS_CACHE_DB": "",
+        "RATE_LIMIT_ENABLED": "false"
+    }
+    # prometheus_client switches to multiprocess mode whenever the variable exists, even when empty
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    if workers > 1:
+        env["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="metrics-", dir=workdir)
+        # The launcher refuses several workers unless analyses and jobs are shared
+        env["ANALYSIS_CACHE_DB"] = os.path.join(workdir, f"cache-{workers}.db")
+        env["JOB_DB"] = os.path.join(workdir, f"jobs-{workers}.db")
+    start = time.perf_counter()
+    server = subprocess.Popen([
+        sys.executable, str(BACKEND_DIR / "start.py"), "--prod",
+        "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)
+    ], cwd=workdir, env=env, stdout=subprocess.DEVNULL)
+    try:
+        live = wait_for(f"{url}/livez", server)
+        ready = live + wait_for(f"{url}/readyz", server)
+        # A cached analysis exercises parsing, validation, hashing and serialization without the mock's latency
+        result = asyncio.run(load(url, "/summarize", make_thread("medium", seed=1), args.duration, args.concurrency))
+        result.update({
+            "workers": workers,
+            "live_s": round(live, 3),
+            "ready_s": round(ready, 3),
+            "rps_per_worker": round(result["rps"] / workers, 1),
+            "rss_mb": round(worker_memory_kb(server.pid) / 1024, 1)
+        })
+        return result
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        print(f"   stopped {time.perf_counter() - start:.1f}s after launch", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold start and per-worker throughput of the production launcher")
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="Comma-separated worker counts to try")
+    parser.add_argument("--duration", type=float, default=5, help="Seconds of load per worker count")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--import-runs", type=int, default=3, help="Fresh interpreters used to time the app import")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="speedthreads-startup-") as workdir:
+        # The app writes its log file to the working directory; keep it out of the repo
+        import_s = measure_import(args.import_runs, workdir)
+        print(f"📦 Importing the app takes {import_s:.3f}s")
+
+        mock_port = free_port()
+        mock_url = f"http://127.0.0.1:{mock_port}"
+        mock = subprocess.Popen([sys.executable, str(BENCH_DIR / "mock_openai.py"), "--port", str(mock_port), "--latency-ms", "50"])
+        try:
+            wait_until_ready(f"{mock_url}/stats", mock)
+            for workers in sorted({int(n) for n in args.workers.split(",")}):
+                print(f"⏱️  {workers} worker(s)...", flush=True)
+                results.append(run_launcher(workers, mock_url, args, workdir))
+        finally:
+            mock.terminate()
+            mock.wait(timeout=10)
+
+    print()
+    print(f"{'workers':>7} {'live s':>7} {'ready s':>8} {'rps':>8} {'rps/worker':>10} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6} {'RSS MB':>7}")
+    for r in results:
+        print(f"{r['workers']:>7} {r['live_s']:>7} {r['ready_s']:>8} {r['rps']:>8} {r['rps_per_worker']:>10} {r['p50_ms']:>8} {r['p99_ms']:>8} {r['errors']:>6} {r['rss_mb']:>7}")
+    print("\nThe load generator is a single Python process; at high worker counts it may be the bottleneck.")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"import_s": import_s, "settings": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
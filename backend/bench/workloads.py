@@ -0,0 +1,136 @@
+"""
+Synthetic Reddit and X threads and request mixes for benchmarking the backend
+Threads are generated deterministically from a seed, with sizes from a handful of replies
+to the very large threads that trigger prompt budgeting and map-reduce analysis.
+"""
+
+import random
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple
+
+WORDS = """
+python javascript rust golang compiler runtime memory latency cache database index query server client
+browser extension thread reply upvote comment opinion advice tutorial course project job interview
+beginner senior framework library package install version update release bug crash error test deploy
+cloud docker container kubernetes network request response stream token model prompt summary answer
+""".split()
+
+AUTHORS = ["u/" + name for name in ("alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel")]
+
+# Reply counts per thread size; "huge" exceeds the default prompt budget and goes through map-reduce
+THREAD_SIZES: Dict[str, int] = {
+    "small": 8,
+    "medium": 60,
+    "large": 400,
+    "huge": 3000
+}
+
+
+def sentence(rng: random.Random, min_words: int, max_words: int) -> str:
+    words = rng.choices(WORDS, k=rng.randint(min_words, max_words))
+    return " ".join(words).capitalize() + "."
+
+
+def make_thread(size: str, platform: str = "reddit", seed: int = 0, salt: str = "") -> dict:
+    """A ThreadData payload with THREAD_SIZES[size] replies; seed and salt make its content (and cache key) unique"""
+    rng = random.Random(f"{salt}:{size}:{platform}:{seed}")
+    reply_count = THREAD_SIZES[size]
+    replies = []
+    for _ in range(reply_count):
+        replies.append({
+            "text": " ".join(sentence(rng, 6, 30) for _ in range(rng.randint(1, 4))),
+            "author": rng.choice(AUTHORS),
+            "upvotes": int(rng.paretovariate(1.2)) - 1,
+            "isTopLevel": rng.random() < 0.6
+        })
+    return {
+        "platform": platform,
+        "post": {
+            "title": f"Bench thread {salt}{seed}: " + sentence(rng, 5, 12),
+            "text": " ".join(sentence(rng, 8, 25) for _ in range(rng.randint(1, 5))),
+            "author": rng.choice(AUTHORS),
+            "upvotes": rng.randint(0, 5000),
+            "url": f"https://example.com/thread/{seed}"
+        },
+        "replies": replies
+    }
+
+
+@dataclass
+class Workload:
+    """A named request mix: each call returns (method, path, json body) for the n-th request"""
+    name: str
+    description: str
+    build: Callable[[int], Tuple[str, str, dict]]
+
+
+def _seed(n: int, repeat_ratio: float, rng: random.Random) -> int:
+    # A share of requests reuse an earlier thread, as when several users open the same popular post
+    if n and rng.random() < repeat_ratio:
+        return rng.randrange(n)
+    return n
+
+
+def summarize_workload(size: str, repeat_ratio: float = 0.0, stream: bool = False, salt: str = "") -> Workload:
+    name = f"summarize-{size}{'-stream' if stream else ''}"
+    # Each workload gets its own threads so it never hits analyses cached by another one
+    salt = salt or name
+    rng = random.Random(salt)
+    path = "/summarize/stream" if stream else "/summarize"
+
+    def build(n: int):
+        seed = _seed(n, repeat_ratio, rng)
+        return "POST", path, make_thread(size, "x" if seed % 4 == 3 else "reddit", seed, salt)
+
+    return Workload(name, f"{path} on {size} threads ({THREAD_SIZES[size]} replies)", build)
+
+
+def chat_workload(size: str, stream: bool = False, salt: str = "") -> Workload:
+    name = f"chat-{size}{'-stream' if stream else ''}"
+    salt = salt or name
+    path = "/chat/stream" if stream else "/chat"
+
+    def build(n: int):
+        return "POST", path, {
+            "thread_data": make_thread(size, seed=n, salt=salt),
+            "messages": [
+                {"role": "assistant", "content": "**Thread Summary** The OP asks which language to learn first."},
+                {"role": "user", "content": "What do most people recommend?"},
+                {"role": "assistant", "content": "Most replies recommend Python."}
+            ],
+            "user_message": "Does anyone disagree?",
+            "has_analysis": True
+        }
+
+    return Workload(name, f"{path} follow-up turns on {size} threads", build)
+
+
+def mixed_workload(repeat_ratio: float = 0.2) -> Workload:
+    """Roughly the production mix: mostly small and medium summaries, some chat and the odd huge thread"""
+    rng = random.Random("mixed")
+    summaries = {size: summarize_workload(size, repeat_ratio, salt="mixed") for size in THREAD_SIZES}
+    chats = chat_workload("medium", salt="mixed")
+    choices: List[Tuple[Workload, float]] = [
+        (summaries["small"], 0.35),
+        (summaries["medium"], 0.3),
+        (summaries["large"], 0.08),
+        (summaries["huge"], 0.02),
+        (chats, 0.25)
+    ]
+
+    def build(n: int):
+        workload = rng.choices([w for w, _ in choices], weights=[p for _, p in choices])[0]
+        return workload.build(n)
+
+    return Workload("mixed", "production-like mix of summaries and chat turns", build)
+
+
+def get_workloads(repeat_ratio: float = 0.0) -> Dict[str, Workload]:
+    workloads = [summarize_workload(size, repeat_ratio) for size in THREAD_SIZES]
+    workloads += [
+        summarize_workload("medium", repeat_ratio, stream=True),
+        chat_workload("medium"),
+        chat_workload("medium", stream=True),
+        mixed_workload(repeat_ratio)
+    ]
+    return {workload.name: workload for workload in workloads}
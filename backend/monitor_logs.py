@@ -1,47 +1,488 @@
 #!/usr/bin/env python3
 """
-Simple log monitor for SpeedThreads backend
-Run this to watch logs in real-time: python monitor_logs.py
+Log monitor for SpeedThreads backend
+Follows the JSON log and shows per-endpoint throughput, latency percentiles,
+error rates and OpenAI token usage over a rolling window.
+
+    python monitor_logs.py                      # live view of speedthreads.log
+    python monitor_logs.py --window 300         # five-minute window
+    python monitor_logs.py --raw                # colorized log lines instead
+    python monitor_logs.py --batch --rotated    # one pass over the log and its backups
+    python monitor_logs.py --batch old.log.gz --json report.json
 """
 
-import time
 import os
+import re
 import sys
+import gzip
+import math
+import time
+import argparse
+import json
+from collections import deque
+from datetime import datetime
 from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+LOG_FILE = "speedthreads.log"
+
+# Latency histogram buckets grow by 5%, so percentiles are within 2.5% of the true value
+BUCKET_GROWTH = 1.05
+BUCKET_MIN_MS = 0.1
+BUCKET_COUNT = 360
+
+# Path segments that identify a resource rather than an endpoint
+ID_SEGMENT_RE = re.compile(r"^(?:\d+|[0-9a-fA-F-]{16,}|[A-Za-z0-9_-]{22,})$")
+
+# Request records of older, plain-text logs
+TEXT_REQUEST_RE = re.compile(r"📤 (\w+) (\S+) - Status: (\d+) - Time: ([\d.]+)s")
+
+COLORS = {"ERROR": "\033[91m", "CRITICAL": "\033[91m", "WARNING": "\033[93m", "INFO": "\033[92m"}
+RESET = "\033[0m"
+
+
+class LatencyHistogram:
+    """Fixed-size log-bucketed histogram: constant memory however many samples it sees"""
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.total = 0
+        self.max_ms = 0.0
+
+    def add(self, ms: float):
+        index = 0 if ms <= BUCKET_MIN_MS else min(int(math.log(ms / BUCKET_MIN_MS, BUCKET_GROWTH)) + 1, BUCKET_COUNT - 1)
+        self.counts[index] += 1
+        self.total += 1
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, fraction: float) -> float:
+        if not self.total:
+            return 0.0
+        rank = max(1, math.ceil(self.total * fraction))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                # Upper bound of the bucket, capped by the largest sample seen
+                return min(BUCKET_MIN_MS * BUCKET_GROWTH ** index, self.max_ms)
+        return self.max_ms
+
+
+class EndpointStats:
+    """Totals for one endpoint over a whole log"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.latency = LatencyHistogram()
+
+    def add(self, ms: float, status: int):
+        self.requests += 1
+        self.errors += status >= 500
+        self.total_ms += ms
+        self.latency.add(ms)
 
-def monitor_logs():
-    log_file = Path("speedthreads.log")
-    
-    if not log_file.exists():
-        print("📄 No log file found. Start the server first to create logs.")
-        return
-    
-    print("🔍 Monitoring SpeedThreads logs... (Press Ctrl+C to stop)")
-    print("=" * 60)
-    
+
+class TokenStats:
+    """OpenAI calls, token usage and estimated cost for one operation or route"""
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt = 0
+        self.cached = 0
+        self.completion = 0
+        self.cost_usd = 0.0
+        self.total_ms = 0.0
+
+    def add(self, record: dict):
+        self.calls += 1
+        self.prompt += record.get("prompt_tokens") or 0
+        self.cached += record.get("cached_tokens") or 0
+        self.completion += record.get("completion_tokens") or 0
+        self.cost_usd += record.get("cost_usd") or 0
+        self.total_ms += record.get("duration_ms") or 0
+
+
+def endpoint_name(method: str, path: str) -> str:
+    """METHOD /path with resource ids folded, so /jobs/<id> counts as one endpoint"""
+    segments = [":id" if ID_SEGMENT_RE.match(segment) else segment for segment in path.split("?", 1)[0].split("/")]
+    return f"{method} {'/'.join(segments)}"
+
+
+_second_cache: Tuple[str, float] = ("", 0.0)
+
+
+def record_time(record: dict) -> Optional[float]:
+    """Epoch seconds of a record's "ts" field; parses each distinct second only once"""
+    global _second_cache
+    ts = record.get("ts")
+    if not ts:
+        return None
     try:
-        with open(log_file, 'r') as f:
-            # Go to end of file
-            f.seek(0, 2)
-            
-            while True:
-                line = f.readline()
-                if line:
-                    # Color code different log levels
-                    if "ERROR" in line:
-                        print(f"\033[91m{line.strip()}\033[0m")  # Red for errors
-                    elif "WARNING" in line:
-                        print(f"\033[93m{line.strip()}\033[0m")  # Yellow for warnings
-                    elif "INFO" in line:
-                        print(f"\033[92m{line.strip()}\033[0m")  # Green for info
-                    else:
-                        print(line.strip())
-                else:
-                    time.sleep(0.1)
+        if ts[:19] != _second_cache[0]:
+            _second_cache = (ts[:19], datetime.fromisoformat(ts[:19] + ts[23:]).timestamp())
+        return _second_cache[1] + int(ts[20:23]) / 1000
+    except ValueError:
+        return None
+
+
+def parse_line(line: str) -> Optional[dict]:
+    """The record on a log line: a JSON object, or a request parsed from a plain-text line"""
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith("{"):
+        try:
+            record = loads(line)
+            return record if isinstance(record, dict) else None
+        except ValueError:
+            return None
+    match = TEXT_REQUEST_RE.search(line)
+    if match:
+        method, path, status, seconds = match.groups()
+        return {"event": "request", "method": method, "path": path, "status": int(status), "duration_ms": float(seconds) * 1000}
+    return {"message": line}
+
+
+def follow(path: Path, from_start: bool = False) -> Iterator[Optional[str]]:
+    """Yield lines appended to a log file, surviving rotation and truncation.
+
+    Reads everything available in large blocks; yields None whenever it has
+    caught up, so callers can redraw between polls. When the file is rotated
+    (a new file appears under the same name) the rest of the old one is read
+    before switching over.
+    """
+    handle = None
+    inode = None
+    pending = ""
+    idle = 0.05
+
+    while True:
+        if handle is None:
+            try:
+                handle = open(path, "r", encoding="utf-8", errors="replace")
+            except FileNotFoundError:
+                yield None
+                time.sleep(1)
+                continue
+            inode = os.fstat(handle.fileno()).st_ino
+            if not from_start:
+                handle.seek(0, os.SEEK_END)
+            from_start = True
+
+        block = handle.read(1 << 16)
+        if block:
+            idle = 0.05
+            lines = (pending + block).split("\n")
+            pending = lines.pop()
+            yield from lines
+            continue
+
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            stat = None
+        if stat is None or stat.st_ino != inode:
+            # Rotated: the old file is fully read, continue with the new one from its start
+            handle.close()
+            handle = None
+            if pending:
+                yield pending
+                pending = ""
+            continue
+        if stat.st_size < handle.tell():
+            # Truncated in place
+            handle.seek(0)
+            pending = ""
+            continue
+
+        yield None
+        # Back off while the log is quiet, up to half a second
+        time.sleep(idle)
+        idle = min(idle * 2, 0.5)
+
+
+class RollingWindow:
+    """Requests, errors and OpenAI usage over the last `seconds`, plus running totals"""
+
+    def __init__(self, seconds: float, recent_errors: int = 5):
+        self.seconds = seconds
+        self.requests: Dict[str, deque] = {}
+        self.calls: deque = deque()
+        self.errors: deque = deque(maxlen=recent_errors)
+        self.total_requests = 0
+        self.total_errors = 0
+        self.tokens = TokenStats()
+        self.started = time.time()
+
+    def add(self, record: dict, now: float):
+        event = record.get("event")
+        if event == "request":
+            name = endpoint_name(record.get("method", "?"), record.get("path", "?"))
+            status = int(record.get("status") or 0)
+            self.requests.setdefault(name, deque()).append((now, float(record.get("duration_ms") or 0), status >= 500))
+            self.total_requests += 1
+            self.total_errors += status >= 500
+        elif event == "openai_call":
+            self.calls.append((now, record.get("operation", "?"), record.get("prompt_tokens") or 0,
+                               record.get("cached_tokens") or 0, record.get("completion_tokens") or 0))
+            self.tokens.add(record)
+        if record.get("level") in ("ERROR", "CRITICAL"):
+            self.errors.append((record.get("ts", "")[11:19], record.get("message", "")))
+
+    def expire(self, now: float):
+        cutoff = now - self.seconds
+        for name in list(self.requests):
+            samples = self.requests[name]
+            while samples and samples[0][0] < cutoff:
+                samples.popleft()
+            if not samples:
+                del self.requests[name]
+        while self.calls and self.calls[0][0] < cutoff:
+            self.calls.popleft()
+
+    def render(self, source: Path) -> str:
+        span = min(self.seconds, max(time.time() - self.started, 1))
+        lines = [
+            f"🔍 SpeedThreads - {source} - last {self.seconds:.0f}s - {datetime.now():%H:%M:%S}",
+            "",
+            f"{'endpoint':<32} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'err %':>6}"
+        ]
+        for name, samples in sorted(self.requests.items(), key=lambda item: -len(item[1])):
+            durations = sorted(sample[1] for sample in samples)
+            errors = sum(sample[2] for sample in samples)
+            lines.append(
+                f"{name[:32]:<32} {len(samples) / span:>7.1f} {exact_percentile(durations, 0.50):>8.1f} "
+                f"{exact_percentile(durations, 0.95):>8.1f} {exact_percentile(durations, 0.99):>8.1f} {100 * errors / len(samples):>6.1f}"
+            )
+        if not self.requests:
+            lines.append("  (no requests in the window)")
+
+        lines += ["", f"{'OpenAI operation':<32} {'calls':>7} {'in tok':>9} {'cached':>9} {'out tok':>9} {'tok/s':>7}"]
+        by_operation: Dict[str, List[int]] = {}
+        for _, operation, prompt, cached, completion in self.calls:
+            totals = by_operation.setdefault(operation, [0, 0, 0, 0])
+            totals[0] += 1
+            totals[1] += prompt
+            totals[2] += cached
+            totals[3] += completion
+        for operation, (calls, prompt, cached, completion) in sorted(by_operation.items()):
+            lines.append(f"{operation[:32]:<32} {calls:>7} {prompt:>9} {cached:>9} {completion:>9} {(prompt + completion) / span:>7.0f}")
+        if not by_operation:
+            lines.append("  (no OpenAI calls in the window)")
+
+        lines += [
+            "",
+            f"Since start: {self.total_requests} requests, {self.total_errors} server errors, "
+            f"{self.tokens.calls} OpenAI calls, {self.tokens.prompt} tokens in ({self.tokens.cached} cached) / {self.tokens.completion} out, ${self.tokens.cost_usd:.4f}"
+        ]
+        if self.errors:
+            lines += ["", "Recent errors:"] + [f"\033[91m  {ts} {message[:100]}{RESET}" for ts, message in self.errors]
+        return "\n".join(lines)
+
+
+def exact_percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(len(sorted_values) * fraction) - 1))]
+
+
+def monitor_live(path: Path, window: float, refresh: float):
+    stats = RollingWindow(window)
+    interactive = sys.stdout.isatty()
+    next_draw = 0.0
+    for line in follow(path):
+        now = time.time()
+        if line is not None:
+            record = parse_line(line)
+            if record:
+                stats.add(record, now)
+        if now >= next_draw:
+            stats.expire(now)
+            # Redraw in place on a terminal; append snapshots when piped
+            print(("\033[H\033[J" if interactive else "\n") + stats.render(path), flush=True)
+            next_draw = now + refresh
+
+
+def monitor_raw(path: Path):
+    """Print new log lines, colored by level"""
+    for line in follow(path):
+        if line is None:
+            continue
+        record = parse_line(line)
+        if not record:
+            continue
+        level = record.get("level", "")
+        text = f"{record.get('ts', '')[11:23]} {level:<7} [{record.get('request_id', '-')}] {record['message']}" if "ts" in record else line.strip()
+        color = COLORS.get(level)
+        print(f"{color}{text}{RESET}" if color else text, flush=True)
+
+
+def rotated_files(path: Path) -> List[Path]:
+    """A log and its RotatingFileHandler backups, oldest first"""
+    backups = sorted(
+        (p for p in path.parent.glob(path.name + ".*") if p.name[len(path.name) + 1:].split(".")[0].isdigit()),
+        key=lambda p: int(p.name[len(path.name) + 1:].split(".")[0]),
+        reverse=True
+    )
+    return backups + [path]
+
+
+def read_lines(paths: Iterable[Path]) -> Iterator[str]:
+    for path in paths:
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+            yield from f
+
+
+def analyze(lines: Iterable[str]) -> dict:
+    """One streaming pass over a log.
+
+    Memory stays bounded whatever the log size: latencies go into fixed-size
+    histograms, and throughput is tracked one second at a time.
+    """
+    endpoints: Dict[str, EndpointStats] = {}
+    operations: Dict[str, TokenStats] = {}
+    levels: Dict[str, int] = {}
+    first = last = None
+    current_second = None
+    current_count = peak_rps = 0
+    lines_read = unparsed = 0
+
+    for line in lines:
+        lines_read += 1
+        record = parse_line(line)
+        if record is None:
+            continue
+        if "ts" not in record and "event" not in record:
+            unparsed += 1
+            continue
+        level = record.get("level")
+        if level:
+            levels[level] = levels.get(level, 0) + 1
+        event = record.get("event")
+        if event not in ("request", "openai_call"):
+            continue
+
+        ts = record_time(record)
+        if ts is not None:
+            first = ts if first is None else min(first, ts)
+            last = ts if last is None else max(last, ts)
+
+        if event == "request":
+            name = endpoint_name(record.get("method", "?"), record.get("path", "?"))
+            endpoints.setdefault(name, EndpointStats()).add(float(record.get("duration_ms") or 0), int(record.get("status") or 0))
+            if ts is not None:
+                second = int(ts)
+                if second != current_second:
+                    peak_rps = max(peak_rps, current_count)
+                    current_second, current_count = second, 0
+                current_count += 1
+        else:
+            # Calls are grouped by routing tier when the log records one
+            operations.setdefault(f"{record.get('route') or record.get('operation', '?')} ({record.get('model', '?')})", TokenStats()).add(record)
+
+    span = (last - first) if first is not None and last is not None else 0
+    return {
+        "lines": lines_read,
+        "unparsed_lines": unparsed,
+        "first": datetime.fromtimestamp(first).isoformat(timespec="seconds") if first is not None else None,
+        "last": datetime.fromtimestamp(last).isoformat(timespec="seconds") if last is not None else None,
+        "span_seconds": round(span, 1),
+        "peak_rps": max(peak_rps, current_count),
+        "levels": levels,
+        "endpoints": {
+            name: {
+                "requests": stats.requests,
+                "rps": round(stats.requests / span, 2) if span else None,
+                "mean_ms": round(stats.total_ms / stats.requests, 1),
+                "p50_ms": round(stats.latency.percentile(0.50), 1),
+                "p95_ms": round(stats.latency.percentile(0.95), 1),
+                "p99_ms": round(stats.latency.percentile(0.99), 1),
+                "max_ms": round(stats.latency.max_ms, 1),
+                "error_rate": round(stats.errors / stats.requests, 4)
+            }
+            for name, stats in sorted(endpoints.items(), key=lambda item: -item[1].requests)
+        },
+        "openai": {
+            name: {
+                "calls": stats.calls,
+                "prompt_tokens": stats.prompt,
+                "cached_tokens": stats.cached,
+                "completion_tokens": stats.completion,
+                "cost_usd": round(stats.cost_usd, 6),
+                "mean_ms": round(stats.total_ms / stats.calls, 1)
+            }
+            for name, stats in sorted(operations.items())
+        }
+    }
+
+
+def print_report(report: dict):
+    print(f"📊 {report['lines']} lines, {report['first']} → {report['last']} ({report['span_seconds']}s), peak {report['peak_rps']} requests/s")
+    print("   " + ", ".join(f"{level}: {count}" for level, count in sorted(report["levels"].items())))
+    print()
+    print(f"{'endpoint':<32} {'requests':>9} {'rps':>7} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>9} {'err %':>6}")
+    for name, e in report["endpoints"].items():
+        rps = f"{e['rps']:.2f}" if e["rps"] is not None else "-"
+        print(f"{name[:32]:<32} {e['requests']:>9} {rps:>7} {e['mean_ms']:>8} {e['p50_ms']:>8} {e['p95_ms']:>8} {e['p99_ms']:>8} {e['max_ms']:>9} {100 * e['error_rate']:>6.2f}")
+    print()
+    print(f"{'OpenAI route (model)':<40} {'calls':>7} {'in tok':>11} {'cached':>11} {'out tok':>10} {'cost $':>10} {'mean ms':>8}")
+    for name, o in report["openai"].items():
+        print(f"{name[:40]:<40} {o['calls']:>7} {o['prompt_tokens']:>11} {o['cached_tokens']:>11} {o['completion_tokens']:>10} {o['cost_usd']:>10.4f} {o['mean_ms']:>8}")
+    if not report["openai"]:
+        print("  (no OpenAI calls)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Live and historical latency, throughput and token usage from the SpeedThreads log")
+    parser.add_argument("paths", nargs="*", type=Path, help=f"Log files (default: {LOG_FILE}); batch mode reads them in order, .gz allowed")
+    parser.add_argument("--batch", action="store_true", help="Analyze the whole log in one pass and exit")
+    parser.add_argument("--rotated", action="store_true", help="Batch mode: include the log's rotated backups, oldest first")
+    parser.add_argument("--json", dest="json_path", help="Batch mode: also write the report to this JSON file")
+    parser.add_argument("--window", type=float, default=60, help="Live mode: rolling window in seconds")
+    parser.add_argument("--refresh", type=float, default=2, help="Live mode: seconds between redraws")
+    parser.add_argument("--raw", action="store_true", help="Live mode: print colorized log lines instead of statistics")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    paths = args.paths or [Path(LOG_FILE)]
+
+    try:
+        if args.batch:
+            if args.rotated:
+                paths = [p for path in paths for p in rotated_files(path)]
+            missing = [str(p) for p in paths if not p.exists()]
+            if missing:
+                print(f"📄 Log file not found: {', '.join(missing)}")
+                sys.exit(1)
+            report = analyze(read_lines(paths))
+            print_report(report)
+            if args.json_path:
+                with open(args.json_path, "w") as f:
+                    json.dump(report, f, indent=2, ensure_ascii=False)
+            return
+
+        if not paths[0].exists():
+            print("📄 No log file yet - waiting for the server to create it...")
+        if args.raw:
+            print("🔍 Monitoring SpeedThreads logs... (Press Ctrl+C to stop)")
+            print("=" * 60)
+            monitor_raw(paths[0])
+        else:
+            monitor_live(paths[0], args.window, args.refresh)
     except KeyboardInterrupt:
         print("\n👋 Log monitoring stopped.")
-    except Exception as e:
-        print(f"❌ Error monitoring logs: {e}")
+
 
 if __name__ == "__main__":
-    monitor_logs()
+    main()
@@ -0,0 +1,158 @@
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Optional
+from .metrics import record_error
+from .resilience import UpstreamUnavailable
+
+# Set up logger for this module
+logger = logging.getLogger(__name__)
+
+
+class UpstreamOverloaded(UpstreamUnavailable):
+    """Raised when every upstream slot is busy and the wait queue is full or too slow"""
+
+
+class RateLimiter:
+    """Per-client token buckets: `rate` requests per second with bursts up to `burst`.
+
+    Buckets live in a bounded LRU; a client that is evicted simply starts
+    again with a full bucket.
+    """
+
+    def __init__(self, rate: float = 1.0, burst: float = 20, max_clients: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, list[float]]" = OrderedDict()
+        self._counters = {"allowed": 0, "limited": 0}
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        """Build a limiter from RATE_LIMIT_* environment variables"""
+        return cls(
+            rate=float(os.getenv("RATE_LIMIT_PER_SECOND", "1.0")),
+            burst=float(os.getenv("RATE_LIMIT_BURST", "20")),
+            max_clients=int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "100000"))
+        )
+
+    def acquire(self, key: str, cost: float = 1) -> Optional[float]:
+        """Take `cost` tokens from the client's bucket; returns None if allowed, else seconds until it would be.
+
+        A cost above `burst` can never be admitted; callers reject such requests first.
+        """
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+
+        tokens, updated_at = bucket
+        tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+        if tokens >= cost:
+            bucket[0], bucket[1] = tokens - cost, now
+            self._counters["allowed"] += 1
+            return None
+
+        bucket[0], bucket[1] = tokens, now
+        self._counters["limited"] += 1
+        record_error("rate_limited")
+        return (cost - tokens) / self.rate if self.rate > 0 else 60.0
+
+    def stats(self) -> dict:
+        return {**self._counters, "clients": len(self._buckets), "rate": self.rate, "burst": self.burst}
+
+
+class UpstreamLimiter:
+    """Global cap on concurrent upstream calls with a bounded FIFO wait queue.
+
+    Used like a semaphore. When all slots are taken, at most max_queue callers
+    wait, each for at most max_wait seconds; anyone beyond that is rejected
+    with UpstreamOverloaded instead of letting latency grow without limit.
+    """
+
+    def __init__(self, max_concurrency: int = 16, max_queue: int = 64, max_wait: float = 10):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._active = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+        self._counters = {"admitted": 0, "queued": 0, "rejected_queue_full": 0, "rejected_timeout": 0}
+
+    @classmethod
+    def from_env(cls) -> "UpstreamLimiter":
+        """Build a limiter from OPENAI_MAX_CONCURRENCY and OPENAI_QUEUE_* environment variables"""
+        return cls(
+            max_concurrency=int(os.getenv("OPENAI_MAX_CONCURRENCY", "16")),
+            max_queue=int(os.getenv("OPENAI_QUEUE_MAX", "64")),
+            max_wait=float(os.getenv("OPENAI_QUEUE_MAX_WAIT_SECONDS", "10"))
+        )
+
+    def locked(self) -> bool:
+        return self._active >= self.max_concurrency
+
+    def _retry_after(self) -> float:
+        return max(1.0, self.max_wait / 2)
+
+    async def acquire(self):
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            self._counters["admitted"] += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self._counters["rejected_queue_full"] += 1
+            record_error("overloaded")
+            raise UpstreamOverloaded("Too many requests waiting for the AI service", self._retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._counters["queued"] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up: pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._counters["rejected_timeout"] += 1
+            record_error("overloaded")
+            raise UpstreamOverloaded("Timed out waiting for the AI service", self._retry_after()) from None
+        self._counters["admitted"] += 1
+
+    def release(self):
+        # Hand the slot straight to the next waiter so newcomers can't jump the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+    def stats(self) -> dict:
+        return {
+            **self._counters,
+            "active": self._active,
+            "waiting": len(self._waiters),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue
+        }
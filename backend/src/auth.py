@@ -0,0 +1,162 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Optional
+import jwt
+
+# Set up logger for this module
+logger = logging.getLogger(__name__)
+
+# Supabase issues user access tokens for this audience
+SUPABASE_AUDIENCE = "authenticated"
+
+# Algorithms Supabase uses for access tokens: the legacy shared secret or asymmetric signing keys
+SHARED_SECRET_ALGORITHMS = ["HS256"]
+SIGNING_KEY_ALGORITHMS = ["RS256", "ES256"]
+
+# How long a remotely validated token is trusted when it carries no readable expiry
+REMOTE_RESULT_TTL_SECONDS = 60
+
+
+class TokenVerificationUnavailable(Exception):
+    """Raised when a token can be checked neither locally nor remotely"""
+
+
+class TokenVerifier:
+    """Verify Supabase access tokens locally, caching decoded users until expiry"""
+
+    def __init__(
+        self,
+        supabase_url: Optional[str] = None,
+        jwt_secret: Optional[str] = None,
+        supabase_client=None,
+        remote_fallback: bool = True,
+        cache_max_entries: int = 10000
+    ):
+        self.jwt_secret = jwt_secret
+        self.supabase = supabase_client
+        self.remote_fallback = remote_fallback
+        self.cache_max_entries = cache_max_entries
+        self._cache: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self._counters = {"cache_hits": 0, "local": 0, "remote": 0, "rejected": 0}
+
+        # Signing keys are fetched once and cached by the JWKS client
+        self._jwks = None
+        if supabase_url:
+            self._jwks = jwt.PyJWKClient(
+                f"{supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json",
+                cache_keys=True,
+                lifespan=3600,
+                timeout=5
+            )
+
+    @classmethod
+    def from_env(cls, supabase_client=None) -> "TokenVerifier":
+        """Build a verifier from SUPABASE_* and AUTH_* environment variables"""
+        return cls(
+            supabase_url=os.getenv("SUPABASE_URL") or None,
+            jwt_secret=os.getenv("SUPABASE_JWT_SECRET") or None,
+            supabase_client=supabase_client,
+            remote_fallback=os.getenv("AUTH_REMOTE_FALLBACK", "true").lower() == "true",
+            cache_max_entries=int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+        )
+
+    @property
+    def available(self) -> bool:
+        return bool(self.jwt_secret or self._jwks or (self.remote_fallback and self.supabase))
+
+    async def verify(self, token: str) -> Optional[dict]:
+        """Return the token's user (id, email, user_metadata), or None if it's invalid"""
+        cache_key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        entry = self._cache.get(cache_key)
+        if entry is not None:
+            expires_at, user = entry
+            if time.time() < expires_at:
+                self._cache.move_to_end(cache_key)
+                self._counters["cache_hits"] += 1
+                return user
+            del self._cache[cache_key]
+
+        try:
+            claims = await self._decode_locally(token)
+        except jwt.InvalidTokenError as e:
+            # Bad signature, expired, wrong audience: the remote check would reject it too
+            logger.warning(f"❌ Token rejected locally: {str(e)}")
+            self._counters["rejected"] += 1
+            return None
+
+        if claims is not None:
+            self._counters["local"] += 1
+            user = {
+                "id": claims["sub"],
+                "email": claims.get("email"),
+                "user_metadata": claims.get("user_metadata") or {}
+            }
+            self._remember(cache_key, claims["exp"], user)
+            return user
+
+        user = await self._verify_remotely(token)
+        if user is not None:
+            self._counters["remote"] += 1
+            self._remember(cache_key, self._unverified_expiry(token), user)
+        else:
+            self._counters["rejected"] += 1
+        return user
+
+    async def _decode_locally(self, token: str) -> Optional[dict]:
+        """Decoded claims, or None when no local key can check this token"""
+        algorithm = jwt.get_unverified_header(token).get("alg")
+        options = {"require": ["sub", "exp"]}
+
+        if algorithm in SHARED_SECRET_ALGORITHMS and self.jwt_secret:
+            return jwt.decode(
+                token, self.jwt_secret,
+                algorithms=SHARED_SECRET_ALGORITHMS, audience=SUPABASE_AUDIENCE, options=options
+            )
+
+        if algorithm in SIGNING_KEY_ALGORITHMS and self._jwks is not None:
+            try:
+                # The JWKS client does blocking HTTP on a cache miss
+                signing_key = await asyncio.to_thread(self._jwks.get_signing_key_from_jwt, token)
+            except jwt.PyJWKClientError as e:
+                logger.warning(f"⚠️ Could not load Supabase signing keys: {e}")
+                return None
+            return jwt.decode(
+                token, signing_key.key,
+                algorithms=SIGNING_KEY_ALGORITHMS, audience=SUPABASE_AUDIENCE, options=options
+            )
+
+        return None
+
+    async def _verify_remotely(self, token: str) -> Optional[dict]:
+        if not (self.remote_fallback and self.supabase):
+            raise TokenVerificationUnavailable("No local key or remote fallback for this token")
+
+        logger.info("🌐 Falling back to Supabase for token validation")
+        response = await asyncio.to_thread(self.supabase.auth.get_user, token)
+        if not response or not response.user:
+            return None
+        return {
+            "id": response.user.id,
+            "email": response.user.email,
+            "user_metadata": response.user.user_metadata
+        }
+
+    def _unverified_expiry(self, token: str) -> float:
+        try:
+            claims = jwt.decode(token, options={"verify_signature": False})
+            return float(claims["exp"])
+        except (jwt.InvalidTokenError, KeyError, TypeError, ValueError):
+            return time.time() + REMOTE_RESULT_TTL_SECONDS
+
+    def _remember(self, cache_key: str, expires_at: float, user: dict):
+        self._cache[cache_key] = (expires_at, user)
+        self._cache.move_to_end(cache_key)
+        while len(self._cache) > self.cache_max_entries:
+            self._cache.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {**self._counters, "cached_tokens": len(self._cache)}
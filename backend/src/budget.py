@@ -0,0 +1,178 @@
+import re
+import math
+import heapq
+from dataclasses import dataclass, field
+from typing import List, Tuple
+from .models import ReplyData
+
+# Rough OpenAI tokenizer ratio for English text; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+# Replies with fewer distinct content words than this are never dropped as redundant
+MIN_WORDS_FOR_NOVELTY = 5
+
+# Replies adding less than this fraction of unseen words are considered redundant
+MIN_NOVELTY = 0.2
+
+WORD_RE = re.compile(r"[a-z0-9']{4,}")
+
+# Common words that say nothing about whether a reply adds something new
+STOPWORDS = frozenset("""
+about above after again against also because been before being below between both
+could didn't does doesn't doing don't down during each even every from further have
+haven't having here just like more most much must never only other over really same
+should some such than that that's their them then there these they this those through
+very want well were what when where which while will with would your you're yours
+""".split())
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for prompt budgeting"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def truncate_text(text: str, max_chars: int) -> str:
+    """Cut text to max_chars, marking the cut with an ellipsis"""
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rstrip() + "…"
+
+
+def format_reply(index: int, reply: ReplyData, text: str) -> List[str]:
+    """Prompt lines for one reply"""
+    lines = [f"{index}. {text}"]
+    if reply.author:
+        lines.append(f"   - {reply.author}")
+    if reply.upvotes:
+        lines.append(f"   - {reply.upvotes} upvotes")
+    duplicates = getattr(reply, "duplicates", 0)
+    if duplicates:
+        lines.append(f"   - said in {duplicates + 1} near-identical replies")
+    lines.append("")
+    return lines
+
+
+@dataclass
+class ReplySelection:
+    """Replies chosen for a prompt, in thread order, with truncation stats"""
+    replies: List[Tuple[int, ReplyData, str]] = field(default_factory=list)
+    total_replies: int = 0
+    dropped_for_budget: int = 0
+    dropped_as_redundant: int = 0
+    truncated_texts: int = 0
+    estimated_tokens: int = 0
+
+    @property
+    def truncated(self) -> bool:
+        return len(self.replies) < self.total_replies or self.truncated_texts > 0
+
+
+def _base_score(reply: ReplyData, max_log_upvotes: float, word_count: int) -> float:
+    upvote_score = math.log1p(max(reply.upvotes or 0, 0)) / max_log_upvotes if max_log_upvotes else 0.0
+    top_level_score = 0.3 if reply.isTopLevel else 0.0
+    length_score = 0.3 * min(word_count, 60) / 60
+    return upvote_score + top_level_score + length_score
+
+
+def select_replies(
+    replies: List[ReplyData],
+    budget_tokens: int,
+    max_reply_chars: int,
+    drop_redundant: bool = True
+) -> ReplySelection:
+    """Pick the most valuable replies that fit in budget_tokens.
+
+    Replies are scored by upvotes, top-level status and length, then chosen
+    greedily with the score scaled by novelty (the share of words not already
+    covered by chosen replies). Novelty only shrinks as replies are chosen, so
+    stale heap entries are re-scored lazily when they reach the top. With
+    drop_redundant, replies that add almost nothing new are skipped outright.
+    """
+    selection = ReplySelection(total_replies=len(replies))
+    if not replies:
+        return selection
+
+    texts = [truncate_text(reply.text, max_reply_chars) for reply in replies]
+    costs = [
+        estimate_tokens("\n".join(format_reply(i + 1, reply, texts[i])))
+        for i, reply in enumerate(replies)
+    ]
+
+    # Everything fits: keep the whole thread
+    if sum(costs) <= budget_tokens:
+        _finish(selection, replies, texts, range(len(replies)))
+        selection.estimated_tokens = sum(costs)
+        return selection
+
+    max_log_upvotes = max(math.log1p(max(reply.upvotes or 0, 0)) for reply in replies)
+    words = {}
+    heap = []
+    for i, reply in enumerate(replies):
+        base = _base_score(reply, max_log_upvotes, texts[i].count(" ") + 1)
+        # Heap entries are (-score, index, base score); score starts at full novelty
+        heap.append((-base, i, base))
+    heapq.heapify(heap)
+
+    seen_words: set = set()
+    chosen = []
+    remaining = budget_tokens
+    min_cost = min(costs)
+    while heap and remaining >= min_cost:
+        neg_score, i, base = heapq.heappop(heap)
+        # The remaining budget only shrinks, so a reply that doesn't fit now never will
+        cost = costs[i]
+        if cost > remaining:
+            selection.dropped_for_budget += 1
+            continue
+
+        # Tokenize lazily: most replies of a huge thread never reach this point
+        reply_words = words.get(i)
+        if reply_words is None:
+            reply_words = words[i] = set(WORD_RE.findall(texts[i].lower())) - STOPWORDS
+        novelty = len(reply_words - seen_words) / len(reply_words) if reply_words else 1.0
+        score = base * (0.5 + 0.5 * novelty)
+        if score < -neg_score - 1e-9 and heap and score < -heap[0][0]:
+            # Stale entry: re-queue with its current score
+            heapq.heappush(heap, (-score, i, base))
+            continue
+
+        if drop_redundant and len(reply_words) >= MIN_WORDS_FOR_NOVELTY and novelty < MIN_NOVELTY:
+            selection.dropped_as_redundant += 1
+            continue
+
+        chosen.append(i)
+        seen_words |= reply_words
+        remaining -= cost
+        selection.estimated_tokens += cost
+
+    # Whatever is left in the heap didn't fit
+    selection.dropped_for_budget += len(heap)
+
+    _finish(selection, replies, texts, chosen)
+    return selection
+
+
+def _finish(selection: ReplySelection, replies: List[ReplyData], texts: List[str], chosen) -> None:
+    # Present the chosen replies in their original thread order
+    for i in sorted(chosen):
+        if len(texts[i]) < len(replies[i].text):
+            selection.truncated_texts += 1
+        selection.replies.append((i + 1, replies[i], texts[i]))
+
+
+def chunk_replies(replies: List[Tuple[int, ReplyData, str]], chunk_tokens: int) -> List[List[Tuple[int, ReplyData, str]]]:
+    """Split (index, reply, text) entries into consecutive chunks of about chunk_tokens each"""
+    chunks = []
+    current = []
+    current_tokens = 0
+    for index, reply, text in replies:
+        cost = estimate_tokens("\n".join(format_reply(index, reply, text)))
+        if current and current_tokens + cost > chunk_tokens:
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+        current.append((index, reply, text))
+        current_tokens += cost
+    if current:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,247 @@
+import os
+import time
+import json
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional
+from .models import PostData, ReplyData, ThreadData, SummaryResponse
+
+# Set up logger for this module
+logger = logging.getLogger(__name__)
+
+# Bump when the prompt or response schema changes so stale analyses are not served
+CACHE_KEY_VERSION = "v1"
+
+
+def thread_cache_key(thread_data: ThreadData) -> str:
+    """Content-addressed key for a thread: hash of its canonical JSON form"""
+    canonical = json.dumps(
+        thread_data.model_dump(mode="json"),
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False
+    )
+    digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    return f"{CACHE_KEY_VERSION}:{digest}"
+
+
+def thread_identity_key(platform: str, post: PostData) -> str:
+    """Key of the latest analysis of a thread, whatever replies it had: the post URL, or the post itself"""
+    identity = post.url or json.dumps([post.title, post.text, post.author], ensure_ascii=False)
+    digest = hashlib.sha256(f"{platform}:{identity}".encode("utf-8")).hexdigest()
+    return f"{CACHE_KEY_VERSION}:thread:{digest}"
+
+
+def update_cache_key(previous: SummaryResponse, new_replies: list[ReplyData]) -> str:
+    """Content-addressed key for a previous analysis updated with new replies"""
+    canonical = json.dumps(
+        [previous.model_dump(mode="json"), [reply.model_dump(mode="json") for reply in new_replies]],
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False
+    )
+    digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    return f"{CACHE_KEY_VERSION}:update:{digest}"
+
+
+class AnalysisCache:
+    """Two-tier cache of thread analyses: in-memory LRU with TTL, plus optional SQLite.
+
+    Expired analyses are kept for another stale_seconds so they can still be
+    served while OpenAI is unavailable.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600,
+        db_path: Optional[str] = None,
+        db_ttl_seconds: float = 86400,
+        stale_seconds: float = 86400
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.db_ttl_seconds = db_ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._entries: "OrderedDict[str, tuple[float, SummaryResponse]]" = OrderedDict()
+        self._stale: "OrderedDict[str, tuple[float, SummaryResponse]]" = OrderedDict()
+        # Thread identity key of each analysis, so an analysis id can't be applied to another thread
+        self._threads: "OrderedDict[str, str]" = OrderedDict()
+        self._counters = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "stale_hits": 0
+        }
+
+        self._db = None
+        self._db_lock = threading.Lock()
+        if db_path:
+            self._open_db(db_path)
+
+    @classmethod
+    def from_env(cls) -> "AnalysisCache":
+        """Build a cache from ANALYSIS_CACHE_* environment variables"""
+        return cls(
+            max_entries=int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "1024")),
+            ttl_seconds=float(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", "3600")),
+            db_path=os.getenv("ANALYSIS_CACHE_DB") or None,
+            db_ttl_seconds=float(os.getenv("ANALYSIS_CACHE_DB_TTL_SECONDS", "86400")),
+            stale_seconds=float(os.getenv("ANALYSIS_CACHE_STALE_SECONDS", "86400"))
+        )
+
+    def _open_db(self, db_path: str):
+        try:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS analyses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, thread TEXT)"
+            )
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(analyses)")}
+            if "thread" not in columns:
+                # Databases written before analyses recorded their thread
+                self._db.execute("ALTER TABLE analyses ADD COLUMN thread TEXT")
+            cutoff = time.time() - self.db_ttl_seconds - self.stale_seconds
+            self._db.execute("DELETE FROM analyses WHERE created_at < ?", (cutoff,))
+            self._db.commit()
+            logger.info(f"💾 Analysis cache SQLite tier enabled at {db_path}")
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Could not open analysis cache database {db_path}: {e} - using memory only")
+            self._db = None
+
+    async def get(self, key: str, count_miss: bool = True) -> Optional[SummaryResponse]:
+        """Return a cached analysis, checking memory first and then SQLite.
+
+        Callers that fall back to get_stale pass count_miss=False and call
+        record_miss() only when neither lookup finds anything.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            stored_at, value = entry
+            if time.monotonic() - stored_at <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                self._counters["memory_hits"] += 1
+                return value
+            del self._entries[key]
+            self._counters["expirations"] += 1
+            self._keep_stale(key, entry)
+
+        if self._db is not None:
+            value = await asyncio.to_thread(self._db_get, key)
+            if value is not None:
+                self._remember(key, value)
+                self._counters["hits"] += 1
+                self._counters["disk_hits"] += 1
+                return value
+
+        if count_miss:
+            self.record_miss()
+        return None
+
+    def record_miss(self):
+        self._counters["misses"] += 1
+
+    async def thread_of(self, key: str) -> Optional[str]:
+        """Thread identity key the analysis stored under key was made for, if known"""
+        thread = self._threads.get(key)
+        if thread is None and self._db is not None:
+            thread = await asyncio.to_thread(self._db_thread, key)
+        return thread
+
+    async def get_stale(self, key: str) -> Optional[SummaryResponse]:
+        """Return an analysis even if it has expired, as long as it is within the stale window"""
+        value = None
+        for entries in (self._entries, self._stale):
+            entry = entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl_seconds + self.stale_seconds:
+                value = entry[1]
+                break
+        if value is None and self._db is not None:
+            value = await asyncio.to_thread(self._db_get, key, self.db_ttl_seconds + self.stale_seconds)
+        if value is not None:
+            self._counters["stale_hits"] += 1
+        return value
+
+    async def set(self, key: str, value: SummaryResponse, thread: Optional[str] = None):
+        """Store an analysis, and the identity key of its thread, in memory and, when enabled, in SQLite"""
+        self._remember(key, value)
+        if thread is not None:
+            self._threads[key] = thread
+            self._threads.move_to_end(key)
+            # Stale entries can outlive live ones, so keep room for both
+            while len(self._threads) > 2 * self.max_entries:
+                self._threads.popitem(last=False)
+        self._counters["sets"] += 1
+        if self._db is not None:
+            await asyncio.to_thread(self._db_set, key, value, thread)
+
+    def _remember(self, key: str, value: SummaryResponse):
+        self._stale.pop(key, None)
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _keep_stale(self, key: str, entry: tuple):
+        self._stale[key] = entry
+        self._stale.move_to_end(key)
+        while len(self._stale) > self.max_entries:
+            self._stale.popitem(last=False)
+
+    def _db_get(self, key: str, max_age: Optional[float] = None) -> Optional[SummaryResponse]:
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT value, created_at FROM analyses WHERE key = ?", (key,)
+                ).fetchone()
+            if row is None or time.time() - row[1] > (max_age or self.db_ttl_seconds):
+                return None
+            return SummaryResponse.model_validate_json(row[0])
+        except Exception as e:
+            logger.warning(f"⚠️ Analysis cache read failed: {e}")
+            return None
+
+    def _db_thread(self, key: str) -> Optional[str]:
+        try:
+            with self._db_lock:
+                row = self._db.execute("SELECT thread FROM analyses WHERE key = ?", (key,)).fetchone()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Analysis cache read failed: {e}")
+            return None
+
+    def _db_set(self, key: str, value: SummaryResponse, thread: Optional[str] = None):
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO analyses (key, value, created_at, thread) VALUES (?, ?, ?, ?)",
+                    (key, value.model_dump_json(), time.time(), thread)
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Analysis cache write failed: {e}")
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size, for sizing the cache"""
+        lookups = self._counters["hits"] + self._counters["misses"]
+        return {
+            **self._counters,
+            "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+            "size": len(self._entries),
+            "stale_size": len(self._stale),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "disk_enabled": self._db is not None
+        }
@@ -0,0 +1,157 @@
+import re
+import zlib
+from typing import Dict, List, Optional, Tuple
+from .models import ReplyData
+
+# Replies are compared as sets of overlapping word triples
+SHINGLE_WORDS = 3
+
+# One-permutation MinHash: each shingle hash lands in one of SIGNATURE_BINS bins, keeping the minimum
+SIGNATURE_BINS = 64
+
+# LSH banding: replies sharing all rows of any band become candidates. 16 bands of 4 rows
+# make pairs with Jaccard similarity above ~0.5 likely candidates
+BANDS = 16
+ROWS_PER_BAND = SIGNATURE_BINS // BANDS
+
+# Candidates are confirmed by exact Jaccard similarity of their shingle sets
+DEFAULT_THRESHOLD = 0.8
+
+# Cluster founders kept per LSH bucket, so a bucket of many distinct replies can't go quadratic
+MAX_BUCKET_LEADERS = 8
+
+WORD_RE = re.compile(r"[a-z0-9']+")
+
+# Lines quoting another reply, as in Reddit's "> quoted text"
+QUOTE_RE = re.compile(r"^\s*>.*$", re.MULTILINE)
+
+
+class CollapsedReply(ReplyData):
+    """Representative of a group of near-identical replies, with the group's combined upvotes"""
+    duplicates: int = 0
+
+
+def _words(text: str) -> List[str]:
+    # A quote-reply is judged by what it adds, not by what it quotes
+    unquoted = QUOTE_RE.sub(" ", text)
+    return WORD_RE.findall((unquoted if unquoted.strip() else text).lower())
+
+
+def _shingles(words: List[str]) -> set:
+    return {
+        zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8"))
+        for i in range(len(words) - SHINGLE_WORDS + 1)
+    }
+
+
+def _signature(shingles: set) -> List[int]:
+    """MinHash signature from a single hash per shingle, with empty bins densified"""
+    bins: List[Optional[int]] = [None] * SIGNATURE_BINS
+    for shingle in shingles:
+        index = shingle % SIGNATURE_BINS
+        value = shingle // SIGNATURE_BINS
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+    # Short replies leave most bins empty: borrow the next filled bin to the right
+    filled = next(i for i in range(SIGNATURE_BINS) if bins[i] is not None)
+    for offset in range(SIGNATURE_BINS, 0, -1):
+        index = (filled + offset) % SIGNATURE_BINS
+        if bins[index] is None:
+            bins[index] = bins[(index + 1) % SIGNATURE_BINS]
+    return bins
+
+
+def _jaccard(a: set, b: set) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    intersection = sum(1 for item in a if item in b)
+    return intersection / (len(a) + len(b) - intersection)
+
+
+def _find(parent: List[int], i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def _union(parent: List[int], a: int, b: int):
+    root_a, root_b = _find(parent, a), _find(parent, b)
+    if root_a != root_b:
+        # The earlier reply stays the root, so clusters keep their place in the thread
+        parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def cluster_replies(replies: List[ReplyData], threshold: float = DEFAULT_THRESHOLD) -> List[List[int]]:
+    """Group indexes of near-identical replies, in thread order of each group's first reply.
+
+    Replies with the same normalized text are grouped directly, which covers
+    those too short to shingle ("this", "same", "+1"). The rest go through a
+    MinHash LSH index: each reply is compared only with the founders of the
+    buckets it lands in, so the whole pass is roughly linear in the number of
+    replies.
+    """
+    parent = list(range(len(replies)))
+    exact: Dict[str, int] = {}
+    shingle_sets: Dict[int, set] = {}
+    buckets: Dict[Tuple[int, tuple], List[int]] = {}
+
+    for i, reply in enumerate(replies):
+        words = _words(reply.text)
+        # Exact repeats after normalization (copy-pasta, "same") skip the index entirely
+        key = " ".join(words) or reply.text.strip().lower()
+        first = exact.setdefault(key, i)
+        if first != i or len(words) < SHINGLE_WORDS:
+            _union(parent, first, i)
+            continue
+
+        shingles = shingle_sets[i] = _shingles(words)
+        signature = _signature(shingles)
+        matched = False
+        for band in range(BANDS):
+            leaders = buckets.setdefault((band, tuple(signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND])), [])
+            if matched:
+                continue
+            for leader in leaders:
+                if _jaccard(shingles, shingle_sets[leader]) >= threshold:
+                    _union(parent, leader, i)
+                    matched = True
+                    break
+            if not matched and len(leaders) < MAX_BUCKET_LEADERS:
+                leaders.append(i)
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(replies)):
+        groups.setdefault(_find(parent, i), []).append(i)
+    return list(groups.values())
+
+
+def collapse_near_duplicates(replies: List[ReplyData], threshold: float = DEFAULT_THRESHOLD) -> List[ReplyData]:
+    """Replace each group of near-identical replies with its most upvoted member.
+
+    The representative carries the group's total upvotes and how many replies
+    it stands for; replies without duplicates are returned unchanged.
+    """
+    if len(replies) < 2:
+        return list(replies)
+
+    collapsed = []
+    for group in cluster_replies(replies, threshold):
+        if len(group) == 1:
+            collapsed.append(replies[group[0]])
+            continue
+        members = [replies[i] for i in group]
+        representative = max(members, key=lambda reply: reply.upvotes or 0)
+        collapsed.append(CollapsedReply(
+            text=representative.text,
+            author=representative.author,
+            upvotes=sum(max(reply.upvotes or 0, 0) for reply in members),
+            isTopLevel=any(reply.isTopLevel for reply in members),
+            duplicates=len(group) - 1
+        ))
+    return collapsed
+
+
+def reply_count(replies: List[ReplyData]) -> int:
+    """Number of replies scraped, counting the duplicates folded into collapsed ones"""
+    return sum(1 + getattr(reply, "duplicates", 0) for reply in replies)
@@ -0,0 +1,129 @@
+import json
+import logging
+from typing import Optional
+from pydantic import ValidationError
+from .models import ReplyCategory, SummaryResponse
+
+# Set up logger for this module
+logger = logging.getLogger(__name__)
+
+# Top-level string fields that are emitted as soon as their value closes
+SCALAR_FIELDS = ("post_type", "thread_summary")
+
+
+class SummaryStreamParser:
+    """Incrementally scan a streamed SummaryResponse JSON document.
+
+    Text is fed in arbitrary chunks. Each call to feed() returns the events
+    that became complete in that chunk: the post_type and thread_summary
+    values, and every key_replies category as soon as its object closes.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._started = False
+        self._finished = False
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._expecting_key = False
+        self._current_key: Optional[str] = None
+        self._item_start: Optional[int] = None
+        self._start = 0
+        self._end: Optional[int] = None
+
+    def feed(self, chunk: str) -> list[dict]:
+        """Consume a chunk of model output and return newly completed events"""
+        self.text += chunk
+        events = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            if self._finished:
+                break
+            char = text[i]
+
+            if not self._started:
+                # Skip anything before the document, e.g. a ```json fence
+                if char == "{":
+                    self._started = True
+                    self._start = i
+                    self._stack.append("{")
+                    self._expecting_key = True
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    event = self._close_string(text[self._string_start:i + 1])
+                    if event:
+                        events.append(event)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char in "{[":
+                if self._in_key_replies() and char == "{":
+                    self._item_start = i
+                self._stack.append(char)
+            elif char in "}]":
+                self._stack.pop()
+                if char == "}" and self._item_start is not None and self._in_key_replies():
+                    event = self._close_category(text[self._item_start:i + 1])
+                    self._item_start = None
+                    if event:
+                        events.append(event)
+                if not self._stack:
+                    self._finished = True
+                    self._end = i + 1
+            elif len(self._stack) == 1:
+                if char == ",":
+                    self._expecting_key = True
+                elif char == ":":
+                    self._expecting_key = False
+
+        self._pos = len(text)
+        return events
+
+    def document(self) -> str:
+        """The JSON document seen so far, without any surrounding prose or fences"""
+        if not self._started:
+            return self.text
+        return self.text[self._start:self._end]
+
+    def _in_key_replies(self) -> bool:
+        return self._stack == ["{", "["] and self._current_key == "key_replies"
+
+    def _close_string(self, raw: str) -> Optional[dict]:
+        if len(self._stack) != 1:
+            return None
+        value = json.loads(raw)
+        if self._expecting_key:
+            self._current_key = value
+            return None
+        if self._current_key in SCALAR_FIELDS:
+            return {"event": self._current_key, "data": {self._current_key: value}}
+        return None
+
+    def _close_category(self, raw: str) -> Optional[dict]:
+        try:
+            category = ReplyCategory.model_validate_json(raw)
+        except ValidationError as e:
+            # Leave it to the final validation of the whole document
+            logger.debug(f"⚠️ Skipping malformed streamed category: {e}")
+            return None
+        return {"event": "category", "data": category.model_dump()}
+
+
+def summary_events(summary: SummaryResponse) -> list[dict]:
+    """The events SummaryStreamParser would emit for an already complete summary"""
+    events = [{"event": field, "data": {field: getattr(summary, field)}} for field in SCALAR_FIELDS]
+    for category in summary.key_replies:
+        events.append({"event": "category", "data": category.model_dump()})
+    return events
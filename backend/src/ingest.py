@@ -0,0 +1,142 @@
+import os
+import io
+import zlib
+import logging
+from typing import Any, Callable, Coroutine
+import orjson
+from fastapi import HTTPException, Request, Response
+from fastapi.routing import APIRoute
+
+# Optional codecs: zstd request bodies and MessagePack payloads are only accepted when installed
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Set up logger for this module
+logger = logging.getLogger(__name__)
+
+# Largest request body accepted after decompression, so a small upload can't expand without bound
+MAX_REQUEST_BODY_BYTES = int(os.getenv("MAX_REQUEST_BODY_BYTES", str(16 * 1024 * 1024)))
+
+MSGPACK_CONTENT_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+# zlib window bits for each Content-Encoding it can decode
+ZLIB_WBITS = {"gzip": 31, "x-gzip": 31, "deflate": 15}
+
+
+def supported_encodings() -> list:
+    """Content-Encodings request bodies may use with the codecs installed here"""
+    encodings = ["gzip", "deflate"]
+    if zstandard is not None:
+        encodings.append("zstd")
+    return encodings
+
+
+def supported_content_types() -> list:
+    content_types = ["application/json"]
+    if msgpack is not None:
+        content_types.append("application/msgpack")
+    return content_types
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Request body exceeds {MAX_REQUEST_BODY_BYTES} bytes once decompressed")
+
+
+def decode_body(body: bytes, encoding: str, limit: int = MAX_REQUEST_BODY_BYTES) -> bytes:
+    """Undo one Content-Encoding, refusing to produce more than `limit` bytes"""
+    if encoding in ZLIB_WBITS:
+        decompressor = zlib.decompressobj(wbits=ZLIB_WBITS[encoding])
+        try:
+            decoded = decompressor.decompress(body, limit + 1)
+        except zlib.error as e:
+            raise HTTPException(status_code=400, detail=f"Malformed {encoding} body: {e}")
+        if len(decoded) > limit:
+            raise _too_large()
+        if not decompressor.eof:
+            raise HTTPException(status_code=400, detail=f"Truncated {encoding} body")
+        return decoded
+
+    if encoding == "zstd" and zstandard is not None:
+        try:
+            # Streaming read, since a frame's declared size can't be trusted
+            with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body)) as reader:
+                decoded = reader.read(limit + 1)
+        except zstandard.ZstdError as e:
+            raise HTTPException(status_code=400, detail=f"Malformed zstd body: {e}")
+        if len(decoded) > limit:
+            raise _too_large()
+        return decoded
+
+    raise HTTPException(
+        status_code=415,
+        detail=f"Unsupported Content-Encoding '{encoding}' - use one of: {', '.join(supported_encodings())}",
+        headers={"Accept-Encoding": ", ".join(supported_encodings())}
+    )
+
+
+class DecodingRequest(Request):
+    """Request whose body is decompressed per Content-Encoding and parsed with orjson or MessagePack"""
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_body"):
+            body = await super().body()
+            if len(body) > MAX_REQUEST_BODY_BYTES:
+                raise _too_large()
+            content_encoding = self.headers.get("content-encoding", "")
+            # Encodings are listed in the order they were applied, so undo them back to front
+            for encoding in reversed([e.strip().lower() for e in content_encoding.split(",") if e.strip()]):
+                if encoding != "identity":
+                    body = decode_body(body, encoding)
+            self._body = body
+        return self._body
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            body = await self.body()
+            if self.scope.get("body_format") == "msgpack":
+                try:
+                    self._json = msgpack.unpackb(body, raw=False)
+                except Exception as e:
+                    raise HTTPException(status_code=400, detail=f"Malformed MessagePack body: {e}")
+            else:
+                self._json = orjson.loads(body)
+        return self._json
+
+
+def _accept_msgpack(scope: dict):
+    """Present a MessagePack body to FastAPI as JSON, remembering to decode it as MessagePack"""
+    headers = []
+    for name, value in scope["headers"]:
+        if name == b"content-type":
+            content_type = value.decode("latin-1").split(";")[0].strip().lower()
+            if content_type in MSGPACK_CONTENT_TYPES:
+                if msgpack is None:
+                    raise HTTPException(status_code=415, detail="MessagePack bodies are not supported on this server")
+                scope["body_format"] = "msgpack"
+                value = b"application/json"
+        headers.append((name, value))
+    scope["headers"] = headers
+
+
+class DecodingRoute(APIRoute):
+    """Route class that accepts gzip, deflate or zstd request bodies and MessagePack payloads.
+
+    FastAPI validates the decoded document into the endpoint's Pydantic models
+    exactly as it would a plain JSON body.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def decoding_handler(request: Request) -> Response:
+            _accept_msgpack(request.scope)
+            return await handler(DecodingRequest(request.scope, request.receive))
+
+        return decoding_handler
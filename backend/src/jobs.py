@@ -0,0 +1,445 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+import sqlite3
+import itertools
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from .models import JobResponse, SummaryResponse, ThreadData
+from .resilience import is_upstream_failure
+from .services import is_fallback_summary
+
+# Set up logger for this module
+logger = logging.getLogger(__name__)
+
+# Lower runs first
+PRIORITY_RANKS = {"interactive": 0, "backfill": 1}
+
+UNFINISHED = ("queued", "running")
+
+# Seconds a client is told to wait before resubmitting when the queue is full
+QUEUE_FULL_RETRY_AFTER = 10.0
+
+JOB_COLUMNS = "id, cache_key, priority, status, thread, summary, error, attempts, created_at, finished_at"
+
+
+class FallbackResult(Exception):
+    """The analysis came back as a placeholder summary; retried like an upstream failure"""
+
+
+class JobQueueFull(Exception):
+    """Raised when the queue already holds max_queued jobs"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class Job:
+    """One analysis job; the thread is dropped once it has finished"""
+    id: str
+    cache_key: str
+    priority: str
+    thread_data: Optional[ThreadData]
+    status: str = "queued"
+    summary: Optional[SummaryResponse] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    # Set when the job finishes, for long-polling clients
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+    @property
+    def finished(self) -> bool:
+        return self.status not in UNFINISHED
+
+    @property
+    def reusable(self) -> bool:
+        """Whether a resubmission of the same thread may be answered with this job"""
+        if not self.finished:
+            return True
+        return self.status == "succeeded" and self.summary is not None and not is_fallback_summary(self.summary)
+
+    def to_response(self) -> JobResponse:
+        return JobResponse(
+            job_id=self.id,
+            status=self.status,
+            priority=self.priority,
+            analysis_id=self.cache_key,
+            attempts=self.attempts,
+            created_at=self.created_at,
+            finished_at=self.finished_at,
+            summary=self.summary,
+            error=self.error
+        )
+
+
+class JobQueue:
+    """Analysis jobs run by a bounded pool of in-process workers, interactive before backfill.
+
+    A thread submitted while a job for it is queued, running or has succeeded
+    gets that job back instead of a new one. With a SQLite database, jobs and
+    results survive restarts and are shared by all worker processes: any
+    process can answer for a job, and jobs left unfinished by a process that
+    stopped or died are picked up by another.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        max_queued: int = 1000,
+        max_entries: int = 10000,
+        max_attempts: int = 3,
+        ttl_seconds: float = 86400,
+        db_path: Optional[str] = None,
+        heartbeat_seconds: float = 30
+    ):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_entries = max_entries
+        self.max_attempts = max_attempts
+        self.ttl_seconds = ttl_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._by_key: Dict[str, str] = {}
+        self._queue: "asyncio.PriorityQueue[Tuple[int, int, str]]" = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+        self._queued = 0
+        self._running = 0
+        self._run: Optional[Callable[[ThreadData, str], Awaitable[SummaryResponse]]] = None
+        self._tasks: List[asyncio.Task] = []
+        self._counters = {"submitted": 0, "deduplicated": 0, "succeeded": 0, "failed": 0, "retried": 0, "recovered": 0, "rejected": 0}
+
+        # Identifies this process's claim on jobs in the shared database
+        self._owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._db = None
+        self._db_lock = threading.Lock()
+        if db_path:
+            self._open_db(db_path)
+
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        """Build a queue from JOB_* environment variables"""
+        return cls(
+            workers=int(os.getenv("JOB_WORKERS", "4")),
+            max_queued=int(os.getenv("JOB_QUEUE_MAX", "1000")),
+            max_entries=int(os.getenv("JOB_MAX_ENTRIES", "10000")),
+            max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+            ttl_seconds=float(os.getenv("JOB_TTL_SECONDS", "86400")),
+            db_path=os.getenv("JOB_DB") or None,
+            heartbeat_seconds=float(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+        )
+
+    def _open_db(self, db_path: str):
+        try:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, cache_key TEXT NOT NULL, priority TEXT NOT NULL, status TEXT NOT NULL, "
+                "thread TEXT, summary TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, owner TEXT, "
+                "created_at REAL NOT NULL, finished_at REAL, updated_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_cache_key ON jobs (cache_key)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+            self._db.commit()
+            logger.info(f"💾 Job store SQLite database enabled at {db_path}")
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Could not open job database {db_path}: {e} - jobs are kept in memory only")
+            self._db = None
+
+    async def start(self, run: Callable[[ThreadData, str], Awaitable[SummaryResponse]]):
+        """Start the workers; run(thread_data, cache_key) produces a job's analysis"""
+        if self._tasks:
+            return
+        self._run = run
+        if self._db is not None:
+            await self._recover()
+            self._tasks.append(asyncio.create_task(self._heartbeat()))
+        self._tasks += [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"🧵 Job workers started - Workers: {self.workers}")
+
+    async def stop(self):
+        """Stop the workers; unfinished jobs are released for another process to pick up"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._db is not None:
+            await asyncio.to_thread(self._db_release)
+
+    async def submit(self, thread_data: ThreadData, cache_key: str, priority: str = "interactive") -> Tuple[Job, bool]:
+        """Queue an analysis job, or return the existing job for the same thread.
+
+        Returns the job and whether it was created. Raises JobQueueFull when too
+        many jobs are waiting.
+        """
+        existing = self._local_job_for(cache_key)
+        if existing is None and self._db is not None:
+            existing = await asyncio.to_thread(self._db_find, cache_key)
+        if existing is not None and existing.reusable:
+            self._counters["deduplicated"] += 1
+            if existing.status == "queued" and PRIORITY_RANKS[priority] < PRIORITY_RANKS[existing.priority] and existing.id in self._jobs:
+                # An interactive request for a queued backfill job moves it ahead
+                existing.priority = priority
+                self._enqueue(existing)
+                await self._persist(existing)
+            return existing, False
+
+        if self._queued >= self.max_queued:
+            self._counters["rejected"] += 1
+            raise JobQueueFull("Too many analysis jobs waiting", retry_after=QUEUE_FULL_RETRY_AFTER)
+
+        job = Job(id=uuid.uuid4().hex, cache_key=cache_key, priority=priority, thread_data=thread_data)
+        self._remember(job)
+        self._queued += 1
+        self._counters["submitted"] += 1
+        await self._persist(job)
+        self._enqueue(job)
+        logger.debug(f"🧾 Job queued - ID: {job.id[:8]}, Priority: {priority}, Queued: {self._queued}")
+        return job, True
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is None and self._db is not None:
+            job = await asyncio.to_thread(self._db_get, job_id)
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Job]:
+        """Return the job once it finishes, or as it stands after timeout seconds"""
+        job = await self.get(job_id)
+        if job is None or job.finished or timeout <= 0:
+            return job
+        if job.id in self._jobs:
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            return job
+        # Run by another process: watch the shared database
+        deadline = time.monotonic() + timeout
+        while not job.finished and time.monotonic() < deadline:
+            await asyncio.sleep(min(0.25, max(0.0, deadline - time.monotonic())))
+            job = await asyncio.to_thread(self._db_get, job_id) or job
+        return job
+
+    def _local_job_for(self, cache_key: str) -> Optional[Job]:
+        job = self._jobs.get(self._by_key.get(cache_key, ""))
+        if job is None or not job.reusable or self._expired(job):
+            return None
+        return job
+
+    def _expired(self, job: Job) -> bool:
+        return job.finished and time.time() - job.finished_at > self.ttl_seconds
+
+    def _remember(self, job: Job):
+        self._jobs[job.id] = job
+        self._by_key[job.cache_key] = job.id
+        # Finished jobs are evicted oldest first; unfinished ones are bounded by max_queued
+        while len(self._jobs) > self.max_entries:
+            oldest = next((j for j in self._jobs.values() if j.finished), None)
+            if oldest is None:
+                break
+            del self._jobs[oldest.id]
+            if self._by_key.get(oldest.cache_key) == oldest.id:
+                del self._by_key[oldest.cache_key]
+
+    def _enqueue(self, job: Job):
+        # A job re-queued at a higher priority has two entries; the later one finds it already running
+        self._queue.put_nowait((PRIORITY_RANKS[job.priority], next(self._sequence), job.id))
+
+    async def _worker(self):
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            if job is None or job.status != "queued":
+                continue
+            job.status = "running"
+            job.attempts += 1
+            self._queued -= 1
+            self._running += 1
+            try:
+                await self._persist(job)
+                await self._execute(job)
+            finally:
+                self._running -= 1
+
+    async def _execute(self, job: Job):
+        start_time = time.perf_counter()
+        try:
+            summary = await self._run(job.thread_data, job.cache_key)
+            if is_fallback_summary(summary):
+                raise FallbackResult(summary.thread_summary)
+            job.summary = summary
+            job.status = "succeeded"
+        except asyncio.CancelledError:
+            # Shutting down: leave the job to be picked up again
+            job.status = "queued"
+            raise
+        except Exception as e:
+            if (is_upstream_failure(e) or isinstance(e, FallbackResult)) and job.attempts < self.max_attempts:
+                delay = getattr(e, "retry_after", None) or 2 ** job.attempts
+                logger.warning(f"🔁 Job {job.id[:8]} got no usable analysis, retrying in {delay:.0f}s - Attempt: {job.attempts}")
+                job.status = "queued"
+                self._queued += 1
+                self._counters["retried"] += 1
+                await self._persist(job)
+                asyncio.get_running_loop().call_later(delay, self._enqueue, job)
+                return
+            logger.error(f"❌ Job {job.id[:8]} failed: {str(e)}")
+            job.status = "failed"
+            job.error = str(e) if isinstance(e, FallbackResult) else f"Analysis failed: {str(e)}"
+
+        job.finished_at = time.time()
+        job.thread_data = None
+        self._counters[job.status] += 1
+        await self._persist(job)
+        job.done.set()
+        logger.info(f"✅ Job {job.id[:8]} {job.status} - Priority: {job.priority}, Time: {time.perf_counter() - start_time:.3f}s")
+
+    async def _persist(self, job: Job):
+        if self._db is not None:
+            await asyncio.to_thread(self._db_set, job)
+
+    async def _recover(self):
+        """Take over jobs that no live process owns, and queue them"""
+        jobs = await asyncio.to_thread(self._db_claim_orphans)
+        for job in jobs:
+            if job.id in self._jobs:
+                continue
+            job.status = "queued"
+            self._remember(job)
+            self._queued += 1
+            self._enqueue(job)
+        if jobs:
+            self._counters["recovered"] += len(jobs)
+            logger.info(f"♻️ Recovered {len(jobs)} unfinished jobs")
+
+    async def _heartbeat(self):
+        # Keeps this process's claim on its jobs fresh, and adopts jobs whose owner stopped refreshing
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                await asyncio.to_thread(self._db_touch)
+                await self._recover()
+            except Exception as e:
+                logger.warning(f"⚠️ Job heartbeat failed: {e}")
+
+    def _row_to_job(self, row) -> Job:
+        job_id, cache_key, priority, status, thread, summary, error, attempts, created_at, finished_at = row
+        job = Job(
+            id=job_id,
+            cache_key=cache_key,
+            priority=priority,
+            thread_data=ThreadData.model_validate_json(thread) if thread else None,
+            status=status,
+            summary=SummaryResponse.model_validate_json(summary) if summary else None,
+            error=error,
+            attempts=attempts,
+            created_at=created_at,
+            finished_at=finished_at
+        )
+        if job.finished:
+            job.done.set()
+        return job
+
+    def _db_get(self, job_id: str) -> Optional[Job]:
+        try:
+            with self._db_lock:
+                row = self._db.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            return self._row_to_job(row) if row else None
+        except Exception as e:
+            logger.warning(f"⚠️ Job read failed: {e}")
+            return None
+
+    def _db_find(self, cache_key: str) -> Optional[Job]:
+        """Latest job for a thread that hasn't failed or expired, if it may be reused"""
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    f"SELECT {JOB_COLUMNS} FROM jobs WHERE cache_key = ? AND status != 'failed' "
+                    "AND (finished_at IS NULL OR finished_at > ?) ORDER BY created_at DESC LIMIT 1",
+                    (cache_key, time.time() - self.ttl_seconds)
+                ).fetchone()
+            job = self._row_to_job(row) if row else None
+            return job if job is not None and job.reusable else None
+        except Exception as e:
+            logger.warning(f"⚠️ Job lookup failed: {e}")
+            return None
+
+    def _db_set(self, job: Job):
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO jobs (id, cache_key, priority, status, thread, summary, error, attempts, owner, "
+                    "created_at, finished_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        job.id, job.cache_key, job.priority, job.status,
+                        job.thread_data.model_dump_json() if job.thread_data else None,
+                        job.summary.model_dump_json() if job.summary else None,
+                        job.error, job.attempts, None if job.finished else self._owner,
+                        job.created_at, job.finished_at, time.time()
+                    )
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Job write failed: {e}")
+
+    def _db_touch(self):
+        with self._db_lock:
+            self._db.execute(
+                "UPDATE jobs SET updated_at = ? WHERE owner = ? AND status IN ('queued', 'running')",
+                (time.time(), self._owner)
+            )
+            self._db.execute(
+                "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                (time.time() - self.ttl_seconds,)
+            )
+            self._db.commit()
+
+    def _db_claim_orphans(self) -> List[Job]:
+        # A single UPDATE, so two processes can never claim the same job
+        stale_before = time.time() - 3 * self.heartbeat_seconds
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "UPDATE jobs SET owner = ?, updated_at = ? WHERE status IN ('queued', 'running') "
+                    "AND (owner IS NULL OR (owner != ? AND updated_at < ?))",
+                    (self._owner, time.time(), self._owner, stale_before)
+                )
+                self._db.commit()
+                rows = self._db.execute(
+                    f"SELECT {JOB_COLUMNS} FROM jobs WHERE owner = ? AND status IN ('queued', 'running')",
+                    (self._owner,)
+                ).fetchall()
+            return [self._row_to_job(row) for row in rows if row[0] not in self._jobs]
+        except Exception as e:
+            logger.warning(f"⚠️ Job recovery failed: {e}")
+            return []
+
+    def _db_release(self):
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "UPDATE jobs SET owner = NULL, status = 'queued' WHERE owner = ? AND status IN ('queued', 'running')",
+                    (self._owner,)
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Job release failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            **self._counters,
+            "queued": self._queued,
+            "running": self._running,
+            "workers": self.workers,
+            "max_queued": self.max_queued,
+            "persistent": self._db is not None
+        }
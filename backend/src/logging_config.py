@@ -0,0 +1,129 @@
+import os
+import sys
+import copy
+import json
+import queue
+import atexit
+import logging
+import logging.handlers
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+# Request-scoped context, set by the request middleware
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+debug_sampled_var: ContextVar[bool] = ContextVar("debug_sampled", default=True)
+
+# Attributes every LogRecord has; anything else was passed through `extra=` and is emitted as a field
+STANDARD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+CONSOLE_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, request id, message and extra fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in STANDARD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class DebugSamplingFilter(logging.Filter):
+    """Keep DEBUG records only for requests chosen for detailed logging"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or debug_sampled_var.get()
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that never blocks the event loop and keeps request context.
+
+    Records are rendered here, in the calling thread, because context variables
+    and traceback objects don't survive the hop to the writer thread.
+    When the queue is full the record is dropped and counted instead of blocking.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        record.request_id = request_id_var.get()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(log_file: str = "speedthreads.log") -> ContextQueueHandler:
+    """Route all logging through a queue to a background writer.
+
+    The writer thread sends human-readable lines to the console and JSON lines
+    to a size-rotated log file. Configured by LOG_LEVEL, LOG_DEBUG_SAMPLE_RATE
+    (read by the request middleware), LOG_QUEUE_SIZE, LOG_MAX_BYTES,
+    LOG_BACKUP_COUNT and LOG_PER_PROCESS, which names the file after the
+    process id (speedthreads-<pid>.log) so worker processes never rotate
+    each other's file.
+    """
+    global _listener
+
+    if os.getenv("LOG_PER_PROCESS", "false").lower() == "true":
+        stem, extension = os.path.splitext(log_file)
+        log_file = f"{stem}-{os.getpid()}{extension}"
+
+    level = getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
+
+    console_handler = logging.StreamHandler(sys.stderr)
+    console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file,
+        maxBytes=int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+        backupCount=int(os.getenv("LOG_BACKUP_COUNT", "5")),
+        encoding="utf-8"
+    )
+    file_handler.setFormatter(JsonFormatter())
+
+    queue_handler = ContextQueueHandler(queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000"))))
+    queue_handler.addFilter(DebugSamplingFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    stop_logging()
+    _listener = logging.handlers.QueueListener(queue_handler.queue, console_handler, file_handler)
+    _listener.start()
+    return queue_handler
+
+
+@atexit.register
+def stop_logging():
+    """Flush queued records and stop the background writer"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,12 +1,37 @@
 from fastapi import FastAPI, HTTPException, Request, Depends
+from typing import Optional, Set
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 import os
+import math
+import orjson
+import uuid
+import random
+import asyncio
 import logging
 import time
-from .models import ThreadData, SummaryResponse, ChatRequest, ChatResponse
-from .services import OpenAIService
-from supabase import create_client, Client
+import inspect
+from .models import (
+    ThreadData, ThreadUpdateRequest, SummaryResponse, ChatRequest, ChatResponse,
+    BatchSummarizeRequest, BatchItemResult, BatchSummarizeResponse,
+    ChatMessage, ChatSessionCreateRequest, ChatSessionResponse, ChatSessionMessageRequest,
+    JobPriority, JobResponse
+)
+from .services import OpenAIService, is_fallback_summary
+from .resilience import UpstreamUnavailable, is_upstream_failure
+from .admission import RateLimiter
+from .ingest import DecodingRoute, supported_content_types, supported_encodings
+from .cache import AnalysisCache, thread_cache_key, thread_identity_key, update_cache_key
+from .singleflight import SingleFlight
+from .incremental_json import summary_events
+from .auth import TokenVerifier
+from .sessions import ChatSession, SessionStore
+from .jobs import JobQueue, JobQueueFull
+from .logging_config import configure_logging, request_id_var, debug_sampled_var
+from .metrics import REQUEST_LATENCY, REQUESTS_IN_FLIGHT, endpoint_var, mark_process_dead, record_error, register_stats, render_metrics, route_template
 
 # Load environment variables
 load_dotenv()
@@ -15,52 +40,145 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
 
-# Configure logging first
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('speedthreads.log')
-    ]
-)
+# Configure logging first: records are queued and written by a background thread
+log_handler = configure_logging()
 logger = logging.getLogger(__name__)
 
-# Initialize Supabase client (optional)
+# Fraction of requests whose DEBUG-level detail is kept when LOG_LEVEL=DEBUG
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.05"))
+
+# Clients are created per worker process when the app starts (see init_clients), not at
+# import: importing stays cheap, and no connection pool or thread is inherited across a fork
 supabase = None
-if SUPABASE_URL and SUPABASE_ANON_KEY:
+openai_service: Optional[OpenAIService] = None
+
+# Tokens are verified locally against the project's JWT secret or signing keys,
+# with the Supabase lookup kept only as a fallback
+token_verifier = TokenVerifier.from_env()
+
+# Readiness: set once startup has finished, cleared when shutdown begins
+lifecycle = {"initialized": False, "ready": False, "started_at": time.perf_counter(), "startup_seconds": None}
+
+def create_supabase_client():
+    """Supabase client for the remote token fallback, or None when not configured"""
+    if not (SUPABASE_URL and SUPABASE_ANON_KEY):
+        logger.warning("⚠️ SUPABASE_URL and SUPABASE_ANON_KEY not set - Authentication features disabled")
+        return None
     try:
-        supabase = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+        # Imported here: the SDK is slow to import and only needed when configured
+        from supabase import create_client
+        client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
         logger.info("✅ Supabase client initialized successfully")
+        return client
     except Exception as e:
         logger.warning(f"⚠️ Supabase client initialization failed: {e}")
         logger.warning("Authentication features will be disabled")
-        supabase = None
-else:
-    logger.warning("⚠️ SUPABASE_URL and SUPABASE_ANON_KEY not set - Authentication features disabled")
+        return None
+
+def init_clients():
+    """Create the Supabase and OpenAI clients; safe to call more than once"""
+    global supabase, openai_service
+    if lifecycle["initialized"]:
+        return
+    lifecycle["initialized"] = True
+    supabase = create_supabase_client()
+    token_verifier.supabase = supabase
+    
+    try:
+        logger.info("Initializing OpenAI service...")
+        openai_service = OpenAIService()
+        logger.info("OpenAI service initialized successfully")
+    except ValueError as e:
+        logger.error(f"Failed to initialize OpenAI service: {e}")
+        openai_service = None
+        return
+    
+    register_stats("speedthreads_upstream_queue", openai_service.limiter.stats, counters=("admitted", "queued", "rejected_queue_full", "rejected_timeout"))
+    register_stats("speedthreads_upstream", openai_service.upstream.stats, counters=("retries", "timeouts", "hedges", "hedge_wins"))
+    register_stats("speedthreads_upstream_breaker", openai_service.upstream.breaker.stats, counters=("opened", "rejected"))
+    register_stats("speedthreads_prompt_budget", lambda: openai_service.truncation_stats, counters=openai_service.truncation_stats)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_clients()
+    lifecycle["ready"] = True
+    lifecycle["startup_seconds"] = round(time.perf_counter() - lifecycle["started_at"], 3)
+    if openai_service is not None:
+        await job_queue.start(get_or_create_analysis)
+    logger.info(f"✅ Ready {lifecycle['startup_seconds']:.3f}s after the app module loaded - PID: {os.getpid()}")
+    yield
+    # In-flight requests have drained by now; report not ready while the clients close
+    lifecycle["ready"] = False
+    await job_queue.stop()
+    # Sessions are in memory and end with the process, so pending compactions are not worth finishing
+    for task in list(compaction_tasks):
+        task.cancel()
+    await asyncio.gather(*compaction_tasks, return_exceptions=True)
+    if openai_service is not None:
+        await openai_service.client.close()
+    # Recycled workers would otherwise leave their in-flight gauges behind
+    mark_process_dead()
 
 app = FastAPI(
     title="SpeedThreads API",
     description="AI-powered Reddit and X thread analysis",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+def create_app() -> FastAPI:
+    """Application factory for `uvicorn --factory src.main:create_app`.
+    
+    Importing this module only defines the routes; clients are created in each
+    worker process when the app starts.
+    """
+    return app
+
+# Request bodies may be gzip/deflate/zstd compressed, or MessagePack instead of JSON
+app.router.route_class = DecodingRoute
+
+# Orchestrator health probes
+PROBE_PATHS = {"/livez", "/readyz"}
+
 # Request logging middleware
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    start_time = time.time()
+    start_time = time.perf_counter()
+    
+    # Tag every log line of this request with its ID, and decide whether to keep its debug detail
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex[:16]
+    request_id_var.set(request_id)
+    debug_sampled_var.set(random.random() < LOG_DEBUG_SAMPLE_RATE)
     
-    # Log incoming request
-    logger.info(f"📥 {request.method} {request.url.path} - Client: {request.client.host if request.client else 'unknown'}")
+    # Metrics are labelled by route template, not the raw path, to keep cardinality bounded
+    route = route_template(request.scope)
+    endpoint_var.set(route)
+    
+    client = request.client.host if request.client else "unknown"
+    logger.debug(f"📥 {request.method} {request.url.path} - Client: {client}")
     
     # Process request
-    response = await call_next(request)
+    with REQUESTS_IN_FLIGHT.labels(route).track_inprogress():
+        response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
     
     # Calculate processing time
-    process_time = time.time() - start_time
+    process_time = time.perf_counter() - start_time
+    REQUEST_LATENCY.labels(request.method, route, str(response.status_code)).observe(process_time)
     
-    # Log response
-    logger.info(f"📤 {request.method} {request.url.path} - Status: {response.status_code} - Time: {process_time:.3f}s")
+    # One structured record per request; probes hit every few seconds, so only at debug level
+    log = logger.debug if request.url.path in PROBE_PATHS else logger.info
+    log(
+        f"📤 {request.method} {request.url.path} - Status: {response.status_code} - Time: {process_time:.3f}s",
+        extra={
+            "event": "request",
+            "method": request.method,
+            "path": request.url.path,
+            "status": response.status_code,
+            "duration_ms": round(process_time * 1000, 2),
+            "client": client
+        }
+    )
     
     return response
 
@@ -71,34 +189,219 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Analysis-Id", "X-Request-ID", "Retry-After", "Location"],
 )
 
-# Initialize OpenAI service
-try:
-    logger.info("Initializing OpenAI service...")
-    openai_service = OpenAIService()
-    logger.info("OpenAI service initialized successfully")
-except ValueError as e:
-    logger.error(f"Failed to initialize OpenAI service: {e}")
-    openai_service = None
+# Compress responses for clients that accept gzip. Event streams and NDJSON are
+# left alone: compressing them would buffer events that must arrive immediately.
+RESPONSE_GZIP_MIN_BYTES = int(os.getenv("RESPONSE_GZIP_MIN_BYTES", "1000"))
+if RESPONSE_GZIP_MIN_BYTES > 0:
+    gzip_parameters = inspect.signature(GZipMiddleware.__init__).parameters
+    if "exclude_content_types" in gzip_parameters:
+        app.add_middleware(
+            GZipMiddleware,
+            minimum_size=RESPONSE_GZIP_MIN_BYTES,
+            compresslevel=6,
+            exclude_content_types=gzip_parameters["exclude_content_types"].default + ("application/x-ndjson",)
+        )
+    else:
+        logger.warning("⚠️ Response compression disabled: this Starlette version would buffer streamed responses")
+
+# Server-side cache of analyses, keyed by thread content
+analysis_cache = AnalysisCache.from_env()
+
+# Identical concurrent analyses share one upstream call
+analysis_flight = SingleFlight()
+
+# Asynchronous analysis jobs, run by a worker pool started with the app
+job_queue = JobQueue.from_env()
+
+# Per-client token buckets in front of every endpoint that calls OpenAI
+rate_limiter = RateLimiter.from_env()
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Only behind a trusted reverse proxy is X-Forwarded-For the real client address
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true"
+
+async def client_identity(request: Request) -> str:
+    """Rate-limit key: the signed-in user when a valid token is sent, otherwise the client IP"""
+    authorization = request.headers.get("authorization", "")
+    if authorization.startswith("Bearer ") and token_verifier.available:
+        try:
+            user = await token_verifier.verify(authorization[len("Bearer "):])
+        except Exception as e:
+            logger.debug(f"⚠️ Could not identify user for rate limiting: {e}")
+            user = None
+        if user:
+            return f"user:{user['id']}"
+    if RATE_LIMIT_TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return f"ip:{forwarded.split(',')[0].strip()}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+async def admit(request: Request, cost: float = 1):
+    """Charge a request to its client's token bucket, rejecting it with 429 when the bucket is empty"""
+    if not RATE_LIMIT_ENABLED:
+        return
+    if cost > rate_limiter.burst:
+        # Charging only a full bucket would let large batches through at many times the configured rate
+        raise HTTPException(
+            status_code=413,
+            detail=f"Request too large for the rate limit - at most {int(rate_limiter.burst)} threads per request"
+        )
+    client_key = await client_identity(request)
+    retry_after = rate_limiter.acquire(client_key, cost)
+    if retry_after is not None:
+        logger.warning(f"🚦 Rate limited {client_key} - Retry after {retry_after:.1f}s")
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests - please slow down",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+async def rate_limit(request: Request):
+    """Route dependency for endpoints that cost one upstream call"""
+    await admit(request)
+
+# Response header naming the analysis, for clients to send back as previous_analysis_id
+ANALYSIS_ID_HEADER = "X-Analysis-Id"
+
+async def remember_analysis(cache_key: str, platform: str, post, summary: SummaryResponse):
+    """Cache an analysis under its own key and as the latest analysis of its thread"""
+    thread_key = thread_identity_key(platform, post)
+    await analysis_cache.set(cache_key, summary, thread=thread_key)
+    await analysis_cache.set(thread_key, summary, thread=thread_key)
+
+async def get_or_create_analysis(thread_data: ThreadData, cache_key: Optional[str] = None) -> SummaryResponse:
+    """Return the cached analysis for a thread, running the model only on a miss"""
+    cache_key = cache_key or thread_cache_key(thread_data)
+    cached = await analysis_cache.get(cache_key)
+    if cached is not None:
+        logger.debug(f"⚡ Analysis cache hit - Key: {cache_key[:19]}")
+        return cached
+    
+    async def run_analysis() -> SummaryResponse:
+        result = await openai_service.analyze_thread(thread_data)
+        if not is_fallback_summary(result):
+            await remember_analysis(cache_key, thread_data.platform, thread_data.post, result)
+        return result
+    
+    try:
+        return await analysis_flight.do(cache_key, run_analysis)
+    except Exception as e:
+        stale = await get_stale_analysis(cache_key, e)
+        if stale is None:
+            raise
+        return stale
+
+async def get_stale_analysis(cache_key: str, error: Exception) -> Optional[SummaryResponse]:
+    """An expired analysis to serve while OpenAI is down, or None"""
+    if not is_upstream_failure(error):
+        return None
+    stale = await analysis_cache.get_stale(cache_key)
+    if stale is not None:
+        record_error("stale_served")
+        logger.warning(f"🧊 Serving stale analysis while OpenAI is unavailable - Key: {cache_key[:19]}")
+    return stale
+
+def upstream_unavailable(e: UpstreamUnavailable) -> HTTPException:
+    """503 telling the client when OpenAI will be tried again"""
+    return HTTPException(
+        status_code=503,
+        detail="AI service temporarily unavailable - please try again shortly",
+        headers={"Retry-After": str(math.ceil(e.retry_after))}
+    )
+
+# Seconds a client is told to wait after OpenAI failed on every attempt
+UPSTREAM_FAILURE_RETRY_AFTER = 5
+
+def upstream_failed(e: Exception) -> HTTPException:
+    """504 when OpenAI timed out on every attempt, 503 for other transient failures, both with Retry-After"""
+    logger.warning(f"⚠️ OpenAI failed on every attempt: {type(e).__name__}: {str(e)}")
+    retry_after = UPSTREAM_FAILURE_RETRY_AFTER
+    if openai_service is not None:
+        retry_after = max(retry_after, openai_service.upstream.breaker.retry_after())
+    return HTTPException(
+        status_code=504 if isinstance(e, TimeoutError) else 503,
+        detail="AI service did not respond - please try again shortly",
+        headers={"Retry-After": str(math.ceil(retry_after))}
+    )
+
+def sse_event(event: str, data) -> str:
+    """Format a Server-Sent Events frame"""
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+# Headers that keep proxies from buffering an event stream
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
 
 @app.get("/")
 async def root():
     return {"message": "SpeedThreads API is running", "status": "healthy"}
 
+@app.get("/livez")
+async def liveness():
+    """Liveness probe: the process is up and its event loop is responding"""
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readiness():
+    """Readiness probe: startup has finished, OpenAI is configured and shutdown hasn't begun"""
+    ready = lifecycle["ready"] and openai_service is not None
+    body = {
+        "ready": ready,
+        "openai_configured": openai_service is not None,
+        "startup_seconds": lifecycle["startup_seconds"],
+        "upstream_breaker": openai_service.upstream.breaker.state if openai_service else None
+    }
+    return JSONResponse(body, status_code=200 if ready else 503)
+
 @app.get("/health")
 async def health_check():
     return {
         "status": "healthy",
         "openai_configured": openai_service is not None,
-        "supabase_configured": supabase is not None
+        "supabase_configured": supabase is not None,
+        "auth": token_verifier.stats(),
+        "chat_sessions": chat_sessions.stats(),
+        "log_records_dropped": log_handler.dropped,
+        "analysis_output_mode": openai_service.output_mode if openai_service else None,
+        "upstream": openai_service.upstream.stats() if openai_service else None,
+        "request_encodings": supported_encodings(),
+        "request_content_types": supported_content_types(),
+        "admission": {
+            "rate_limit": rate_limiter.stats(),
+            "upstream_queue": openai_service.limiter.stats() if openai_service else None
+        },
+        "prompt_budget": openai_service.truncation_stats if openai_service else None,
+        "jobs": job_queue.stats()
     }
 
-@app.post("/summarize", response_model=SummaryResponse)
-async def summarize_thread(thread_data: ThreadData):
+@app.get("/cache/stats")
+async def cache_stats():
+    """Analysis cache hit/miss counters and request coalescing stats"""
+    return {
+        "cache": analysis_cache.stats(),
+        "coalescing": analysis_flight.stats()
+    }
+
+@app.get("/routing/stats")
+async def routing_stats():
+    """Model routing tiers with their call counts, mean latency and estimated cost, for tuning the tiers"""
+    if not openai_service:
+        raise HTTPException(status_code=503, detail="OpenAI service not configured")
+    return openai_service.router.stats()
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: request and upstream latency, token usage, errors and cache stats"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.post("/summarize", response_model=SummaryResponse, dependencies=[Depends(rate_limit)])
+async def summarize_thread(thread_data: ThreadData, response: Response):
     """Analyze and summarize a Reddit or X thread"""
-    logger.info(f"🔍 Starting thread analysis - Platform: {thread_data.platform}, Title: {thread_data.post.title[:50] if thread_data.post.title else 'No title'}...")
-    logger.info(f"📊 Thread data: {len(thread_data.replies)} replies, Post length: {len(thread_data.post.text)} chars")
+    logger.debug(f"🔍 Starting thread analysis - Platform: {thread_data.platform}, Title: {thread_data.post.title[:50] if thread_data.post.title else 'No title'}...")
+    logger.debug(f"📊 Thread data: {len(thread_data.replies)} replies, Post length: {len(thread_data.post.text)} chars")
     
     if not openai_service:
         logger.error("❌ OpenAI service not configured")
@@ -108,18 +411,276 @@ async def summarize_thread(thread_data: ThreadData):
         )
     
     try:
-        logger.info("🤖 Calling OpenAI service for thread analysis...")
-        result = openai_service.analyze_thread(thread_data)
-        logger.info(f"✅ Analysis completed successfully - Post Type: {result.post_type}, Summary: {result.thread_summary[:100]}...")
+        logger.debug("🤖 Calling OpenAI service for thread analysis...")
+        cache_key = thread_cache_key(thread_data)
+        result = await get_or_create_analysis(thread_data, cache_key)
+        logger.debug(f"✅ Analysis completed successfully - Post Type: {result.post_type}, Summary: {result.thread_summary[:100]}...")
+        response.headers[ANALYSIS_ID_HEADER] = cache_key
         return result
+    except UpstreamUnavailable as e:
+        raise upstream_unavailable(e)
     except Exception as e:
+        if is_upstream_failure(e):
+            raise upstream_failed(e)
         logger.error(f"❌ Analysis failed: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
-@app.post("/chat", response_model=ChatResponse)
+@app.post("/summarize/stream", dependencies=[Depends(rate_limit)])
+async def stream_summarize_thread(thread_data: ThreadData):
+    """Analyze a thread, streaming the summary as Server-Sent Events as each part completes"""
+    logger.debug(f"🔍 Starting streaming thread analysis - Platform: {thread_data.platform}, Replies: {len(thread_data.replies)}")
+    
+    if not openai_service:
+        logger.error("❌ OpenAI service not configured")
+        raise HTTPException(
+            status_code=500, 
+            detail="OpenAI service not configured. Please check your API key."
+        )
+    
+    cache_key = thread_cache_key(thread_data)
+    
+    def replay(summary: SummaryResponse, stale: bool = False):
+        for event in summary_events(summary):
+            yield sse_event(event["event"], event["data"])
+        yield sse_event("done", {"summary": summary.model_dump(), "usage": None, "cached": True, "stale": stale})
+    
+    async def event_stream():
+        streamed = False
+        try:
+            # Replay an existing or in-flight analysis instead of starting a new completion
+            existing = await analysis_cache.get(cache_key)
+            if existing is None:
+                in_flight = analysis_flight.pending(cache_key)
+                if in_flight is not None:
+                    existing = await in_flight
+            if existing is not None:
+                logger.debug(f"⚡ Streaming existing analysis - Key: {cache_key[:19]}")
+                for frame in replay(existing):
+                    yield frame
+                return
+            
+            # The stream runs as the in-flight analysis, so /summarize and other streams for
+            # the same thread wait for its summary instead of starting their own completion
+            events: asyncio.Queue = asyncio.Queue()
+            
+            async def run_stream() -> SummaryResponse:
+                summary = None
+                try:
+                    async for event in openai_service.stream_analyze_thread(thread_data):
+                        if event["event"] == "done":
+                            summary = event["summary"]
+                            if not is_fallback_summary(summary):
+                                await remember_analysis(cache_key, thread_data.platform, thread_data.post, summary)
+                        events.put_nowait(event)
+                finally:
+                    events.put_nowait(None)
+                if summary is None:
+                    raise RuntimeError("Analysis stream ended without a summary")
+                return summary
+            
+            leader = analysis_flight.start(cache_key, run_stream)
+            if leader is None:
+                # Another analysis started while the cache was being checked
+                for frame in replay(await analysis_flight.pending(cache_key)):
+                    yield frame
+                return
+            
+            while (event := await events.get()) is not None:
+                streamed = True
+                yield sse_event(event["event"], event["data"])
+            # Shielded: a client that disconnects leaves the analysis running for the others
+            await asyncio.shield(leader)
+        except Exception as e:
+            # Nothing was sent yet, so an expired analysis can still stand in
+            stale = None if streamed else await get_stale_analysis(cache_key, e)
+            if stale is not None:
+                for frame in replay(stale, stale=True):
+                    yield frame
+                return
+            logger.error(f"❌ Streaming analysis failed: {str(e)}", exc_info=True)
+            detail = {"detail": f"Analysis failed: {str(e)}"}
+            if isinstance(e, UpstreamUnavailable):
+                detail["retry_after"] = math.ceil(e.retry_after)
+            yield sse_event("error", detail)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={**SSE_HEADERS, ANALYSIS_ID_HEADER: cache_key})
+
+@app.post("/summarize/update", response_model=SummaryResponse, dependencies=[Depends(rate_limit)])
+async def update_thread_summary(request: ThreadUpdateRequest, response: Response):
+    """Update a previous analysis with only the replies posted since it was made.
+    
+    The previous analysis is named by previous_analysis_id, or else is the latest
+    analysis of the same post. 409 when there is none, or when previous_analysis_id is an
+    analysis of another post: send the full thread to /summarize.
+    """
+    logger.debug(f"🔄 Starting analysis update - Platform: {request.platform}, New replies: {len(request.new_replies)}")
+    
+    if not openai_service:
+        logger.error("❌ OpenAI service not configured")
+        raise HTTPException(
+            status_code=500, 
+            detail="OpenAI service not configured. Please check your API key."
+        )
+    
+    thread_key = thread_identity_key(request.platform, request.post)
+    previous_key = request.previous_analysis_id or thread_key
+    previous = await analysis_cache.get(previous_key, count_miss=False) or await analysis_cache.get_stale(previous_key)
+    if previous is None:
+        analysis_cache.record_miss()
+        raise HTTPException(status_code=409, detail="No previous analysis of this thread - send the full thread to /summarize")
+    if previous_key != thread_key and await analysis_cache.thread_of(previous_key) != thread_key:
+        # A delta only makes sense on an analysis of the same post
+        raise HTTPException(status_code=409, detail="previous_analysis_id is not an analysis of this thread - send the full thread to /summarize")
+    
+    cache_key = update_cache_key(previous, request.new_replies)
+    
+    async def run_update() -> SummaryResponse:
+        cached = await analysis_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        result = await openai_service.update_analysis(previous, request.platform, request.post, request.new_replies)
+        if not is_fallback_summary(result):
+            await remember_analysis(cache_key, request.platform, request.post, result)
+        return result
+    
+    try:
+        result = await analysis_flight.do(cache_key, run_update)
+    except UpstreamUnavailable as e:
+        raise upstream_unavailable(e)
+    except Exception as e:
+        if is_upstream_failure(e):
+            raise upstream_failed(e)
+        logger.error(f"❌ Analysis update failed: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Analysis update failed: {str(e)}")
+    
+    response.headers[ANALYSIS_ID_HEADER] = cache_key
+    return result
+
+# Longest a GET /jobs/{id}?wait= request may be held open
+JOB_MAX_WAIT_SECONDS = float(os.getenv("JOB_MAX_WAIT_SECONDS", "30"))
+
+def job_response(job, response: Response) -> JobResponse:
+    response.headers["Location"] = f"/jobs/{job.id}"
+    if not job.finished:
+        # Suggested polling interval
+        response.headers["Retry-After"] = "1"
+    return job.to_response()
+
+@app.post("/jobs", response_model=JobResponse, status_code=202, dependencies=[Depends(rate_limit)])
+async def submit_job(thread_data: ThreadData, response: Response, priority: JobPriority = "interactive"):
+    """Queue a thread for analysis and return its job right away.
+    
+    Poll GET /jobs/{job_id} for the result. A thread that already has a queued,
+    running or successful job gets that job back (200 once it has finished).
+    Interactive jobs run before backfill jobs.
+    """
+    if not openai_service:
+        logger.error("❌ OpenAI service not configured")
+        raise HTTPException(
+            status_code=500, 
+            detail="OpenAI service not configured. Please check your API key."
+        )
+    
+    try:
+        job, created = await job_queue.submit(thread_data, thread_cache_key(thread_data), priority)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+    if job.finished:
+        response.status_code = 200
+    logger.debug(f"🧾 Job {'queued' if created else 'reused'} - ID: {job.id[:8]}, Status: {job.status}, Priority: {priority}")
+    return job_response(job, response)
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, response: Response, wait: float = 0):
+    """Status of a job, with its summary once it has succeeded.
+    
+    With ?wait=N the request is held up to N seconds until the job finishes (long polling).
+    """
+    job = await job_queue.wait(job_id, min(max(wait, 0), JOB_MAX_WAIT_SECONDS))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job_response(job, response)
+
+# Limits for batch summarization (backfill jobs)
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+@app.post("/summarize/batch", response_model=BatchSummarizeResponse)
+async def summarize_batch(request: BatchSummarizeRequest, http_request: Request, stream: bool = False):
+    """Analyze many threads concurrently, returning a result or error per thread.
+    
+    With ?stream=true, results are sent as NDJSON lines in completion order.
+    """
+    logger.info(f"📦 Starting batch analysis - Threads: {len(request.threads)}, Stream: {stream}")
+    
+    if not openai_service:
+        logger.error("❌ OpenAI service not configured")
+        raise HTTPException(
+            status_code=500, 
+            detail="OpenAI service not configured. Please check your API key."
+        )
+    if len(request.threads) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch too large - at most {BATCH_MAX_ITEMS} threads per request")
+    await admit(http_request, cost=len(request.threads))
+    
+    concurrency = max(1, min(request.concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+    limiter = asyncio.Semaphore(concurrency)
+    
+    # Duplicate threads in one batch are analyzed once and share the result
+    indexes_by_key: dict[str, list[int]] = {}
+    for index, thread_data in enumerate(request.threads):
+        indexes_by_key.setdefault(thread_cache_key(thread_data), []).append(index)
+    logger.debug(f"📦 Batch has {len(indexes_by_key)} unique threads, Concurrency: {concurrency}")
+    
+    async def run_item(indexes: list[int]) -> list[BatchItemResult]:
+        async with limiter:
+            try:
+                summary = await get_or_create_analysis(request.threads[indexes[0]])
+                return [BatchItemResult(index=index, summary=summary) for index in indexes]
+            except Exception as e:
+                logger.warning(f"⚠️ Batch item {indexes[0]} failed: {str(e)}")
+                return [BatchItemResult(index=index, error=f"Analysis failed: {str(e)}") for index in indexes]
+    
+    tasks = [asyncio.create_task(run_item(indexes)) for indexes in indexes_by_key.values()]
+    
+    if stream:
+        async def ndjson_stream():
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    for item in await next_done:
+                        yield item.model_dump_json() + "\n"
+            finally:
+                # Stop outstanding work if the client went away
+                for task in tasks:
+                    task.cancel()
+        
+        return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+    
+    results = [item for items in await asyncio.gather(*tasks) for item in items]
+    results.sort(key=lambda item: item.index)
+    failed = sum(1 for item in results if item.error)
+    logger.info(f"✅ Batch analysis completed - Threads: {len(results)}, Failed: {failed}")
+    return BatchSummarizeResponse(results=results)
+
+def needs_first_turn_analysis(request: ChatRequest) -> bool:
+    """Whether a chat turn should also return the thread analysis"""
+    if request.has_analysis is not None:
+        return not request.has_analysis
+    # Older clients don't send the flag: only the turn before any assistant reply is first
+    return not any(msg.role == "assistant" for msg in request.messages)
+
+async def get_analysis_or_none(thread_data: ThreadData) -> Optional[SummaryResponse]:
+    """Cached or fresh analysis for a chat turn; a failure here must not fail the reply"""
+    try:
+        return await get_or_create_analysis(thread_data)
+    except Exception as e:
+        logger.warning(f"⚠️ First-turn analysis failed, replying without it: {str(e)}")
+        return None
+
+@app.post("/chat", response_model=ChatResponse, dependencies=[Depends(rate_limit)])
 async def chat_about_thread(request: ChatRequest):
     """Continue conversation about a thread"""
-    logger.info(f"💬 Starting chat - User message: {request.user_message[:100]}..., Previous messages: {len(request.messages)}")
+    logger.debug(f"💬 Starting chat - User message: {request.user_message[:100]}..., Previous messages: {len(request.messages)}")
     
     if not openai_service:
         logger.error("❌ OpenAI service not configured for chat")
@@ -129,40 +690,210 @@ async def chat_about_thread(request: ChatRequest):
         )
     
     try:
-        # Get AI response
-        logger.info("🤖 Getting AI response for chat...")
-        ai_message = openai_service.chat_about_thread(
+        # On the first turn the analysis is produced alongside the reply, not after it
+        include_analysis = needs_first_turn_analysis(request)
+        logger.debug(f"🤖 Getting AI response for chat... Include analysis: {include_analysis}")
+        
+        chat_call = openai_service.chat_about_thread(
             request.thread_data, 
             request.messages, 
             request.user_message
         )
-        
-        # Check if this is the first message (no previous analysis)
-        has_analysis = any(msg.role == "assistant" and "analysis" in msg.content.lower() for msg in request.messages)
-        logger.info(f"📋 Has previous analysis: {has_analysis}, Message count: {len(request.messages)}")
-        
-        # If it's the first message, also provide analysis
         analysis = None
-        if not has_analysis and len(request.messages) <= 1:
-            logger.info("🔍 First message detected, generating analysis...")
-            analysis = openai_service.analyze_thread(request.thread_data)
+        if include_analysis:
+            ai_message, analysis = await asyncio.gather(
+                chat_call,
+                get_analysis_or_none(request.thread_data)
+            )
+        else:
+            ai_message = await chat_call
         
-        logger.info(f"✅ Chat completed - Response length: {len(ai_message)} chars, Analysis provided: {analysis is not None}")
+        logger.debug(f"✅ Chat completed - Response length: {len(ai_message)} chars, Analysis provided: {analysis is not None}")
         return ChatResponse(
             message=ai_message,
             analysis=analysis
         )
         
+    except UpstreamUnavailable as e:
+        raise upstream_unavailable(e)
     except Exception as e:
+        if is_upstream_failure(e):
+            raise upstream_failed(e)
         logger.error(f"❌ Chat failed: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
 
+@app.post("/chat/stream", dependencies=[Depends(rate_limit)])
+async def stream_chat_about_thread(request: ChatRequest):
+    """Continue conversation about a thread, streaming tokens as Server-Sent Events"""
+    logger.debug(f"💬 Starting streaming chat - Previous messages: {len(request.messages)}")
+    
+    if not openai_service:
+        logger.error("❌ OpenAI service not configured for chat")
+        raise HTTPException(
+            status_code=500, 
+            detail="OpenAI service not configured. Please check your API key."
+        )
+    
+    async def event_stream():
+        # Start the first-turn analysis now so it runs while tokens are streaming
+        analysis_task = None
+        if needs_first_turn_analysis(request):
+            analysis_task = asyncio.create_task(get_analysis_or_none(request.thread_data))
+        try:
+            async for event in openai_service.stream_chat_about_thread(
+                request.thread_data, 
+                request.messages, 
+                request.user_message
+            ):
+                yield sse_event(event["event"], event["data"])
+            if analysis_task is not None:
+                analysis = await analysis_task
+                if analysis is not None:
+                    yield sse_event("analysis", analysis.model_dump())
+        except Exception as e:
+            logger.error(f"❌ Streaming chat failed: {str(e)}", exc_info=True)
+            yield sse_event("error", {"detail": f"Chat failed: {str(e)}"})
+        finally:
+            if analysis_task is not None and not analysis_task.done():
+                analysis_task.cancel()
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+# Server-side chat sessions: the thread is uploaded and formatted once per conversation
+chat_sessions = SessionStore.from_env()
+
+# Once the stored turns exceed this many estimated tokens, older ones are folded into a summary
+CHAT_SESSION_COMPACT_TOKENS = int(os.getenv("CHAT_SESSION_COMPACT_TOKENS", "2000"))
+CHAT_SESSION_KEEP_MESSAGES = int(os.getenv("CHAT_SESSION_KEEP_MESSAGES", "4"))
+
+# Component stats are read at scrape time from whichever process serves /metrics
+register_stats("speedthreads_analysis_cache", analysis_cache.stats, counters=("hits", "memory_hits", "disk_hits", "misses", "sets", "evictions", "expirations"))
+register_stats("speedthreads_coalescing", analysis_flight.stats, counters=("leaders", "coalesced"))
+register_stats("speedthreads_chat_sessions", chat_sessions.stats, counters=("created", "expired", "evicted", "compactions"))
+register_stats("speedthreads_auth", token_verifier.stats, counters=("cache_hits", "local", "remote", "rejected"))
+register_stats("speedthreads_rate_limit", rate_limiter.stats, counters=("allowed", "limited"))
+register_stats("speedthreads_jobs", job_queue.stats, counters=("submitted", "deduplicated", "succeeded", "failed", "retried", "recovered", "rejected"))
+
+def get_chat_session(session_id: str) -> ChatSession:
+    if not openai_service:
+        logger.error("❌ OpenAI service not configured for chat")
+        raise HTTPException(
+            status_code=500, 
+            detail="OpenAI service not configured. Please check your API key."
+        )
+    session = chat_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Chat session not found or expired")
+    return session
+
+async def compact_chat_session(session: ChatSession):
+    """Fold older turns into the session's rolling summary once they grow too large"""
+    async with session.lock:
+        if session.turn_tokens() <= CHAT_SESSION_COMPACT_TOKENS or len(session.turns) <= CHAT_SESSION_KEEP_MESSAGES:
+            return
+        older = session.turns[:-CHAT_SESSION_KEEP_MESSAGES]
+        try:
+            session.summary = await openai_service.summarize_conversation(session.summary, older)
+        except Exception as e:
+            logger.warning(f"⚠️ Chat session compaction failed, keeping full history: {str(e)}")
+            return
+        session.turns = session.turns[len(older):]
+        chat_sessions.record_compaction()
+        logger.info(f"🗜️ Compacted chat session {session.id[:8]} - Kept {len(session.turns)} messages")
+
+# The event loop only keeps weak references to tasks, so running compactions are held here
+compaction_tasks: Set[asyncio.Task] = set()
+
+def compaction_done(task: asyncio.Task):
+    compaction_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"❌ Chat session compaction crashed: {str(task.exception())}", exc_info=task.exception())
+
+def schedule_compaction(session: ChatSession):
+    # Compaction runs after the reply is sent; the next turn waits on the session lock
+    if session.turn_tokens() > CHAT_SESSION_COMPACT_TOKENS:
+        task = asyncio.create_task(compact_chat_session(session))
+        compaction_tasks.add(task)
+        task.add_done_callback(compaction_done)
+
+@app.post("/chat/sessions", response_model=ChatSessionResponse, dependencies=[Depends(rate_limit)])
+async def create_chat_session(request: ChatSessionCreateRequest):
+    """Start a chat session; later turns send only the new user message"""
+    if not openai_service:
+        logger.error("❌ OpenAI service not configured for chat")
+        raise HTTPException(
+            status_code=500, 
+            detail="OpenAI service not configured. Please check your API key."
+        )
+    
+    thread_context = openai_service.format_thread_context(request.thread_data)
+    session = chat_sessions.create(thread_context, request.messages)
+    logger.debug(f"💬 Chat session created - ID: {session.id[:8]}, Context: {len(thread_context)} chars, Messages: {len(request.messages)}")
+    schedule_compaction(session)
+    return ChatSessionResponse(session_id=session.id, ttl_seconds=chat_sessions.ttl_seconds)
+
+@app.post("/chat/sessions/{session_id}/messages", response_model=ChatResponse, dependencies=[Depends(rate_limit)])
+async def chat_in_session(session_id: str, request: ChatSessionMessageRequest):
+    """Send one user message in an existing chat session"""
+    session = get_chat_session(session_id)
+    
+    async with session.lock:
+        try:
+            ai_message = await openai_service.chat_with_context(
+                session.thread_context, session.turns, request.user_message, session.summary
+            )
+        except UpstreamUnavailable as e:
+            raise upstream_unavailable(e)
+        except Exception as e:
+            if is_upstream_failure(e):
+                raise upstream_failed(e)
+            logger.error(f"❌ Session chat failed: {str(e)}", exc_info=True)
+            raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
+        session.turns.append(ChatMessage(role="user", content=request.user_message))
+        session.turns.append(ChatMessage(role="assistant", content=ai_message))
+    
+    schedule_compaction(session)
+    logger.debug(f"✅ Session chat completed - ID: {session.id[:8]}, Response length: {len(ai_message)} chars")
+    return ChatResponse(message=ai_message)
+
+@app.post("/chat/sessions/{session_id}/messages/stream", dependencies=[Depends(rate_limit)])
+async def stream_chat_in_session(session_id: str, request: ChatSessionMessageRequest):
+    """Send one user message in an existing chat session, streaming tokens as Server-Sent Events"""
+    session = get_chat_session(session_id)
+    
+    async def event_stream():
+        async with session.lock:
+            parts = []
+            try:
+                async for event in openai_service.stream_chat_with_context(
+                    session.thread_context, session.turns, request.user_message, session.summary
+                ):
+                    if event["event"] == "token":
+                        parts.append(event["data"]["delta"])
+                    yield sse_event(event["event"], event["data"])
+            except Exception as e:
+                logger.error(f"❌ Streaming session chat failed: {str(e)}", exc_info=True)
+                yield sse_event("error", {"detail": f"Chat failed: {str(e)}"})
+                return
+            session.turns.append(ChatMessage(role="user", content=request.user_message))
+            session.turns.append(ChatMessage(role="assistant", content="".join(parts)))
+        schedule_compaction(session)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.delete("/chat/sessions/{session_id}")
+async def delete_chat_session(session_id: str):
+    """End a chat session"""
+    if not chat_sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Chat session not found or expired")
+    return {"deleted": True}
+
 # Authentication endpoints for Chrome extension
 @app.post("/auth/validate")
 async def validate_token(request: dict):
-    """Validate JWT token with Supabase (secure backend endpoint)"""
-    if not supabase:
-        logger.warning("❌ Supabase not available - authentication disabled")
+    """Validate a Supabase JWT, locally when possible (secure backend endpoint)"""
+    if not token_verifier.available:
+        logger.warning("❌ Token verification not configured - authentication disabled")
         return {"valid": False, "error": "Authentication service not available"}
     
     token = request.get("token")
@@ -170,19 +901,11 @@ async def validate_token(request: dict):
         raise HTTPException(status_code=400, detail="Token is required")
     
     try:
-        # Use Supabase to validate the token
-        response = supabase.auth.get_user(token)
+        user = await token_verifier.verify(token)
         
-        if response.user:
-            logger.info(f"✅ Token validation successful for user: {response.user.id}")
-            return {
-                "valid": True,
-                "user": {
-                    "id": response.user.id,
-                    "email": response.user.email,
-                    "user_metadata": response.user.user_metadata
-                }
-            }
+        if user:
+            logger.debug(f"✅ Token validation successful for user: {user['id']}")
+            return {"valid": True, "user": user}
         else:
             logger.warning("❌ Token validation failed - no user found")
             return {"valid": False, "error": "Invalid token"}
@@ -194,8 +917,8 @@ async def validate_token(request: dict):
 @app.get("/auth/user")
 async def get_user_info(authorization: str = None):
     """Get user information from token"""
-    if not supabase:
-        logger.warning("❌ Supabase not available - authentication disabled")
+    if not token_verifier.available:
+        logger.warning("❌ Token verification not configured - authentication disabled")
         raise HTTPException(status_code=503, detail="Authentication service not available")
     
     if not authorization or not authorization.startswith("Bearer "):
@@ -204,20 +927,14 @@ async def get_user_info(authorization: str = None):
     token = authorization.replace("Bearer ", "")
     
     try:
-        response = supabase.auth.get_user(token)
-        
-        if response.user:
-            return {
-                "id": response.user.id,
-                "email": response.user.email,
-                "user_metadata": response.user.user_metadata
-            }
-        else:
-            raise HTTPException(status_code=401, detail="Invalid token")
-            
+        user = await token_verifier.verify(token)
     except Exception as e:
         logger.error(f"❌ Get user error: {str(e)}")
         raise HTTPException(status_code=401, detail="Authentication failed")
+    
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return user
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,164 @@
+import os
+from contextvars import ContextVar
+from typing import Callable, Iterable, Optional
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from starlette.routing import Match
+
+# Route template of the request being served, so upstream metrics can be attributed to it
+endpoint_var: ContextVar[str] = ContextVar("endpoint", default="none")
+
+# Request latency buckets in seconds: fast cache hits up to slow map-reduce analyses
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+
+REQUEST_LATENCY = Histogram(
+    "speedthreads_request_duration_seconds",
+    "Time from request arrival to response start, by route",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "speedthreads_requests_in_flight",
+    "Requests currently being served, by route",
+    ["route"],
+    multiprocess_mode="livesum"
+)
+UPSTREAM_LATENCY = Histogram(
+    "speedthreads_openai_request_duration_seconds",
+    "Duration of OpenAI completion calls",
+    ["operation", "model"],
+    buckets=LATENCY_BUCKETS
+)
+UPSTREAM_TTFT = Histogram(
+    "speedthreads_openai_time_to_first_token_seconds",
+    "Time to first token of streamed OpenAI completions",
+    ["operation", "model"],
+    buckets=LATENCY_BUCKETS
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "speedthreads_openai_requests_in_flight",
+    "OpenAI completion calls currently running",
+    multiprocess_mode="livesum"
+)
+ROUTE_LATENCY = Histogram(
+    "speedthreads_openai_route_duration_seconds",
+    "Duration of OpenAI completion calls by routing tier",
+    ["route", "model"],
+    buckets=LATENCY_BUCKETS
+)
+ROUTE_COST = Counter(
+    "speedthreads_openai_cost_usd_total",
+    "Estimated OpenAI spend in USD by routing tier",
+    ["route", "model"]
+)
+TOKENS = Counter(
+    "speedthreads_openai_tokens_total",
+    "OpenAI tokens used, by endpoint and kind (prompt, cached_prompt or completion)",
+    ["endpoint", "operation", "kind"]
+)
+ANALYSIS_RESULTS = Counter(
+    "speedthreads_analysis_results_total",
+    "Thread analyses by output mode and outcome; each fallback usually costs a retried analysis",
+    ["mode", "outcome"]
+)
+ERRORS = Counter(
+    "speedthreads_errors_total",
+    "Errors and degraded results by type",
+    ["type"]
+)
+
+# Export every error type from the start so rates don't begin at a missing series
+ERROR_TYPES = ("json_parse_fallback", "validation_fallback", "upstream_error", "circuit_open", "stale_served", "rate_limited", "overloaded")
+for error_type in ERROR_TYPES:
+    ERRORS.labels(error_type)
+
+
+def route_template(scope) -> str:
+    """The matched route's path template, which keeps label cardinality bounded"""
+    app = scope.get("app")
+    router = getattr(app, "router", None)
+    for route in getattr(router, "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+def record_completion(operation: str, route: str, model: str, usage, duration: float, cost: float, time_to_first_token: Optional[float] = None):
+    """Record latency, token usage and estimated cost of one upstream call"""
+    UPSTREAM_LATENCY.labels(operation, model).observe(duration)
+    ROUTE_LATENCY.labels(route, model).observe(duration)
+    ROUTE_COST.labels(route, model).inc(cost)
+    if time_to_first_token is not None:
+        UPSTREAM_TTFT.labels(operation, model).observe(time_to_first_token)
+    if usage is not None:
+        endpoint = endpoint_var.get()
+        TOKENS.labels(endpoint, operation, "prompt").inc(usage.prompt_tokens or 0)
+        TOKENS.labels(endpoint, operation, "cached_prompt").inc(cached_tokens(usage))
+        TOKENS.labels(endpoint, operation, "completion").inc(usage.completion_tokens or 0)
+
+
+def cached_tokens(usage) -> int:
+    """Prompt tokens OpenAI served from its prefix cache, billed at a discount"""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (getattr(details, "cached_tokens", None) or 0) if details is not None else 0
+
+
+def record_analysis(mode: str, outcome: str):
+    ANALYSIS_RESULTS.labels(mode, outcome).inc()
+
+
+def record_error(error_type: str):
+    ERRORS.labels(error_type).inc()
+
+
+class StatsCollector:
+    """Expose a component's stats() dict as metrics at scrape time"""
+
+    def __init__(self, prefix: str, stats: Callable[[], dict], counters: Iterable[str] = ()):
+        self.prefix = prefix
+        self.stats = stats
+        self.counters = set(counters)
+
+    def collect(self):
+        for key, value in self.stats().items():
+            if not isinstance(value, (int, float)):
+                continue
+            name = f"{self.prefix}_{key}"
+            if key in self.counters:
+                yield CounterMetricFamily(name, f"{self.prefix} {key}", value=value)
+            else:
+                yield GaugeMetricFamily(name, f"{self.prefix} {key}", value=value)
+
+
+# Kept so they can be added to the multiprocess registry, which only reads the shared metric files
+STATS_COLLECTORS: list[StatsCollector] = []
+
+
+def register_stats(prefix: str, stats: Callable[[], dict], counters: Iterable[str] = ()):
+    collector = StatsCollector(prefix, stats, counters)
+    STATS_COLLECTORS.append(collector)
+    REGISTRY.register(collector)
+
+
+def mark_process_dead():
+    """Drop this worker's live gauges from the multiprocess aggregate when it exits"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Prometheus exposition of all metrics; aggregates worker processes when PROMETHEUS_MULTIPROC_DIR is set.
+
+    Component stats are not aggregated: with several workers they come from
+    the process that serves the scrape.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        for collector in STATS_COLLECTORS:
+            registry.register(collector)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
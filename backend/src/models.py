@@ -19,6 +19,14 @@ class ThreadData(BaseModel):
     post: PostData
     replies: List[ReplyData]
 
+class ThreadUpdateRequest(BaseModel):
+    platform: Literal["reddit", "x"]
+    post: PostData
+    # Only the replies added since the previous analysis
+    new_replies: List[ReplyData]
+    # X-Analysis-Id of the analysis to update; without it, the latest analysis of this post is used
+    previous_analysis_id: Optional[str] = None
+
 class KeyReply(BaseModel):
     author: str
     text: str
@@ -42,7 +50,47 @@ class ChatRequest(BaseModel):
     thread_data: ThreadData
     messages: List[ChatMessage]
     user_message: str
+    # Whether the client already shows an analysis; None means decide from the history
+    has_analysis: Optional[bool] = None
 
 class ChatResponse(BaseModel):
     message: str
     analysis: Optional[SummaryResponse] = None
+
+class BatchSummarizeRequest(BaseModel):
+    threads: List[ThreadData]
+    concurrency: Optional[int] = None
+
+class BatchItemResult(BaseModel):
+    index: int
+    summary: Optional[SummaryResponse] = None
+    error: Optional[str] = None
+
+class BatchSummarizeResponse(BaseModel):
+    results: List[BatchItemResult]
+
+class ChatSessionCreateRequest(BaseModel):
+    thread_data: ThreadData
+    messages: List[ChatMessage] = []
+
+class ChatSessionResponse(BaseModel):
+    session_id: str
+    ttl_seconds: float
+
+class ChatSessionMessageRequest(BaseModel):
+    user_message: str
+
+# Interactive jobs run before backfill jobs
+JobPriority = Literal["interactive", "backfill"]
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: Literal["queued", "running", "succeeded", "failed"]
+    priority: JobPriority
+    # X-Analysis-Id of the result, usable as previous_analysis_id once the job has succeeded
+    analysis_id: str
+    attempts: int = 0
+    created_at: float
+    finished_at: Optional[float] = None
+    summary: Optional[SummaryResponse] = None
+    error: Optional[str] = None
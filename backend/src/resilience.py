@@ -0,0 +1,283 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+import openai
+from .metrics import record_error
+
+# Set up logger for this module
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Successful call durations kept per operation for the hedging delay
+LATENCY_WINDOW = 200
+
+# Don't hedge until an operation has this many samples to take a percentile from
+MIN_HEDGE_SAMPLES = 20
+
+
+class UpstreamUnavailable(Exception):
+    """Raised without calling OpenAI while the circuit breaker is open"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Transient upstream failures: timeouts, connection errors, rate limits and 5xx responses"""
+    if isinstance(error, (TimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.RateLimitError):
+        # An exhausted quota won't come back within a retry
+        return getattr(error, "code", None) != "insufficient_quota"
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500
+    return False
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """Failures that mean OpenAI is down or overloaded, as opposed to a bad request"""
+    return isinstance(error, UpstreamUnavailable) or is_retryable(error)
+
+
+def _retry_after_header(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """Fail fast after consecutive upstream failures, probing again after a cooldown.
+
+    closed: calls go through. open: calls are rejected until reset_seconds have
+    passed. half-open: one probe call goes through; its outcome closes or reopens
+    the breaker.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._counters = {"opened": 0, "rejected": 0}
+
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_at + self.reset_seconds - time.monotonic())
+
+    def before_call(self):
+        if self.state == "closed":
+            return
+        if self.state == "open" and self.retry_after() <= 0:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            logger.info("🔌 Circuit breaker half-open - probing OpenAI")
+            return
+        self._counters["rejected"] += 1
+        record_error("circuit_open")
+        raise UpstreamUnavailable("OpenAI is temporarily unavailable", max(1.0, self.retry_after()))
+
+    def record_success(self):
+        if self.state != "closed":
+            logger.info("🔌 Circuit breaker closed - OpenAI is responding again")
+        self.state = "closed"
+        self._failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self._failures += 1
+        if self.state == "half_open" or self._failures >= self.failure_threshold:
+            if self.state != "open":
+                self._counters["opened"] += 1
+                logger.warning(f"🔌 Circuit breaker open after {self._failures} consecutive failures - failing fast for {self.reset_seconds:.0f}s")
+            self.state = "open"
+            self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release_probe(self):
+        """A probe that ended without a verdict (e.g. cancelled) lets the next call probe"""
+        self._probing = False
+
+    def stats(self) -> dict:
+        return {
+            **self._counters,
+            "state": self.state,
+            "open": self.state != "closed",
+            "consecutive_failures": self._failures
+        }
+
+
+class UpstreamPolicy:
+    """Deadlines, jittered retries, circuit breaking and hedging around OpenAI calls.
+
+    Every attempt is given a timeout of at most attempt_timeout seconds, and
+    retries stop at deadline seconds after the call started. Attempts apply
+    the timeout themselves, once they hold an upstream slot, so time spent
+    queueing for capacity is never mistaken for a slow upstream. Only transient failures are retried, with
+    full-jitter exponential backoff (honouring Retry-After), and only while no
+    output has been consumed, so a partly streamed answer is never repeated.
+    Hedging sends a second copy of a non-streamed call once it has run longer
+    than the operation's p95, and takes whichever finishes first.
+    """
+
+    def __init__(
+        self,
+        attempt_timeout: float = 30,
+        deadline: float = 60,
+        max_retries: int = 2,
+        retry_base_delay: float = 0.25,
+        retry_max_delay: float = 4,
+        breaker: Optional[CircuitBreaker] = None,
+        hedge_enabled: bool = False,
+        hedge_min_delay: float = 1.0,
+        hedge_percentile: float = 0.95
+    ):
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_percentile = hedge_percentile
+        self._latencies: Dict[str, deque] = {}
+        self._counters = {"retries": 0, "timeouts": 0, "hedges": 0, "hedge_wins": 0}
+
+    @classmethod
+    def from_env(cls) -> "UpstreamPolicy":
+        """Build a policy from OPENAI_* and OPENAI_BREAKER_* environment variables"""
+        return cls(
+            attempt_timeout=float(os.getenv("OPENAI_TIMEOUT_SECONDS", "30")),
+            deadline=float(os.getenv("OPENAI_DEADLINE_SECONDS", "60")),
+            max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "2")),
+            retry_base_delay=float(os.getenv("OPENAI_RETRY_BASE_DELAY", "0.25")),
+            retry_max_delay=float(os.getenv("OPENAI_RETRY_MAX_DELAY", "4")),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv("OPENAI_BREAKER_FAILURES", "5")),
+                reset_seconds=float(os.getenv("OPENAI_BREAKER_RESET_SECONDS", "30"))
+            ),
+            hedge_enabled=os.getenv("OPENAI_HEDGE_ENABLED", "false").lower() == "true",
+            hedge_min_delay=float(os.getenv("OPENAI_HEDGE_MIN_DELAY", "1.0"))
+        )
+
+    async def call(
+        self,
+        operation: str,
+        attempt: Callable[[float], Awaitable[T]],
+        hedge: bool = False,
+        hedge_allowed: Callable[[], bool] = lambda: True
+    ) -> T:
+        """Run attempt(timeout) under the policy; it must be safe to run more than once"""
+        deadline = time.monotonic() + self.deadline
+        retries = 0
+        while True:
+            self.breaker.before_call()
+            remaining = deadline - time.monotonic()
+            timeout = min(self.attempt_timeout, remaining)
+            start_time = time.monotonic()
+            try:
+                if hedge and self.hedge_enabled:
+                    result = await self._hedged(operation, attempt, timeout, hedge_allowed)
+                else:
+                    result = await attempt(timeout)
+            except asyncio.CancelledError:
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                if isinstance(e, TimeoutError):
+                    self._counters["timeouts"] += 1
+                    e = TimeoutError(f"OpenAI {operation} call timed out after {timeout:.1f}s")
+                if not is_retryable(e):
+                    # The upstream answered; the request itself was bad
+                    self.breaker.release_probe()
+                    raise e
+                self.breaker.record_failure()
+                record_error("upstream_error")
+
+                delay = self._backoff(retries, e)
+                if retries >= self.max_retries or time.monotonic() + delay >= deadline or self.breaker.state == "open":
+                    raise e
+                retries += 1
+                self._counters["retries"] += 1
+                logger.warning(f"🔁 OpenAI {operation} failed ({type(e).__name__}: {e}) - retry {retries}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            self._record_latency(operation, time.monotonic() - start_time)
+            return result
+
+    def record_stream_failure(self, error: BaseException):
+        """A stream failed after it started; it can't be retried but still counts against the breaker"""
+        if is_retryable(error):
+            self.breaker.record_failure()
+            record_error("upstream_error")
+
+    def _backoff(self, retries: int, error: BaseException) -> float:
+        # Full jitter keeps retries from many requests from arriving in lockstep
+        delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** retries))
+        retry_after = _retry_after_header(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.retry_max_delay))
+        return delay
+
+    def _record_latency(self, operation: str, duration: float):
+        window = self._latencies.get(operation)
+        if window is None:
+            window = self._latencies[operation] = deque(maxlen=LATENCY_WINDOW)
+        window.append(duration)
+
+    def hedge_delay(self, operation: str) -> Optional[float]:
+        """How long to wait before hedging: the operation's recent p95, or None while there is too little data"""
+        window = self._latencies.get(operation)
+        if not window or len(window) < MIN_HEDGE_SAMPLES:
+            return None
+        ordered = sorted(window)
+        p95 = ordered[min(len(ordered) - 1, int(self.hedge_percentile * len(ordered)))]
+        return max(self.hedge_min_delay, p95)
+
+    async def _hedged(self, operation: str, attempt: Callable[[float], Awaitable[T]], timeout: float, hedge_allowed: Callable[[], bool]) -> T:
+        delay = self.hedge_delay(operation)
+        if delay is None or delay >= timeout:
+            return await attempt(timeout)
+
+        primary = asyncio.ensure_future(attempt(timeout))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and hedge_allowed():
+                self._counters["hedges"] += 1
+                logger.debug(f"🏁 Hedging OpenAI {operation} after {delay:.2f}s")
+                tasks.add(asyncio.ensure_future(attempt(timeout - delay)))
+
+            # Each attempt enforces its own timeout, so this always finishes
+            error: Optional[BaseException] = None
+            pending = tasks
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self._counters["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> dict:
+        return {**self._counters, "breaker": self.breaker.stats()}
@@ -0,0 +1,206 @@
+import os
+import logging
+from dataclasses import dataclass, replace
+from typing import Dict, Optional, Tuple
+from .metrics import cached_tokens
+
+# Set up logger for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# How much the analysis should say: "brief" asks for fewer categories and replies, "full" allows more
+DETAIL_LEVELS = ("brief", "standard", "full")
+
+# USD per million tokens: (prompt, cached prompt, completion). Override or extend with MODEL_PRICES
+MODEL_PRICES: Dict[str, Tuple[float, float, float]] = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00)
+}
+
+
+@dataclass(frozen=True)
+class Route:
+    """Completion settings for one kind of call"""
+    name: str
+    model: str
+    max_tokens: int
+    temperature: float
+    detail: str = "standard"
+
+    def completion_kwargs(self) -> dict:
+        return {"model": self.model, "max_tokens": self.max_tokens, "temperature": self.temperature}
+
+
+# Analyses are routed by the size of the formatted thread; the other calls by what they do.
+# analyze_medium is what every analysis used before routing
+DEFAULT_ROUTES = {
+    "analyze_small": Route("analyze_small", DEFAULT_MODEL, max_tokens=600, temperature=0.7, detail="brief"),
+    "analyze_medium": Route("analyze_medium", DEFAULT_MODEL, max_tokens=1000, temperature=0.7),
+    "analyze_large": Route("analyze_large", DEFAULT_MODEL, max_tokens=1500, temperature=0.7, detail="full"),
+    "update": Route("update", DEFAULT_MODEL, max_tokens=1000, temperature=0.3),
+    "map": Route("map", DEFAULT_MODEL, max_tokens=600, temperature=0.3),
+    "chat": Route("chat", DEFAULT_MODEL, max_tokens=500, temperature=0.7),
+    "compact": Route("compact", DEFAULT_MODEL, max_tokens=300, temperature=0.3)
+}
+
+# Post types whose analyses need little detail whatever the thread size
+BRIEF_POST_TYPES = ("Funny/Entertainment",)
+
+
+def parse_prices(spec: str) -> Dict[str, Tuple[float, float, float]]:
+    """Prices from "model=prompt/cached/completion,..." in USD per million tokens"""
+    prices = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            model, values = item.split("=", 1)
+            prompt, cached, completion = (float(value) for value in values.split("/"))
+        except ValueError:
+            logger.warning(f"⚠️ Ignoring malformed MODEL_PRICES entry {item!r}")
+            continue
+        prices[model.strip()] = (prompt, cached, completion)
+    return prices
+
+
+class ModelRouter:
+    """Picks the model, max_tokens, temperature and output detail for each OpenAI call.
+
+    Analyses go to the small, medium or large tier by the estimated tokens of
+    the formatted thread; map-reduce analyses always count as large. Every
+    call's latency, tokens and estimated cost are accumulated per route so
+    the tiers can be tuned.
+    """
+
+    def __init__(
+        self,
+        routes: Optional[Dict[str, Route]] = None,
+        small_max_prompt_tokens: int = 1200,
+        medium_max_prompt_tokens: int = 6000,
+        enabled: bool = True,
+        prices: Optional[Dict[str, Tuple[float, float, float]]] = None
+    ):
+        self.routes = dict(routes or DEFAULT_ROUTES)
+        self.small_max_prompt_tokens = small_max_prompt_tokens
+        self.medium_max_prompt_tokens = medium_max_prompt_tokens
+        self.enabled = enabled
+        self.prices = {**MODEL_PRICES, **(prices or {})}
+        self._stats: Dict[str, dict] = {}
+
+    @classmethod
+    def from_env(cls) -> "ModelRouter":
+        """Build a router from ROUTING_*, OPENAI_MODEL, ROUTE_<NAME>_* and MODEL_PRICES environment variables.
+
+        OPENAI_MODEL sets the model of every route; ROUTE_<NAME>_MODEL,
+        _MAX_TOKENS, _TEMPERATURE and _DETAIL override one route, e.g.
+        ROUTE_ANALYZE_LARGE_MODEL=gpt-4o.
+        """
+        default_model = os.getenv("OPENAI_MODEL", DEFAULT_MODEL)
+        routes = {}
+        for name, route in DEFAULT_ROUTES.items():
+            prefix = f"ROUTE_{name.upper()}_"
+            detail = os.getenv(prefix + "DETAIL", route.detail).lower()
+            if detail not in DETAIL_LEVELS:
+                logger.warning(f"⚠️ Unknown {prefix}DETAIL {detail!r} - using {route.detail}")
+                detail = route.detail
+            routes[name] = replace(
+                route,
+                model=os.getenv(prefix + "MODEL", default_model),
+                max_tokens=int(os.getenv(prefix + "MAX_TOKENS", str(route.max_tokens))),
+                temperature=float(os.getenv(prefix + "TEMPERATURE", str(route.temperature))),
+                detail=detail
+            )
+        return cls(
+            routes=routes,
+            small_max_prompt_tokens=int(os.getenv("ROUTING_SMALL_MAX_PROMPT_TOKENS", "1200")),
+            # Threads that fit the prompt budget are medium; larger ones are condensed by map-reduce
+            medium_max_prompt_tokens=int(os.getenv("ROUTING_MEDIUM_MAX_PROMPT_TOKENS", os.getenv("PROMPT_TOKEN_BUDGET", "6000"))),
+            enabled=os.getenv("ROUTING_ENABLED", "true").lower() == "true",
+            prices=parse_prices(os.getenv("MODEL_PRICES", ""))
+        )
+
+    @property
+    def default_model(self) -> str:
+        return self.routes["analyze_medium"].model
+
+    def route(self, name: str) -> Route:
+        return self.routes[name]
+
+    def analysis_route(self, prompt_tokens: int, condensed: bool = False) -> Route:
+        """Tier for a thread analysis, from the estimated tokens of the formatted thread"""
+        if not self.enabled:
+            return self.routes["analyze_medium"]
+        if condensed or prompt_tokens > self.medium_max_prompt_tokens:
+            return self.routes["analyze_large"]
+        if prompt_tokens <= self.small_max_prompt_tokens:
+            return self.routes["analyze_small"]
+        return self.routes["analyze_medium"]
+
+    def update_route(self, post_type: str) -> Route:
+        """Route for a delta re-analysis; the previous analysis already says what kind of post it is"""
+        route = self.routes["update"]
+        if self.enabled and post_type in BRIEF_POST_TYPES and route.detail == "standard":
+            return replace(route, detail="brief")
+        return route
+
+    def cost(self, model: str, usage) -> float:
+        """Estimated USD cost of one call; 0 for models without a known price"""
+        if usage is None:
+            return 0.0
+        # Dated snapshots ("gpt-4o-mini-2024-07-18") are priced like their base model
+        base = max((name for name in self.prices if model.startswith(name)), key=len, default=None)
+        if base is None:
+            return 0.0
+        prompt_price, cached_price, completion_price = self.prices[base]
+        cached = cached_tokens(usage)
+        uncached = max((usage.prompt_tokens or 0) - cached, 0)
+        return (uncached * prompt_price + cached * cached_price + (usage.completion_tokens or 0) * completion_price) / 1_000_000
+
+    def record(self, route: Route, usage, duration: float) -> float:
+        """Accumulate one call's latency, tokens and cost under its route; returns the cost"""
+        cost = self.cost(route.model, usage)
+        stats = self._stats.setdefault(route.name, {
+            "model": route.model,
+            "calls": 0,
+            "seconds": 0.0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "completion_tokens": 0,
+            "cost_usd": 0.0
+        })
+        stats["calls"] += 1
+        stats["seconds"] += duration
+        stats["cost_usd"] += cost
+        if usage is not None:
+            stats["prompt_tokens"] += usage.prompt_tokens or 0
+            stats["cached_tokens"] += cached_tokens(usage)
+            stats["completion_tokens"] += usage.completion_tokens or 0
+        return cost
+
+    def stats(self) -> dict:
+        """Per-route settings, call counts, mean latency and cost"""
+        routes = {}
+        for name, route in self.routes.items():
+            recorded = self._stats.get(name, {})
+            calls = recorded.get("calls", 0)
+            routes[name] = {
+                "model": route.model,
+                "max_tokens": route.max_tokens,
+                "temperature": route.temperature,
+                "detail": route.detail,
+                "calls": calls,
+                "mean_seconds": round(recorded["seconds"] / calls, 3) if calls else None,
+                "prompt_tokens": recorded.get("prompt_tokens", 0),
+                "cached_tokens": recorded.get("cached_tokens", 0),
+                "completion_tokens": recorded.get("completion_tokens", 0),
+                "cost_usd": round(recorded.get("cost_usd", 0.0), 6),
+                "mean_cost_usd": round(recorded["cost_usd"] / calls, 6) if calls else None
+            }
+        return {
+            "enabled": self.enabled,
+            "small_max_prompt_tokens": self.small_max_prompt_tokens,
+            "medium_max_prompt_tokens": self.medium_max_prompt_tokens,
+            "routes": routes
+        }
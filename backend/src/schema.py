@@ -0,0 +1,46 @@
+from typing import Any, Type
+from pydantic import BaseModel
+from .models import SummaryResponse
+
+# Keywords strict structured outputs reject or ignore
+UNSUPPORTED_KEYWORDS = ("title", "default")
+
+
+def strict_json_schema(model: Type[BaseModel]) -> dict:
+    """JSON schema of a Pydantic model in the form OpenAI's strict structured outputs accept:
+    every object closed to extra keys and every property required"""
+    return _strict(model.model_json_schema())
+
+
+def _strict(node: Any) -> Any:
+    if isinstance(node, list):
+        return [_strict(item) for item in node]
+    if not isinstance(node, dict):
+        return node
+
+    strict = {}
+    for key, value in node.items():
+        if key in UNSUPPORTED_KEYWORDS:
+            continue
+        if key in ("properties", "$defs"):
+            # Maps of names to schemas: keep every name, whatever it is called
+            strict[key] = {name: _strict(schema) for name, schema in value.items()}
+        else:
+            strict[key] = _strict(value)
+
+    if strict.get("type") == "object":
+        strict["additionalProperties"] = False
+        strict["required"] = list(strict.get("properties", {}))
+    return strict
+
+
+def response_format(model: Type[BaseModel], name: str) -> dict:
+    """`response_format` argument constraining a completion to the model's schema"""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "strict": True, "schema": strict_json_schema(model)}
+    }
+
+
+# Thread analyses are constrained to SummaryResponse, so they always parse and validate
+SUMMARY_RESPONSE_FORMAT = response_format(SummaryResponse, "thread_analysis")
@@ -1,13 +1,38 @@
 import os
+import time
+import asyncio
 import logging
 import json
-from openai import OpenAI
-from typing import Optional
-from .models import ThreadData, SummaryResponse, ChatMessage
+from openai import AsyncOpenAI
+from typing import AsyncIterator, Optional
+from pydantic import ValidationError
+from .models import PostData, ReplyData, ThreadData, SummaryResponse, ChatMessage
+from .incremental_json import SummaryStreamParser
+from .metrics import UPSTREAM_IN_FLIGHT, cached_tokens, record_analysis, record_completion, record_error
+from .schema import SUMMARY_RESPONSE_FORMAT
+from .routing import ModelRouter, Route
+from .prompts import analysis_messages, chat_messages, conversation_summary_messages, map_chunk_messages, update_messages
+from .resilience import UpstreamPolicy, UpstreamUnavailable
+from .admission import UpstreamLimiter
+from .dedup import collapse_near_duplicates, reply_count
+from .budget import CHARS_PER_TOKEN, ReplySelection, chunk_replies, estimate_tokens, format_reply, select_replies, truncate_text
 
 # Set up logger for this module
 logger = logging.getLogger(__name__)
 
+# Prefix of the placeholder summaries returned when the model output can't be used
+FALLBACK_SUMMARY_PREFIX = "Analysis failed"
+
+# Titles and author names are short in practice; cap them so they can't eat the budget
+MAX_TITLE_CHARS = 300
+
+# Candidate replies are re-quoted in the reduce prompt; keep each one short
+MAX_CANDIDATE_CHARS = 500
+
+def is_fallback_summary(summary: SummaryResponse) -> bool:
+    """True for placeholder results that must not be cached or reused"""
+    return summary.thread_summary.startswith(FALLBACK_SUMMARY_PREFIX)
+
 class OpenAIService:
     def __init__(self):
         logger.info("🔧 Initializing OpenAI service...")
@@ -17,212 +42,603 @@ class OpenAIService:
             raise ValueError("OPENAI_API_KEY environment variable is required")
         
         logger.info("🔑 OpenAI API key found, creating client...")
-        self.client = OpenAI(api_key=api_key)
-        self.model = "gpt-4o-mini"
-        logger.info(f"✅ OpenAI service initialized with model: {self.model}")
+        # Timeouts, retries and circuit breaking are handled by the upstream policy, not the client
+        self.upstream = UpstreamPolicy.from_env()
+        self.client = AsyncOpenAI(api_key=api_key, max_retries=0, timeout=self.upstream.attempt_timeout)
+        # Model, max_tokens, temperature and output detail per kind of call and thread size
+        self.router = ModelRouter.from_env()
+        self.model = self.router.default_model
+        
+        # Cap concurrent upstream calls so a burst of requests can't exhaust the OpenAI quota;
+        # callers beyond the bounded wait queue are turned away instead of piling up
+        self.limiter = UpstreamLimiter.from_env()
+        self.max_concurrency = self.limiter.max_concurrency
+        
+        # Keep formatted threads bounded no matter how many replies were scraped
+        self.prompt_token_budget = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+        self.max_reply_chars = int(os.getenv("PROMPT_MAX_REPLY_CHARS", "1500"))
+        # Threads too big for one prompt are summarized chunk by chunk, then merged
+        self.map_reduce_enabled = os.getenv("MAP_REDUCE_ENABLED", "true").lower() == "true"
+        self.map_chunk_tokens = int(os.getenv("MAP_REDUCE_CHUNK_TOKENS", "4000"))
+        self.map_fanout = int(os.getenv("MAP_REDUCE_FANOUT", "8"))
+        self.map_max_chunks = int(os.getenv("MAP_REDUCE_MAX_CHUNKS", "32"))
+        # Near-identical replies ("this", copy-pasta) are merged into one before prompting
+        self.dedup_enabled = os.getenv("REPLY_DEDUP_ENABLED", "true").lower() == "true"
+        self.dedup_threshold = float(os.getenv("REPLY_DEDUP_THRESHOLD", "0.8"))
+        # "json_schema" constrains analyses to the SummaryResponse schema; "prompt" only asks for JSON
+        self.output_mode = os.getenv("ANALYSIS_OUTPUT_MODE", "json_schema").lower()
+        if self.output_mode not in ("json_schema", "prompt"):
+            logger.warning(f"⚠️ Unknown ANALYSIS_OUTPUT_MODE {self.output_mode!r} - using json_schema")
+            self.output_mode = "json_schema"
+        self.truncation_stats = {
+            "threads_formatted": 0,
+            "threads_truncated": 0,
+            "replies_seen": 0,
+            "replies_kept": 0,
+            "replies_dropped_for_budget": 0,
+            "replies_dropped_as_redundant": 0,
+            "reply_texts_truncated": 0,
+            "replies_collapsed_as_duplicates": 0
+        }
+        logger.info(f"✅ OpenAI service initialized with model: {self.model}, Max concurrency: {self.max_concurrency}")
+    
+    async def _create_completion(self, operation: str, route: Route, **kwargs):
+        """Run a chat completion with the route's settings under the upstream policy, bounded by the concurrency limit"""
+        kwargs.update(route.completion_kwargs())
+        async def attempt(timeout: float):
+            async with self.limiter:
+                start_time = time.perf_counter()
+                with UPSTREAM_IN_FLIGHT.track_inprogress():
+                    async with asyncio.timeout(timeout):
+                        response = await self.client.chat.completions.create(**kwargs)
+                return response, time.perf_counter() - start_time
+        
+        # Only hedge when a spare concurrency slot exists; a hedge must never queue behind real work
+        response, duration = await self.upstream.call(
+            operation, attempt, hedge=True, hedge_allowed=lambda: not self.limiter.locked()
+        )
+        self._log_completion(operation, route, response.usage, duration)
+        return response
     
-    def analyze_thread(self, thread_data: ThreadData) -> SummaryResponse:
+    async def _stream_completion(self, operation: str, route: Route, **kwargs) -> AsyncIterator:
+        """Stream a chat completion with the route's settings, holding a concurrency slot until the stream ends.
+        
+        Opening the stream is retried under the upstream policy until the first
+        chunk arrives; after that each chunk must follow within the attempt timeout.
+        """
+        kwargs.update(route.completion_kwargs())
+        async def open_stream(timeout: float):
+            await self.limiter.acquire()
+            UPSTREAM_IN_FLIGHT.inc()
+            stream = None
+            try:
+                start_time = time.perf_counter()
+                async with asyncio.timeout(timeout):
+                    stream = await self.client.chat.completions.create(stream=True, **kwargs)
+                    chunks = stream.__aiter__()
+                    try:
+                        first_chunk = await chunks.__anext__()
+                    except StopAsyncIteration:
+                        first_chunk = None
+                return stream, chunks, first_chunk, start_time
+            except BaseException:
+                try:
+                    if stream is not None:
+                        # Give the response and its pooled connection back even when this attempt was cancelled
+                        await asyncio.shield(stream.close())
+                except Exception as e:
+                    logger.debug(f"Closing abandoned stream failed: {str(e)}")
+                finally:
+                    UPSTREAM_IN_FLIGHT.dec()
+                    self.limiter.release()
+                raise
+        
+        stream, chunks, chunk, start_time = await self.upstream.call(operation, open_stream)
+        usage = None
+        time_to_first_token = None
+        try:
+            while chunk is not None:
+                if chunk.usage:
+                    usage = chunk.usage
+                if time_to_first_token is None and chunk.choices and chunk.choices[0].delta.content:
+                    time_to_first_token = time.perf_counter() - start_time
+                yield chunk
+                try:
+                    async with asyncio.timeout(self.upstream.attempt_timeout):
+                        chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    chunk = None
+        except GeneratorExit:
+            raise
+        except Exception as e:
+            self.upstream.record_stream_failure(e)
+            raise
+        finally:
+            UPSTREAM_IN_FLIGHT.dec()
+            self.limiter.release()
+            await stream.close()
+        self._log_completion(operation, route, usage, time.perf_counter() - start_time, time_to_first_token)
+    
+    def _log_completion(self, operation: str, route: Route, usage, duration: float, time_to_first_token: Optional[float] = None):
+        """One structured record and metrics sample per upstream call, with token usage, cost and timing"""
+        cost = self.router.record(route, usage, duration)
+        record_completion(operation, route.name, route.model, usage, duration, cost, time_to_first_token)
+        logger.info(
+            f"📥 OpenAI {operation} completed - Route: {route.name}, Model: {route.model}, "
+            f"Tokens: {usage.prompt_tokens if usage else '?'} in ({cached_tokens(usage) if usage else '?'} cached) / {usage.completion_tokens if usage else '?'} out, "
+            f"Cost: ${cost:.6f}, Time: {duration:.3f}s",
+            extra={
+                "event": "openai_call",
+                "operation": operation,
+                "route": route.name,
+                "model": route.model,
+                "prompt_tokens": usage.prompt_tokens if usage else None,
+                "cached_tokens": cached_tokens(usage) if usage else None,
+                "completion_tokens": usage.completion_tokens if usage else None,
+                "cost_usd": round(cost, 8),
+                "duration_ms": round(duration * 1000, 2),
+                "ttft_ms": round(time_to_first_token * 1000, 2) if time_to_first_token is not None else None
+            }
+        )
+    
+    async def analyze_thread(self, thread_data: ThreadData) -> SummaryResponse:
         """Analyze a Reddit/X thread and return structured summary"""
-        logger.info(f"🔍 Starting thread analysis - Platform: {thread_data.platform}")
-        logger.info(f"📊 Thread stats - Replies: {len(thread_data.replies)}, Post length: {len(thread_data.post.text)} chars")
+        logger.debug(f"🔍 Starting thread analysis - Platform: {thread_data.platform}")
+        logger.debug(f"📊 Thread stats - Replies: {len(thread_data.replies)}, Post length: {len(thread_data.post.text)} chars")
+        
+        thread_text, condensed = await self._prepare_thread_text(thread_data)
+        route = self.router.analysis_route(estimate_tokens(thread_text), condensed)
+        messages = self._build_analysis_messages(thread_text, route.detail)
+        
+        try:
+            logger.debug(f"🤖 Sending request to OpenAI API - Route: {route.name}, Model: {route.model}, Max tokens: {route.max_tokens}")
+            response = await self._create_completion(
+                "analyze",
+                route,
+                messages=messages,
+                **self._analysis_output_kwargs()
+            )
+        except Exception as e:
+            logger.error(f"❌ OpenAI API call failed: {str(e)}", exc_info=True)
+            # Re-raise so they can be handled by the API endpoint
+            raise e
+        
+        message = response.choices[0].message
+        logger.debug(f"📥 Received response from OpenAI - Usage: {response.usage}, Finish reason: {response.choices[0].finish_reason}")
+        if getattr(message, "refusal", None):
+            logger.warning(f"⚠️ Model refused the analysis: {message.refusal[:200]}")
+        
+        return self._parse_summary(message.content or "")
+    
+    async def stream_analyze_thread(self, thread_data: ThreadData) -> AsyncIterator[dict]:
+        """Analyze a thread, yielding each part of the summary as soon as it is complete"""
+        logger.debug(f"🔍 Starting streaming thread analysis - Platform: {thread_data.platform}, Replies: {len(thread_data.replies)}")
+        
+        thread_text, condensed = await self._prepare_thread_text(thread_data)
+        route = self.router.analysis_route(estimate_tokens(thread_text), condensed)
+        messages = self._build_analysis_messages(thread_text, route.detail)
+        parser = SummaryStreamParser()
+        
+        start_time = time.perf_counter()
+        time_to_first_token = None
+        usage = None
+        
+        logger.debug(f"🤖 Streaming analysis request to OpenAI - Route: {route.name}, Model: {route.model}, Max tokens: {route.max_tokens}")
+        async for chunk in self._stream_completion(
+            "analyze_stream",
+            route,
+            messages=messages,
+            stream_options={"include_usage": True},
+            **self._analysis_output_kwargs()
+        ):
+            if chunk.usage:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if time_to_first_token is None:
+                    time_to_first_token = time.perf_counter() - start_time
+                    logger.debug(f"⚡ First analysis token after {time_to_first_token:.3f}s")
+                for event in parser.feed(delta):
+                    yield event
+        
+        total_time = time.perf_counter() - start_time
+        logger.debug(f"📥 Streaming analysis finished - Usage: {usage}, Time: {total_time:.3f}s")
+        
+        summary = self._parse_summary(parser.document())
+        yield {
+            "event": "done",
+            "summary": summary,
+            "data": {
+                "summary": summary.model_dump(),
+                "usage": {
+                    "prompt_tokens": usage.prompt_tokens,
+                    "cached_tokens": cached_tokens(usage),
+                    "completion_tokens": usage.completion_tokens,
+                    "total_tokens": usage.total_tokens
+                } if usage else None,
+                "time_to_first_token": round(time_to_first_token, 3) if time_to_first_token is not None else None,
+                "total_time": round(total_time, 3),
+                "route": route.name
+            }
+        }
+    
+    async def update_analysis(self, previous: SummaryResponse, platform: str, post: PostData, new_replies: list[ReplyData]) -> SummaryResponse:
+        """Revise a previous analysis with only the replies added since, at a cost proportional to them"""
+        if not new_replies:
+            return previous
+        logger.debug(f"🔄 Updating analysis with {len(new_replies)} new replies - Platform: {platform}")
+        
+        selection = select_replies(self._collapse_duplicates(new_replies), self.prompt_token_budget, self.max_reply_chars)
+        self._record_selection(selection)
+        # Counted after duplicates are collapsed, so the header matches the replies listed
+        lines = [f"New replies ({len(selection.replies)} of {selection.total_replies}):" if selection.truncated else f"New replies ({selection.total_replies}):"]
+        for i, reply, text in selection.replies:
+            lines.extend(format_reply(i, reply, text))
+        
+        route = self.router.update_route(previous.post_type)
+        response = await self._create_completion(
+            "update",
+            route,
+            messages=update_messages(
+                platform=platform.upper(),
+                title=truncate_text(post.title or "No title", MAX_TITLE_CHARS),
+                previous=previous.model_dump_json(),
+                replies="\n".join(lines),
+                detail=route.detail
+            ),
+            **self._analysis_output_kwargs()
+        )
+        logger.debug(f"📥 Analysis updated - Usage: {response.usage}")
+        return self._parse_summary(response.choices[0].message.content or "")
+    
+    async def _prepare_thread_text(self, thread_data: ThreadData) -> tuple[str, bool]:
+        """Thread text for the analysis prompt, and whether it was condensed by map-reduce"""
+        thread_data = self._collapse_thread(thread_data)
+        if self._needs_map_reduce(thread_data):
+            return await self._map_thread(thread_data), True
         
         # Format thread data for the prompt
-        logger.info("📝 Formatting thread data for AI prompt...")
+        logger.debug("📝 Formatting thread data for AI prompt...")
         thread_text = self._format_thread_data(thread_data)
-        logger.info(f"📄 Formatted thread text length: {len(thread_text)} chars")
+        logger.debug(f"📄 Formatted thread text length: {len(thread_text)} chars")
+        return thread_text, False
+    
+    def _needs_map_reduce(self, thread_data: ThreadData) -> bool:
+        """True when the replies can't fit in a single prompt budget"""
+        if not self.map_reduce_enabled:
+            return False
+        reply_tokens = sum(estimate_tokens(reply.text) for reply in thread_data.replies)
+        return reply_tokens > self.prompt_token_budget
+    
+    async def _map_thread(self, thread_data: ThreadData) -> str:
+        """Summarize reply chunks concurrently and condense them into text for the reduce prompt"""
+        # Pre-select replies if the thread is larger than all chunks together can hold
+        selection = select_replies(
+            thread_data.replies,
+            self.map_chunk_tokens * self.map_max_chunks,
+            self.max_reply_chars,
+            drop_redundant=False
+        )
+        self._record_selection(selection)
+        chunks = chunk_replies(selection.replies, self.map_chunk_tokens)
+        logger.info(f"🗺️ Map-reduce analysis - {len(selection.replies)} replies in {len(chunks)} chunks, Fan-out: {self.map_fanout}")
+        
+        post_context = self._format_post(thread_data)
+        fanout = asyncio.Semaphore(self.map_fanout)
+        
+        async def map_chunk(number: int, chunk) -> Optional[dict]:
+            async with fanout:
+                return await self._summarize_chunk(post_context, number, len(chunks), chunk)
+        
+        start_time = time.perf_counter()
+        results = await asyncio.gather(
+            *(map_chunk(number, chunk) for number, chunk in enumerate(chunks, 1)),
+            return_exceptions=True
+        )
+        
+        partials = []
+        for number, result in enumerate(results, 1):
+            if isinstance(result, BaseException):
+                logger.warning(f"⚠️ Chunk {number}/{len(chunks)} failed: {result}")
+            elif result is not None:
+                partials.append(result)
+        logger.info(f"🗺️ Map phase finished - {len(partials)}/{len(chunks)} chunks usable, Time: {time.perf_counter() - start_time:.3f}s")
+        
+        if not partials:
+            failures = [result for result in results if isinstance(result, BaseException)]
+            if failures:
+                raise failures[0]
+            raise ValueError("No chunk of the thread could be summarized")
+        
+        return self._format_map_results(post_context, reply_count(thread_data.replies), partials)
+    
+    async def _summarize_chunk(self, post_context: str, number: int, total: int, chunk) -> Optional[dict]:
+        """Map step: summarize one chunk of replies and pre-classify its best ones"""
+        lines = [post_context, f"Replies (part {number} of {total}):"]
+        for index, reply, text in chunk:
+            lines.extend(format_reply(index, reply, text))
+        
+        response = await self._create_completion(
+            "map",
+            self.router.route("map"),
+            messages=map_chunk_messages("\n".join(lines)),
+            response_format={"type": "json_object"}
+        )
+        logger.debug(f"📥 Chunk {number}/{total} summarized - Usage: {response.usage}")
         
-        prompt = f"""You are SpeedThreads AI, an expert at analyzing Reddit and X threads. Follow this 3-step process:
-
-**Step 1 — Identify Post Type**
-Classify the post as one of these categories:
-- **Question** → OP is asking for advice, solutions, or recommendations
-- **Opinion/Discussion** → OP is sharing a view, hot take, or starting a debate  
-- **Funny/Entertainment** → OP is joking, sharing memes, or looking for laughs
-- **News/Info** → OP is sharing an announcement, update, or informational content
-
-**Step 2 — Tailor the Summary**
-Write a **Thread Summary** (2–3 sentences) that adapts to the post type:
-- **Question posts** → "The OP asked ___, and most answers suggest ___, while others argue ___."
-- **Opinion posts** → "The OP shared their take that ___, and the main counterpoints are ___."
-- **Funny posts** → "The OP posted a joke about ___, with most replies adding more humor."
-- **News posts** → "The OP shared news about ___, and replies focus on ___."
-
-**Step 3 — Classify Replies**
-Group the best replies by category with emoji icons. Do NOT include author names - just show the reply text and explanation.
-
-For **Question posts**: 💡 Helpful, ⚡ Controversial, 🔎 Insightful, 😂 Funny
-For **Opinion posts**: 👍 Supportive, ⚡ Opposing, 🔎 Insightful, 😂 Funny  
-For **Funny posts**: 😂 Funniest, 💡 Clever, ⭐ Popular
-For **News posts**: 🔎 Insightful, ⚡ Critical, 👍 Supportive, 😂 Funny
-
-{thread_text}
-
-CRITICAL: 
-1. Respond with ONLY valid JSON matching this exact format
-2. Do NOT include author names - set author field to empty string ""
-3. Focus on the reply content and categorization
-
-{{
-    "post_type": "Question",
-    "thread_summary": "The OP asked whether to learn Python or JavaScript first. Most answers suggest Python for beginners, though some argue JS is more practical for web development.",
-    "key_replies": [
-        {{
-            "emoji": "💡",
-            "name": "Helpful",
-            "replies": [
-                {{
-                    "author": "",
-                    "text": "Start with Python. Its syntax is cleaner and you can pick up core concepts faster.",
-                    "explanation": "Directly answers OP's question with a clear recommendation"
-                }}
-            ]
-        }},
-        {{
-            "emoji": "⚡",
-            "name": "Controversial", 
-            "replies": [
-                {{
-                    "author": "",
-                    "text": "Python is useless unless you want to do AI. JS is the only language worth learning.",
-                    "explanation": "Polarizing statement that contradicts most other replies"
-                }}
-            ]
-        }}
-    ]
-}}"""
-
         try:
-            logger.info(f"🤖 Sending request to OpenAI API - Model: {self.model}, Max tokens: 1000")
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are SpeedThreads AI, an expert at analyzing social media threads. Always respond with valid JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=1000
-            )
-            
-            logger.info(f"📥 Received response from OpenAI - Usage: {response.usage}")
-            logger.info(f"📄 Response content length: {len(response.choices[0].message.content)} chars")
-            
-            # Parse the JSON response
-            logger.info("🔍 Parsing JSON response...")
             result = json.loads(response.choices[0].message.content)
-            logger.info(f"✅ JSON parsed successfully - Keys: {list(result.keys())}")
-            
-            # Log the actual fields to debug format issues
-            if 'key_replies' in result:
-                logger.info(f"📋 Key replies field type: {type(result['key_replies'])}, Count: {len(result['key_replies']) if isinstance(result['key_replies'], list) else 'N/A'}")
-            
-            return SummaryResponse(**result)
-            
         except json.JSONDecodeError as e:
-            logger.error(f"❌ JSON parsing failed: {str(e)}")
-            logger.error(f"📄 Raw response content: {response.choices[0].message.content[:500]}...")
-            # Return a fallback response if JSON parsing fails
-            return SummaryResponse(
-                post_type="Question",
-                thread_summary="Analysis failed - please try again",
-                key_replies=[]
-            )
-        except Exception as e:
-            # Check if it's a Pydantic validation error
-            if "validation error" in str(e).lower():
-                logger.error(f"❌ Pydantic validation failed: {str(e)}")
-                logger.error(f"📄 Raw response content: {response.choices[0].message.content[:500]}...")
-                # Return fallback if validation fails
+            logger.warning(f"⚠️ Chunk {number}/{total} returned invalid JSON: {e}")
+            return None
+        if not isinstance(result, dict):
+            return None
+        return result
+    
+    def _format_map_results(self, post_context: str, total_replies: int, partials: list[dict]) -> str:
+        """Thread text for the reduce prompt, built from the chunk summaries and candidates"""
+        lines = [post_context, f"This thread has {total_replies} replies. They were read in {len(partials)} parts; here is what each part contained.", ""]
+        lines.append("Summaries of each part:")
+        for number, partial in enumerate(partials, 1):
+            lines.append(f"{number}. {partial.get('chunk_summary', '')}")
+        lines.append("")
+        
+        lines.append("Candidate key replies (pre-classified, choose the best across all parts):")
+        for partial in partials:
+            for candidate in partial.get("candidates") or []:
+                if not isinstance(candidate, dict) or not candidate.get("text"):
+                    continue
+                text = truncate_text(str(candidate["text"]), MAX_CANDIDATE_CHARS)
+                lines.append(f"- [{candidate.get('emoji', '')} {candidate.get('category', '')}] {text}")
+                if candidate.get("explanation"):
+                    lines.append(f"   - {truncate_text(str(candidate['explanation']), MAX_CANDIDATE_CHARS)}")
+        return "\n".join(lines)
+    
+    def _build_analysis_messages(self, thread_text: str, detail: str = "standard") -> list[dict]:
+        """Build the OpenAI message list for a thread analysis: static instructions first, the thread last"""
+        return analysis_messages(thread_text, detail)
+    
+    def _analysis_output_kwargs(self) -> dict:
+        """Completion arguments that make the model follow the SummaryResponse schema"""
+        if self.output_mode == "json_schema":
+            return {"response_format": SUMMARY_RESPONSE_FORMAT}
+        return {}
+    
+    def _parse_summary(self, content: str) -> SummaryResponse:
+        """Parse and validate the model's JSON output, falling back to a placeholder if it's unusable.
+        
+        Every fallback costs the user a second full analysis, so outcomes are
+        counted per output mode to show what schema-constrained output saves.
+        """
+        try:
+            logger.debug("🔍 Parsing JSON response...")
+            summary = SummaryResponse.model_validate_json(content)
+        except ValidationError as e:
+            record_analysis(self.output_mode, "fallback")
+            if any(error["type"] == "json_invalid" for error in e.errors()):
+                record_error("json_parse_fallback")
+                logger.error(f"❌ JSON parsing failed: {str(e)}")
+                logger.error(f"📄 Raw response content: {content[:500]}...")
+                # Return a fallback response if JSON parsing fails
                 return SummaryResponse(
                     post_type="Question",
-                    thread_summary="Analysis failed - format error",
+                    thread_summary=f"{FALLBACK_SUMMARY_PREFIX} - please try again",
                     key_replies=[]
                 )
-            
-            logger.error(f"❌ OpenAI API call failed: {str(e)}", exc_info=True)
-            # Re-raise other exceptions so they can be handled by the API endpoint
-            raise e
+            record_error("validation_fallback")
+            logger.error(f"❌ Pydantic validation failed: {str(e)}")
+            logger.error(f"📄 Raw response content: {content[:500]}...")
+            # Return fallback if validation fails
+            return SummaryResponse(
+                post_type="Question",
+                thread_summary=f"{FALLBACK_SUMMARY_PREFIX} - format error",
+                key_replies=[]
+            )
+        
+        logger.debug(f"✅ Summary parsed - Post type: {summary.post_type}, Categories: {len(summary.key_replies)}")
+        record_analysis(self.output_mode, "ok")
+        return summary
     
-    def chat_about_thread(self, thread_data: ThreadData, messages: list[ChatMessage], user_message: str) -> str:
+    async def chat_about_thread(self, thread_data: ThreadData, messages: list[ChatMessage], user_message: str) -> str:
         """Continue conversation about a thread"""
-        logger.info(f"💬 Starting chat about thread - User message: {user_message[:100]}...")
-        logger.info(f"📊 Chat context - Previous messages: {len(messages)}, Thread replies: {len(thread_data.replies)}")
+        logger.debug(f"💬 Starting chat about thread - User message: {user_message[:100]}...")
+        logger.debug(f"📊 Chat context - Previous messages: {len(messages)}, Thread replies: {len(thread_data.replies)}")
         
-        # Format thread data for context
-        logger.info("📝 Formatting thread context for chat...")
-        thread_context = self._format_thread_data(thread_data)
-        logger.info(f"📄 Thread context length: {len(thread_context)} chars")
+        conversation = self._build_chat_messages(thread_data, messages, user_message)
         
-        # Build conversation history
-        conversation = [
-            {"role": "system", "content": f"""You are SpeedThreads AI, an expert at analyzing Reddit and X threads. 
-
-Here's the thread we're discussing:
-{thread_context}
-
-You can answer questions about:
-- The post content and meaning
-- Individual comments and their significance  
-- Community sentiment and patterns
-- Post outcomes and effectiveness
-- Related topics and context
-- Suggestions for engagement
-
-Be helpful, insightful, and conversational."""}
-        ]
+        try:
+            return await self._complete_chat(conversation)
+        except UpstreamUnavailable:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Chat request failed: {str(e)}", exc_info=True)
+            return f"Sorry, I encountered an error: {str(e)}"
+    
+    async def stream_chat_about_thread(self, thread_data: ThreadData, messages: list[ChatMessage], user_message: str) -> AsyncIterator[dict]:
+        """Continue conversation about a thread, yielding tokens as the model generates them"""
+        logger.debug(f"💬 Starting streaming chat - Previous messages: {len(messages)}, Thread replies: {len(thread_data.replies)}")
+        
+        conversation = self._build_chat_messages(thread_data, messages, user_message)
+        async for event in self._stream_chat(conversation):
+            yield event
+    
+    async def chat_with_context(self, thread_context: str, messages: list[ChatMessage], user_message: str, summary: str = "") -> str:
+        """Chat turn against an already formatted thread context, e.g. from a stored session"""
+        logger.debug(f"💬 Starting session chat - Previous messages: {len(messages)}, Has summary: {bool(summary)}")
+        conversation = self._build_conversation(thread_context, messages, user_message, summary)
+        return await self._complete_chat(conversation)
+    
+    async def stream_chat_with_context(self, thread_context: str, messages: list[ChatMessage], user_message: str, summary: str = "") -> AsyncIterator[dict]:
+        """Streaming chat turn against an already formatted thread context"""
+        logger.debug(f"💬 Starting streaming session chat - Previous messages: {len(messages)}, Has summary: {bool(summary)}")
+        conversation = self._build_conversation(thread_context, messages, user_message, summary)
+        async for event in self._stream_chat(conversation):
+            yield event
+    
+    def format_thread_context(self, thread_data: ThreadData) -> str:
+        """Format a thread once so a chat session can reuse it on every turn"""
+        thread_context = self._format_thread_data(self._collapse_thread(thread_data))
+        logger.debug(f"📄 Thread context length: {len(thread_context)} chars")
+        return thread_context
+    
+    async def summarize_conversation(self, summary: str, turns: list[ChatMessage]) -> str:
+        """Fold older chat turns into a rolling summary"""
+        transcript = "\n".join(f"{turn.role}: {turn.content}" for turn in turns)
+        
+        logger.info(f"🗜️ Compacting {len(turns)} chat turns into rolling summary")
+        response = await self._create_completion(
+            "compact",
+            self.router.route("compact"),
+            messages=conversation_summary_messages(summary or "(none yet)", transcript)
+        )
+        logger.debug(f"📥 Conversation summary ready - Usage: {response.usage}")
+        return response.choices[0].message.content.strip()
+    
+    async def _complete_chat(self, conversation: list[dict]) -> str:
+        route = self.router.route("chat")
+        logger.debug(f"🤖 Sending chat request to OpenAI - Model: {route.model}, Max tokens: {route.max_tokens}")
+        response = await self._create_completion(
+            "chat",
+            route,
+            messages=conversation
+        )
+        
+        logger.debug(f"📥 Received chat response - Usage: {response.usage}")
+        logger.debug(f"📄 Response length: {len(response.choices[0].message.content)} chars")
+        
+        return response.choices[0].message.content
+    
+    async def _stream_chat(self, conversation: list[dict]) -> AsyncIterator[dict]:
+        start_time = time.perf_counter()
+        time_to_first_token = None
+        usage = None
+        response_length = 0
+        
+        route = self.router.route("chat")
+        logger.debug(f"🤖 Streaming chat request to OpenAI - Model: {route.model}, Max tokens: {route.max_tokens}")
+        async for chunk in self._stream_completion(
+            "chat_stream",
+            route,
+            messages=conversation,
+            stream_options={"include_usage": True}
+        ):
+            if chunk.usage:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if time_to_first_token is None:
+                    time_to_first_token = time.perf_counter() - start_time
+                    logger.debug(f"⚡ First chat token after {time_to_first_token:.3f}s")
+                response_length += len(delta)
+                yield {"event": "token", "data": {"delta": delta}}
+        
+        total_time = time.perf_counter() - start_time
+        logger.debug(f"📥 Streaming chat finished - Usage: {usage}, Response length: {response_length} chars, Time: {total_time:.3f}s")
+        yield {
+            "event": "done",
+            "data": {
+                "usage": {
+                    "prompt_tokens": usage.prompt_tokens,
+                    "cached_tokens": cached_tokens(usage),
+                    "completion_tokens": usage.completion_tokens,
+                    "total_tokens": usage.total_tokens
+                } if usage else None,
+                "time_to_first_token": round(time_to_first_token, 3) if time_to_first_token is not None else None,
+                "total_time": round(total_time, 3)
+            }
+        }
+    
+    def _build_chat_messages(self, thread_data: ThreadData, messages: list[ChatMessage], user_message: str) -> list[dict]:
+        """Build the OpenAI message list for a chat turn"""
+        # Format thread data for context
+        logger.debug("📝 Formatting thread context for chat...")
+        thread_context = self._format_thread_data(self._collapse_thread(thread_data))
+        logger.debug(f"📄 Thread context length: {len(thread_context)} chars")
+        return self._build_conversation(thread_context, messages, user_message)
+    
+    def _build_conversation(self, thread_context: str, messages: list[ChatMessage], user_message: str, summary: str = "") -> list[dict]:
+        """Build the OpenAI message list from a formatted thread context and chat history"""
+        conversation = chat_messages(thread_context, summary)
         
         # Add previous messages
-        logger.info(f"📝 Building conversation history with {len(messages)} previous messages...")
-        for i, msg in enumerate(messages):
+        logger.debug(f"📝 Building conversation history with {len(messages)} previous messages...")
+        for msg in messages:
             conversation.append({"role": msg.role, "content": msg.content})
-            logger.debug(f"   Message {i+1}: {msg.role} - {msg.content[:50]}...")
         
         # Add current user message
         conversation.append({"role": "user", "content": user_message})
-        logger.info(f"📄 Total conversation length: {len(conversation)} messages")
+        logger.debug(f"📄 Total conversation length: {len(conversation)} messages")
         
-        try:
-            logger.info(f"🤖 Sending chat request to OpenAI - Model: {self.model}, Max tokens: 500")
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=conversation,
-                temperature=0.7,
-                max_tokens=500
-            )
-            
-            logger.info(f"📥 Received chat response - Usage: {response.usage}")
-            logger.info(f"📄 Response length: {len(response.choices[0].message.content)} chars")
-            
-            return response.choices[0].message.content
-            
-        except Exception as e:
-            logger.error(f"❌ Chat request failed: {str(e)}", exc_info=True)
-            return f"Sorry, I encountered an error: {str(e)}"
+        return conversation
+    
+    def _collapse_duplicates(self, replies: list[ReplyData]) -> list[ReplyData]:
+        """Merge near-identical replies so each is prompted once, with its combined count and upvotes"""
+        if not self.dedup_enabled:
+            return replies
+        collapsed = collapse_near_duplicates(replies, self.dedup_threshold)
+        if len(collapsed) < len(replies):
+            self.truncation_stats["replies_collapsed_as_duplicates"] += len(replies) - len(collapsed)
+            logger.debug(f"🧹 Collapsed {len(replies)} replies into {len(collapsed)} after merging near-duplicates")
+        return collapsed
+    
+    def _collapse_thread(self, thread_data: ThreadData) -> ThreadData:
+        return thread_data.model_copy(update={"replies": self._collapse_duplicates(thread_data.replies)})
     
     def _format_thread_data(self, thread_data: ThreadData) -> str:
         """Format thread data for AI processing"""
         logger.debug("🔧 Formatting thread data for AI processing...")
+        lines = [self._format_post(thread_data)]
+        
+        # Replies, selected to fit whatever is left of the prompt budget
+        reply_budget = self.prompt_token_budget - estimate_tokens(lines[0])
+        selection = select_replies(thread_data.replies, reply_budget, self.max_reply_chars)
+        self._record_selection(selection)
+        
+        if selection.truncated:
+            lines.append(f"Replies (showing the {len(selection.replies)} most relevant of {selection.total_replies}):")
+        else:
+            lines.append(f"Replies ({len(thread_data.replies)}):")
+        for i, reply, text in selection.replies:
+            lines.extend(format_reply(i, reply, text))
+        
+        formatted_text = "\n".join(lines)
+        logger.debug(f"✅ Thread data formatted - Total length: {len(formatted_text)} chars")
+        return formatted_text
+    
+    def _format_post(self, thread_data: ThreadData) -> str:
+        """Format the platform and post header of a thread"""
         lines = []
         
         # Platform and post info
         lines.append(f"Platform: {thread_data.platform.upper()}")
-        lines.append(f"Title: {thread_data.post.title or 'No title'}")
-        lines.append(f"Post: {thread_data.post.text}")
+        lines.append(f"Title: {truncate_text(thread_data.post.title or 'No title', MAX_TITLE_CHARS)}")
+        # The post may use at most a quarter of the budget so replies always get a share
+        post_chars = self.prompt_token_budget * CHARS_PER_TOKEN // 4
+        lines.append(f"Post: {truncate_text(thread_data.post.text, post_chars)}")
         if thread_data.post.author:
-            lines.append(f"Author: {thread_data.post.author}")
+            lines.append(f"Author: {truncate_text(thread_data.post.author, MAX_TITLE_CHARS)}")
         if thread_data.post.upvotes:
             lines.append(f"Upvotes: {thread_data.post.upvotes}")
         lines.append("")
-        
-        # Replies
-        lines.append(f"Replies ({len(thread_data.replies)}):")
-        for i, reply in enumerate(thread_data.replies, 1):
-            lines.append(f"{i}. {reply.text}")
-            if reply.author:
-                lines.append(f"   - {reply.author}")
-            if reply.upvotes:
-                lines.append(f"   - {reply.upvotes} upvotes")
-            lines.append("")
-        
-        formatted_text = "\n".join(lines)
-        logger.debug(f"✅ Thread data formatted - Total length: {len(formatted_text)} chars")
-        return formatted_text
+        return "\n".join(lines)
+    
+    def _record_selection(self, selection: ReplySelection):
+        """Accumulate reply truncation stats"""
+        stats = self.truncation_stats
+        stats["threads_formatted"] += 1
+        stats["replies_seen"] += selection.total_replies
+        stats["replies_kept"] += len(selection.replies)
+        stats["replies_dropped_for_budget"] += selection.dropped_for_budget
+        stats["replies_dropped_as_redundant"] += selection.dropped_as_redundant
+        stats["reply_texts_truncated"] += selection.truncated_texts
+        if selection.truncated:
+            stats["threads_truncated"] += 1
+            logger.info(
+                f"✂️ Thread trimmed to prompt budget - Kept {len(selection.replies)}/{selection.total_replies} replies, "
+                f"Dropped: {selection.dropped_for_budget} over budget, {selection.dropped_as_redundant} redundant, "
+                f"Truncated texts: {selection.truncated_texts}, Estimated tokens: {selection.estimated_tokens}"
+            )
@@ -0,0 +1,76 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional
+from .models import ChatMessage
+from .budget import estimate_tokens
+
+# Set up logger for this module
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ChatSession:
+    """Formatted thread context and conversation state for one chat"""
+    id: str
+    thread_context: str
+    turns: List[ChatMessage] = field(default_factory=list)
+    summary: str = ""
+    last_used: float = field(default_factory=time.monotonic)
+    # Serializes turns and compaction within a session
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    def turn_tokens(self) -> int:
+        return sum(estimate_tokens(turn.content) for turn in self.turns)
+
+
+class SessionStore:
+    """Bounded in-memory store of chat sessions with idle expiry"""
+
+    def __init__(self, max_sessions: int = 5000, ttl_seconds: float = 3600):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._counters = {"created": 0, "expired": 0, "evicted": 0, "compactions": 0}
+
+    @classmethod
+    def from_env(cls) -> "SessionStore":
+        """Build a store from CHAT_SESSION_* environment variables"""
+        return cls(
+            max_sessions=int(os.getenv("CHAT_SESSION_MAX", "5000")),
+            ttl_seconds=float(os.getenv("CHAT_SESSION_TTL_SECONDS", "3600"))
+        )
+
+    def create(self, thread_context: str, turns: Optional[List[ChatMessage]] = None) -> ChatSession:
+        session = ChatSession(id=uuid.uuid4().hex, thread_context=thread_context, turns=list(turns or []))
+        self._sessions[session.id] = session
+        self._counters["created"] += 1
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self._counters["evicted"] += 1
+        return session
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if time.monotonic() - session.last_used > self.ttl_seconds:
+            del self._sessions[session_id]
+            self._counters["expired"] += 1
+            return None
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def record_compaction(self):
+        self._counters["compactions"] += 1
+
+    def stats(self) -> dict:
+        return {**self._counters, "active": len(self._sessions), "max_sessions": self.max_sessions}
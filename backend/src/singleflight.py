@@ -0,0 +1,60 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+# Set up logger for this module
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into a single in-flight task"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._counters = {"leaders": 0, "coalesced": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn() once per key; concurrent callers await the same result or error"""
+        task = self.start(key, fn)
+        if task is None:
+            task = self._inflight[key]
+            self._counters["coalesced"] += 1
+            logger.info(f"🔗 Joining in-flight request - Key: {key[:19]}")
+
+        # Shield so one caller disconnecting doesn't cancel the work for everyone else
+        return await asyncio.shield(task)
+
+    def start(self, key: str, fn: Callable[[], Awaitable[T]]) -> Optional[asyncio.Future]:
+        """Start fn() as the in-flight call for key and return its task, or None if one is already running.
+
+        For leaders that consume the work as it progresses (a stream) while
+        later callers wait for its final result.
+        """
+        if key in self._inflight:
+            return None
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._forget(key, done))
+        self._counters["leaders"] += 1
+        return task
+
+    def pending(self, key: str) -> Optional[Awaitable]:
+        """Awaitable for a call already in flight for key, or None"""
+        task = self._inflight.get(key)
+        if task is None:
+            return None
+        self._counters["coalesced"] += 1
+        return asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Future):
+        # Drop the entry as soon as the task settles so failures are never replayed
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every waiter went away
+            task.exception()
+
+    def stats(self) -> dict:
+        return {**self._counters, "in_flight": len(self._inflight)}
@@ -2,32 +2,47 @@
 """
 SpeedThreads Backend Startup Script
 Run this to start the FastAPI server with proper configuration
+
+Development (default): installs dependencies and runs one auto-reloading process.
+    python start.py
+Production: no install step, no reload, uvicorn's process manager (SIGHUP restarts
+workers gracefully, crashed workers are replaced). One worker by default.
+    python start.py --prod
+Several workers need ANALYSIS_CACHE_DB and JOB_DB so analyses and jobs are shared
+through SQLite. Chat sessions, rate limits and request coalescing stay per worker,
+and each worker logs to its own speedthreads-<pid>.log.
+    ANALYSIS_CACHE_DB=cache.db JOB_DB=jobs.db python start.py --prod --workers 4
 """
 
 import os
 import sys
+import argparse
+import tempfile
 import subprocess
+import importlib.util
 from pathlib import Path
 
+BACKEND_DIR = Path(__file__).parent
+
 def check_env_file():
     """Check if .env file exists and has API key"""
-    env_path = Path(__file__).parent / ".env"
-    
+    env_path = BACKEND_DIR / ".env"
+
     if not env_path.exists():
         print("❌ .env file not found!")
         print("📝 Please create backend/.env and add your OpenAI API key:")
         print("   OPENAI_API_KEY=your_api_key_here")
         return False
-    
+
     with open(env_path, 'r') as f:
         content = f.read()
-        
+
     if "OPENAI_API_KEY=" not in content or "your_api_key_here" in content:
         print("❌ OpenAI API key not configured!")
         print("📝 Please edit backend/.env and add your actual API key:")
         print("   OPENAI_API_KEY=sk-...")
         return False
-    
+
     print("✅ .env file configured")
     return True
 
@@ -35,54 +50,165 @@ def install_dependencies():
     """Install Python dependencies"""
     print("📦 Installing dependencies...")
     try:
-        subprocess.run([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"], 
-                      check=True, cwd=Path(__file__).parent)
+        subprocess.run([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"],
+                      check=True, cwd=BACKEND_DIR)
         print("✅ Dependencies installed")
         return True
     except subprocess.CalledProcessError as e:
         print(f"❌ Failed to install dependencies: {e}")
         return False
 
-def start_server():
+def start_server(host: str, port: int):
     """Start the FastAPI server"""
     print("🚀 Starting SpeedThreads backend...")
-    print("📍 Server will be available at: http://localhost:8000")
-    print("🔗 API docs at: http://localhost:8000/docs")
+    print(f"📍 Server will be available at: http://localhost:{port}")
+    print(f"🔗 API docs at: http://localhost:{port}/docs")
     print("💡 Press Ctrl+C to stop the server")
     print("-" * 50)
-    
+
     try:
         subprocess.run([
-            sys.executable, "-m", "uvicorn", 
-            "src.main:app", 
-            "--reload", 
-            "--host", "0.0.0.0", 
-            "--port", "8000"
-        ], cwd=Path(__file__).parent)
+            sys.executable, "-m", "uvicorn",
+            "src.main:create_app", "--factory",
+            "--reload",
+            "--host", host,
+            "--port", str(port)
+        ], cwd=BACKEND_DIR)
     except KeyboardInterrupt:
         print("\n👋 Server stopped")
     except Exception as e:
         print(f"❌ Server error: {e}")
 
+def installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+def setting(name: str, env: dict) -> str:
+    """A setting from the environment, or from backend/.env which the app loads when it starts"""
+    if env.get(name):
+        return env[name]
+    env_path = BACKEND_DIR / ".env"
+    if env_path.exists() and installed("dotenv"):
+        from dotenv import dotenv_values
+        return dotenv_values(env_path).get(name) or ""
+    return ""
+
+# Analyses and jobs are shared between workers only through these SQLite files
+SHARED_STATE_SETTINGS = ("ANALYSIS_CACHE_DB", "JOB_DB")
+
+def check_workers(args, env: dict) -> bool:
+    """Several workers are only allowed when the state they must agree on is shared"""
+    if args.workers <= 1:
+        return True
+    missing = [name for name in SHARED_STATE_SETTINGS if not setting(name, env)]
+    if missing:
+        print(f"❌ --workers {args.workers} needs {' and '.join(missing)} set to a file path")
+        print("   Otherwise each worker keeps its own analyses and jobs, and /summarize/update and /jobs/{id}")
+        print("   fail for results made by another worker. Set them, or run one worker per instance.")
+        return False
+    print("⚠️ Chat sessions, rate limits and request coalescing stay per worker:")
+    print("   /chat/sessions/{id} only works on the worker that created the session, and each worker")
+    print(f"   allows RATE_LIMIT_PER_SECOND, so clients get up to {args.workers}x the configured rate.")
+    return True
+
+def production_command(args) -> list:
+    """uvicorn command line for production serving"""
+    command = [
+        sys.executable, "-m", "uvicorn",
+        "src.main:create_app", "--factory",
+        "--app-dir", str(BACKEND_DIR),
+        "--host", args.host,
+        "--port", str(args.port),
+        "--workers", str(args.workers),
+        # Every request already gets a structured log record from the app
+        "--no-access-log",
+        "--timeout-graceful-shutdown", str(args.graceful_timeout),
+        "--timeout-keep-alive", str(args.keep_alive),
+        "--backlog", str(args.backlog)
+    ]
+    # C implementations of the event loop and HTTP parser, when installed (uvicorn[standard])
+    if installed("uvloop"):
+        command += ["--loop", "uvloop"]
+    if installed("httptools"):
+        command += ["--http", "httptools"]
+    if args.max_requests:
+        # Recycle workers now and then to bound slow memory growth, staggered so they don't all restart at once
+        command += ["--limit-max-requests", str(args.max_requests), "--limit-max-requests-jitter", str(args.max_requests // 10)]
+    if args.proxy_headers:
+        command += ["--proxy-headers", "--forwarded-allow-ips", "*"]
+    return command
+
+def start_production(args):
+    """Replace this process with uvicorn's process manager, so signals reach it directly"""
+    if not os.getenv("OPENAI_API_KEY") and not (BACKEND_DIR / ".env").exists():
+        print("⚠️ OPENAI_API_KEY is not set - /readyz will report not ready")
+
+    env = dict(os.environ)
+    if not check_workers(args, env):
+        sys.exit(1)
+    if args.workers > 1:
+        # Rotating one file from several processes loses records, so each worker writes its own
+        env.setdefault("LOG_PER_PROCESS", "true")
+    if env.get("PROMETHEUS_MULTIPROC_DIR") == "":
+        # An empty value still puts prometheus_client in multiprocess mode, writing to the working directory
+        del env["PROMETHEUS_MULTIPROC_DIR"]
+    if args.workers > 1 and not env.get("PROMETHEUS_MULTIPROC_DIR"):
+        # Workers write metrics to a shared directory so /metrics aggregates all of them
+        env["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="speedthreads-metrics-")
+    elif env.get("PROMETHEUS_MULTIPROC_DIR"):
+        # Metric files left by a previous run would be counted again
+        for stale in Path(env["PROMETHEUS_MULTIPROC_DIR"]).glob("*.db"):
+            stale.unlink()
+
+    command = production_command(args)
+    print(f"🚀 Starting SpeedThreads backend (production) - Workers: {args.workers}, Port: {args.port}")
+    sys.stdout.flush()
+    # The working directory is kept: the log file is written there
+    os.execve(sys.executable, command, env)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Start the SpeedThreads backend")
+    parser.add_argument("--prod", action="store_true", default=os.getenv("SPEEDTHREADS_ENV", "").lower() == "production",
+                        help="Production mode: no install step, no reload, optional worker processes (or SPEEDTHREADS_ENV=production)")
+    parser.add_argument("--host", default=os.getenv("BACKEND_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("BACKEND_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")),
+                        help="Worker processes in production mode (default: WEB_CONCURRENCY or 1); more than one needs ANALYSIS_CACHE_DB and JOB_DB")
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("GRACEFUL_TIMEOUT_SECONDS", "30")),
+                        help="Seconds a stopping worker waits for in-flight requests")
+    parser.add_argument("--keep-alive", type=int, default=int(os.getenv("KEEP_ALIVE_SECONDS", "5")))
+    parser.add_argument("--backlog", type=int, default=int(os.getenv("LISTEN_BACKLOG", "2048")))
+    parser.add_argument("--max-requests", type=int, default=int(os.getenv("WORKER_MAX_REQUESTS", "0")),
+                        help="Restart a worker after this many requests (0 = never)")
+    parser.add_argument("--proxy-headers", action="store_true", default=os.getenv("PROXY_HEADERS", "false").lower() == "true",
+                        help="Trust X-Forwarded-* headers from a reverse proxy")
+    parser.add_argument("--skip-install", action="store_true", help="Development mode without the pip install step")
+    return parser.parse_args()
+
 def main():
-    print("🚀 SpeedThreads Backend Setup")
-    print("=" * 40)
-    
+    args = parse_args()
+
     # Check if we're in the right directory
-    if not Path("src/main.py").exists():
+    if not (BACKEND_DIR / "src" / "main.py").exists():
         print("❌ Please run this script from the backend directory")
         sys.exit(1)
-    
+
+    if args.prod:
+        start_production(args)
+        return
+
+    print("🚀 SpeedThreads Backend Setup")
+    print("=" * 40)
+
     # Check environment
     if not check_env_file():
         sys.exit(1)
-    
+
     # Install dependencies
-    if not install_dependencies():
+    if not args.skip_install and not install_dependencies():
         sys.exit(1)
-    
+
     # Start server
-    start_server()
+    start_server(args.host, args.port)
 
 if __name__ == "__main__":
     main()
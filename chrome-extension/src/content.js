@@ -59,6 +59,22 @@ function hasContentChanged(newThreadData, cachedData) {
   return newHash !== oldHash;
 }
 
+// Replies scraped now that weren't part of the cached analysis, or null when the
+// post itself changed or replies disappeared and only a full re-analysis will do
+function findNewReplies(newThreadData, cachedData) {
+  const oldThread = cachedData.threadData;
+  if (!oldThread || oldThread.post?.title !== newThreadData.post?.title || oldThread.post?.text !== newThreadData.post?.text) {
+    return null;
+  }
+  const seen = new Set((oldThread.replies || []).map(reply => reply.text));
+  const newReplies = (newThreadData.replies || []).filter(reply => !seen.has(reply.text));
+  const kept = (newThreadData.replies || []).length - newReplies.length;
+  if (kept < seen.size) {
+    return null;
+  }
+  return newReplies;
+}
+
 // Get cached data for current URL (with persistent storage fallback)
 async function getCachedData(url) {
   console.log('SpeedThreads: getCachedData called for URL:', url);
@@ -98,11 +114,12 @@ async function getCachedData(url) {
 }
 
 // Set cached data for current URL (with persistent storage)
-async function setCachedData(url, threadData, analysis) {
+async function setCachedData(url, threadData, analysis, analysisId = null) {
   const contentHash = generateContentHash(threadData);
   const cacheData = {
     threadData,
     analysis,
+    analysisId,
     contentHash,
     timestamp: Date.now()
   };
@@ -448,6 +465,11 @@ class SpeedThreadsChatbot {
   constructor() {
     this.isOpen = false;
     this.messages = [];
+    // Set whenever an analysis is added to the chat; sent as has_analysis with chat requests
+    this.analysisShown = false;
+    // Server-side chat session: the thread is uploaded once, then each turn sends only the new message
+    this.sessionId = null;
+    this.sessionContentHash = null;
     this.timerInterval = null;
     this.startTime = null;
     this.currentRequestController = null;
@@ -464,6 +486,8 @@ class SpeedThreadsChatbot {
   async loadChatForUrl(url) {
     this.currentUrl = url;
     this.messages = await getCachedChat(url);
+    this.analysisShown = false;
+    this.endChatSession();
     console.log('SpeedThreads: Loaded chat for URL:', url);
     console.log('SpeedThreads: Loaded messages:', this.messages.length);
     console.log('SpeedThreads: Message types:', this.messages.map(m => m.type));
@@ -481,11 +505,63 @@ class SpeedThreadsChatbot {
   async clearChatForUrl() {
     if (this.currentUrl) {
       this.messages = [];
+      this.analysisShown = false;
+      this.endChatSession();
       await setCachedChat(this.currentUrl, []);
       this.renderMessages();
     }
   }
 
+  // Forget the chat session, letting the backend free it
+  endChatSession() {
+    if (this.sessionId) {
+      fetch(`${API_BASE_URL}/chat/sessions/${this.sessionId}`, { method: 'DELETE' }).catch(() => {});
+    }
+    this.sessionId = null;
+    this.sessionContentHash = null;
+  }
+
+  // Start a session with the thread and the conversation so far
+  async createChatSession(threadData, history, signal) {
+    const response = await fetch(`${API_BASE_URL}/chat/sessions`, {
+      method: 'POST',
+      ...await jsonRequestBody({ thread_data: threadData, messages: history }),
+      signal
+    });
+    if (!response.ok) {
+      throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+    }
+    const session = await response.json();
+    this.sessionId = session.session_id;
+    this.sessionContentHash = generateContentHash(threadData);
+  }
+
+  // Send one message in the chat session, starting a new session if there is none,
+  // the thread has changed, or the backend no longer knows it (expired or restarted)
+  async sendSessionMessage(threadData, history, message, signal) {
+    if (this.sessionId && this.sessionContentHash !== generateContentHash(threadData)) {
+      this.endChatSession();
+    }
+    for (let attempt = 0; attempt < 2; attempt++) {
+      if (!this.sessionId) {
+        await this.createChatSession(threadData, history, signal);
+      }
+      const response = await fetch(`${API_BASE_URL}/chat/sessions/${this.sessionId}/messages`, {
+        method: 'POST',
+        ...await jsonRequestBody({ user_message: message }),
+        signal
+      });
+      if (response.status === 404 && attempt === 0) {
+        this.sessionId = null;
+        continue;
+      }
+      if (!response.ok) {
+        throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+      }
+      return response.json();
+    }
+  }
+
   createChatbot() {
     // Create chatbot container
     const chatbot = document.createElement('div');
@@ -1184,32 +1260,36 @@ class SpeedThreadsChatbot {
         return;
       }
       
-      // Prepare chat request
-      const chatRequest = {
-        thread_data: threadData,
-        messages: this.messages.slice(0, -1).map(msg => ({ // Exclude the loading message
-          role: msg.type === 'user' ? 'user' : 'assistant',
-          content: msg.content
-        })),
-        user_message: message
-      };
-      
-      // Send to backend
-      const response = await fetch(`${API_BASE_URL}/chat`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(chatRequest),
-        signal: this.currentRequestController.signal
-      });
+      // Conversation before this message, without the message itself and the loading message
+      const history = this.messages.slice(0, -2).map(msg => ({
+        role: msg.type === 'user' ? 'user' : 'assistant',
+        content: msg.content
+      }));
       
-      if (!response.ok) {
-        throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+      let result;
+      if (this.analysisShown) {
+        // Later turns go through a chat session, so the thread isn't uploaded again
+        result = await this.sendSessionMessage(threadData, history, message, this.currentRequestController.signal);
+      } else {
+        // Without an analysis on screen, /chat produces one alongside the reply
+        const response = await fetch(`${API_BASE_URL}/chat`, {
+          method: 'POST',
+          ...await jsonRequestBody({
+            thread_data: threadData,
+            messages: history,
+            user_message: message,
+            has_analysis: false
+          }),
+          signal: this.currentRequestController.signal
+        });
+        
+        if (!response.ok) {
+          throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+        }
+        
+        result = await response.json();
       }
       
-      const result = await response.json();
-      
       // Clear the controller since request completed successfully
       this.currentRequestController = null;
       
@@ -1240,6 +1320,7 @@ class SpeedThreadsChatbot {
         });
         
         this.addMessage(analysisText, 'ai');
+        this.analysisShown = true;
       }
       
     } catch (error) {
@@ -2201,6 +2282,22 @@ function extractRedditComment(commentElement) {
 // Backend API configuration
 const API_BASE_URL = 'http://localhost:8000';
 
+// Bodies smaller than this aren't worth compressing
+const GZIP_MIN_BYTES = 1024;
+
+// Build a JSON POST body, gzip-compressed when the browser supports it.
+// Thread payloads are mostly repetitive text and shrink several times over.
+async function jsonRequestBody(data) {
+  const json = JSON.stringify(data);
+  const headers = { 'Content-Type': 'application/json' };
+  if (json.length < GZIP_MIN_BYTES || typeof CompressionStream === 'undefined') {
+    return { headers, body: json };
+  }
+  const stream = new Blob([json]).stream().pipeThrough(new CompressionStream('gzip'));
+  const body = await new Response(stream).arrayBuffer();
+  return { headers: { ...headers, 'Content-Encoding': 'gzip' }, body };
+}
+
 // Test function for DevTools console
 window.testSpeedThreads = async function() {
   console.log('🚀 Testing SpeedThreads with GPT-4o mini...');
@@ -2245,10 +2342,7 @@ window.testSpeedThreads = async function() {
     console.log('🤖 Sending to GPT-4o mini for analysis...');
     const response = await fetch(`${API_BASE_URL}/summarize`, {
       method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify(threadData)
+      ...await jsonRequestBody(threadData)
     });
     
     if (!response.ok) {
@@ -2334,9 +2428,16 @@ async function handleRedditAnalysis(url) {
     
     // Check if content has changed
     if (hasContentChanged(currentThreadData, cachedData)) {
-      console.log('SpeedThreads: Content has changed, re-analyzing...');
-      // Content changed, re-analyze with new data
-      await analyzeThread(currentThreadData, url);
+      const newReplies = findNewReplies(currentThreadData, cachedData);
+      if (newReplies) {
+        console.log(`SpeedThreads: ${newReplies.length} new replies, updating analysis...`);
+        // Only replies were added: send just those to update the previous analysis
+        await analyzeThread(currentThreadData, url, { newReplies, previousAnalysisId: cachedData.analysisId });
+      } else {
+        console.log('SpeedThreads: Content has changed, re-analyzing...');
+        // Content changed, re-analyze with new data
+        await analyzeThread(currentThreadData, url);
+      }
     } else {
       console.log('SpeedThreads: Content unchanged, showing cached analysis');
       // Content unchanged, show cached analysis with animation
@@ -2388,10 +2489,12 @@ function showCachedAnalysis(analysis) {
   } else {
     console.log('SpeedThreads: Analysis already exists, skipping cached analysis');
   }
+  chatbot.analysisShown = true;
 }
 
-// Analyze thread with backend
-async function analyzeThread(threadData, url = null) {
+// Analyze thread with backend. With `update`, only the new replies are sent to
+// revise the previous analysis, falling back to a full analysis if the backend has none.
+async function analyzeThread(threadData, url = null, update = null) {
   const startTime = Date.now();
   
   try {
@@ -2401,14 +2504,27 @@ async function analyzeThread(threadData, url = null) {
     // Show analyzing overlay
     chatbot.showAnalyzing();
     
-    const response = await fetch(`${API_BASE_URL}/summarize`, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify(threadData),
-      signal: chatbot.currentRequestController.signal
-    });
+    let response = null;
+    if (update) {
+      response = await fetch(`${API_BASE_URL}/summarize/update`, {
+        method: 'POST',
+        ...await jsonRequestBody({
+          platform: threadData.platform,
+          post: threadData.post,
+          new_replies: update.newReplies,
+          previous_analysis_id: update.previousAnalysisId || null
+        }),
+        signal: chatbot.currentRequestController.signal
+      });
+    }
+    
+    if (!response || response.status === 409) {
+      response = await fetch(`${API_BASE_URL}/summarize`, {
+        method: 'POST',
+        ...await jsonRequestBody(threadData),
+        signal: chatbot.currentRequestController.signal
+      });
+    }
     
     if (!response.ok) {
       throw new Error(`HTTP ${response.status}: ${response.statusText}`);
@@ -2424,7 +2540,7 @@ async function analyzeThread(threadData, url = null) {
     
     // Cache the analysis if URL is provided
     if (url) {
-      await setCachedData(url, threadData, analysis);
+      await setCachedData(url, threadData, analysis, response.headers.get('X-Analysis-Id'));
       console.log('SpeedThreads: Analysis cached for URL:', url);
     }
     
@@ -2449,6 +2565,7 @@ async function analyzeThread(threadData, url = null) {
     });
     
     chatbot.addMessage(analysisText, 'ai', null, false, false, formattedElapsedTime);
+    chatbot.analysisShown = true;
     
   } catch (error) {
     console.error('Analysis error:', error);